@@ -5,452 +5,526 @@ A browser-based keyboard automation tool.
 
 import os
 import json
-import time
-import re
+import zipfile
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, Response
-import queue
-import threading
+from flask import Flask, request, jsonify, Response
 
-import pyautogui
-import requests
+# pyautogui (which connects to the display) is slow to import; it is loaded
+# by the route that uses it, on first use
 
 # Import version info
-from version import VERSION, APP_NAME, GITHUB_REPO, GITHUB_API_URL, GITHUB_RELEASES_URL
+from version import VERSION, APP_NAME, GITHUB_REPO
 
 # Import cross-platform window manager
-from window_manager import get_all_windows, activate_window, window_exists, get_platform
-
-# Enable failsafe - move mouse to top-left corner to abort
-pyautogui.FAILSAFE = True
-
-# Import pyperclip for clipboard-based typing (better keyboard layout support)
-try:
-    import pyperclip
-
-    PYPERCLIP_AVAILABLE = True
-except ImportError:
-    PYPERCLIP_AVAILABLE = False
+from window_manager import get_platform, window_watcher
+
+# Import execution engine and background job executor
+from plan import PlanError, parse_run_params
+from jobs import executor
+from progress import DEFAULT_MAX_RATE, HEARTBEAT_INTERVAL
+from job_queue import PatternQueue, OVERRIDABLE_FIELDS
+from pattern_store import create_store, pattern_etag, save_copy
+from json_patch import apply_patch, JsonPatchError, JsonPatchTestFailed
+from pattern_archive import (
+    FORMATS,
+    MIMETYPES,
+    CONFLICT_POLICIES,
+    export_names,
+    iter_export,
+    read_ndjson,
+    read_zip,
+    spool,
+    import_patterns,
+)
+from simulate import simulate_run
+from clipboard import settle_stats
+from serving import StaticAssets, render_cached
+from updates import update_checker
 
 app = Flask(__name__)
 
+# Fingerprinted, precompressed static files (asset_url() in templates)
+static_assets = StaticAssets(app.static_folder)
+static_assets.init_app(app)
+
 # Patterns directory
 PATTERNS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns")
 
 # Ensure patterns directory exists
 os.makedirs(PATTERNS_DIR, exist_ok=True)
 
-# Global execution state for progress reporting
-execution_state = {
-    "running": False,
-    "current_loop": 0,
-    "total_loops": 0,
-    "current_step": 0,
-    "total_steps": 0,
-    "progress_queue": None,
-}
+# Pattern storage backend (JSON files by default, SQLite via KEYSTROKER_STORE)
+pattern_store = create_store(PATTERNS_DIR)
 
+# Persistent batch run queue
+QUEUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queue.json")
 
-def type_text_safe(text, interval=0):
+
+def load_pattern(name):
     """
-    Type text using clipboard paste method for non-QWERTY keyboard compatibility.
-    This works correctly with AZERTY, QWERTZ, and other keyboard layouts.
-    Falls back to direct typing if clipboard method fails.
+    Load a saved pattern by name.
 
-    Args:
-        text: The text to type
-        interval: Delay between characters (only used in fallback mode)
+    Raises:
+        KeyError: If the pattern does not exist
     """
-    if not text:
-        return
+    pattern = pattern_store.get(name)
+    if pattern is None:
+        raise KeyError(name)
+    return pattern
 
-    platform = get_platform()
 
-    # Try clipboard method first (works with any keyboard layout)
-    if PYPERCLIP_AVAILABLE:
-        try:
-            # Save current clipboard content
-            try:
-                old_clipboard = pyperclip.paste()
-            except Exception:
-                old_clipboard = ""
+pattern_queue = PatternQueue(QUEUE_FILE, executor, load_pattern, parse_run_params)
 
-            # Copy text to clipboard
-            pyperclip.copy(text)
-            time.sleep(0.05)  # Small delay for clipboard to update
 
-            # Paste using keyboard shortcut
-            if platform == "macos":
-                pyautogui.hotkey("command", "v")
-            else:
-                pyautogui.hotkey("ctrl", "v")
+@app.route("/")
+def index():
+    """Serve the main UI (rendered once, then served from memory)."""
+    return render_cached("index.html")
 
-            time.sleep(0.05)  # Small delay for paste to complete
 
-            # Restore original clipboard content
-            try:
-                if old_clipboard:
-                    pyperclip.copy(old_clipboard)
-            except Exception:
-                pass
+@app.route("/mouse-position", methods=["GET"])
+def get_mouse_position():
+    """Return current mouse cursor position."""
+    try:
+        import pyautogui
 
-            return  # Success - exit function
+        x, y = pyautogui.position()
+        return jsonify({"x": x, "y": y})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        except Exception:
-            pass  # Fall through to direct typing
 
-    # Fallback: direct typing (may not work correctly with non-QWERTY keyboards)
-    pyautogui.write(text, interval=interval)
+def _windows_payload(snapshot):
+    platform = get_platform()
+    return {
+        "windows": list(snapshot.windows),
+        "version": snapshot.version,
+        "platform": platform,
+        "note": "Application names" if platform == "macos" else "Window titles",
+        "watch": window_watcher.method,
+    }
 
 
-def count_steps(sequence):
-    """Count total steps including nested repeat block children."""
-    total = 0
-    for step in sequence:
-        if step.get("action") == "repeat":
-            times = int(step.get("times", 1))
-            children = step.get("children", [])
-            # Count each repetition of children
-            total += count_steps(children) * times
+@app.route("/windows", methods=["GET"])
+def get_windows_list():
+    """
+    Return list of all visible windows/applications.
+
+    Served from the background window watcher's snapshot. The response
+    carries an ETag; a matching If-None-Match gets 304 Not Modified.
+
+    Query parameters:
+        refresh: "1" to enumerate the windows now instead
+    """
+    try:
+        if request.args.get("refresh") == "1":
+            snapshot = window_watcher.refresh()
         else:
-            total += 1
-    return total
+            snapshot = window_watcher.snapshot()
+        response = jsonify(_windows_payload(snapshot))
+        response.set_etag(snapshot.etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
-def count_total_steps(startup_sequence, main_sequence, loop_count):
-    """Count total steps including startup and all loop iterations."""
-    startup_steps = count_steps(startup_sequence)
-    main_steps = count_steps(main_sequence) * loop_count
-    return startup_steps + main_steps
+@app.route("/windows/stream")
+def windows_stream():
+    """
+    Server-Sent Events endpoint pushing the window list whenever it changes.
 
+    The current list is sent first, unless the client's Last-Event-ID is
+    already the current version.
+    """
+    try:
+        version = int(request.headers.get("Last-Event-ID") or 0)
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID"}), 400
 
-def sanitize_filename(name):
-    """Convert pattern name to safe filename."""
-    # Remove or replace invalid characters
-    safe_name = re.sub(r'[<>:"/\\|?*]', "_", name)
-    safe_name = safe_name.strip()
-    return safe_name + ".json"
+    def generate():
+        nonlocal version
+        yield "retry: 1000\n\n"
+        while True:
+            snapshot = window_watcher.wait_for_change(version, HEARTBEAT_INTERVAL)
+            if snapshot.version == version:
+                # Send heartbeat
+                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
+                continue
+            version = snapshot.version
+            payload = dict(_windows_payload(snapshot), type="windows")
+            yield f"id: {version}\ndata: {json.dumps(payload)}\n\n"
 
+    return Response(generate(), mimetype="text/event-stream")
 
-def get_pattern_filepath(name):
-    """Get full filepath for a pattern."""
-    return os.path.join(PATTERNS_DIR, sanitize_filename(name))
 
+@app.route("/run", methods=["POST"])
+def run_sequence():
+    """Submit the automation sequence to the background executor."""
+    try:
+        data = request.json
 
-@app.route("/")
-def index():
-    """Serve the main UI."""
-    return render_template("index.html")
+        try:
+            params = parse_run_params(data)
+        except PlanError as e:
+            return jsonify({"error": f"Invalid step: {e}"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
+        state = executor.submit(params)
+
+        return jsonify({"success": True, "job_id": state.job_id}), 202
 
-@app.route("/mouse-position", methods=["GET"])
-def get_mouse_position():
-    """Return current mouse cursor position."""
-    try:
-        x, y = pyautogui.position()
-        return jsonify({"x": x, "y": y})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/windows", methods=["GET"])
-def get_windows_list():
-    """Return list of all visible windows/applications."""
+@app.route("/simulate", methods=["POST"])
+def simulate_sequence():
+    """
+    Estimate a run's duration and input events without executing it.
+
+    Takes the same payload as /run, including start_loop and resume (the
+    estimate then covers the loops after the stored checkpoint). Optional
+    query parameters: pause (pause after each input call to assume) and
+    clipboard=0 (assume direct typing); both default to what the run's input
+    backend does.
+    """
     try:
-        windows = get_all_windows()
-        platform = get_platform()
-        return jsonify(
-            {
-                "windows": windows,
-                "platform": platform,
-                "note": "Application names" if platform == "macos" else "Window titles",
-            }
+        data = request.json
+
+        try:
+            params = parse_run_params(data)
+            pause = request.args.get("pause")
+            pause = float(pause) if pause is not None else None
+        except PlanError as e:
+            return jsonify({"error": f"Invalid step: {e}"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        clipboard = request.args.get("clipboard")
+        if clipboard is not None:
+            clipboard = clipboard not in ("0", "false")
+        checkpoint = None
+        if params.get("resume"):
+            checkpoint = executor.journal.get(params["pattern_hash"])
+        result = simulate_run(
+            params,
+            pause=pause,
+            clipboard=clipboard,
+            settle=settle_stats.expected(),
+            checkpoint=checkpoint,
         )
+        return jsonify(result)
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-def report_progress():
-    """Send progress update to SSE clients."""
-    if execution_state["progress_queue"]:
-        try:
-            execution_state["progress_queue"].put_nowait(
-                {
-                    "type": "progress",
-                    "current_loop": execution_state["current_loop"],
-                    "total_loops": execution_state["total_loops"],
-                    "current_step": execution_state["current_step"],
-                    "total_steps": execution_state["total_steps"],
-                }
-            )
-        except queue.Full:
-            pass
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    """List submitted jobs, newest first."""
+    jobs = [state.to_dict() for state in reversed(executor.list())]
+    return jsonify({"jobs": jobs})
 
 
-def execute_step(step, loop_index):
-    """
-    Execute a single step, handling repeat blocks recursively.
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Return status and result of a submitted job."""
+    state = executor.get(job_id)
+    if state is None:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    return jsonify(state.to_dict())
 
-    Args:
-        step: The step dictionary containing action and parameters
-        loop_index: The current loop iteration (1-based) for {i} replacement
-    """
-    action = step.get("action")
-
-    if action == "repeat":
-        # Repeat block - execute children multiple times
-        times = int(step.get("times", 1))
-        delay = float(step.get("delay", 0))
-        children = step.get("children", [])
-
-        # Skip if times is 0 or no children
-        if times <= 0 or not children:
-            return
-
-        for r in range(times):
-            # Execute all children in order
-            for child in children:
-                execute_step(child, loop_index)
-
-            # Delay between repetitions (not after the last one)
-            if delay > 0 and r < times - 1:
-                time.sleep(delay)
-
-    elif action == "type":
-        execution_state["current_step"] += 1
-        report_progress()
-        text = step.get("value", "")
-        interval = float(step.get("interval", 0))
-        # Replace {i} with current loop index
-        text = text.replace("{i}", str(loop_index))
-        # Use clipboard-based typing for keyboard layout compatibility (AZERTY, etc.)
-        type_text_safe(text, interval=interval)
-
-    elif action == "type_range":
-        execution_state["current_step"] += 1
-        report_progress()
-        start = int(step.get("start", 0))
-        end = int(step.get("end", 0))
-        interval = float(step.get("interval", 0))
-        # Calculate current number with wrap-around
-        range_length = end - start + 1
-        current_number = start + ((loop_index - 1) % range_length)
-
-        # Apply zero-padding if enabled
-        use_padding = step.get("use_padding", False)
-        min_digits = int(step.get("min_digits", 1))
-
-        if use_padding and min_digits > 1:
-            number_str = str(current_number).zfill(min_digits)
-        else:
-            number_str = str(current_number)
-
-        # Use clipboard-based typing for keyboard layout compatibility (AZERTY, etc.)
-        type_text_safe(number_str, interval=interval)
-
-    elif action == "key":
-        execution_state["current_step"] += 1
-        report_progress()
-        key = step.get("value", "")
-        if key:
-            pyautogui.press(key)
-
-    elif action == "hotkey":
-        execution_state["current_step"] += 1
-        report_progress()
-        keys = step.get("keys", [])
-        if keys:
-            pyautogui.hotkey(*keys)
-            # Explicitly release modifier keys to prevent them from getting "stuck"
-            for key in keys:
-                if key.lower() in ["shift", "ctrl", "alt", "win", "command"]:
-                    pyautogui.keyUp(key)
-            # Small delay to ensure keys are fully released
-            time.sleep(0.02)
-
-    elif action == "wait":
-        execution_state["current_step"] += 1
-        report_progress()
-        duration = float(step.get("value", 0))
-        time.sleep(duration)
-
-    elif action == "click":
-        execution_state["current_step"] += 1
-        report_progress()
-        button = step.get("button", "left")
-        clicks = int(step.get("clicks", 1))
-        x = step.get("x")
-        y = step.get("y")
-
-        if x is not None and y is not None:
-            # Click at specific coordinates
-            pyautogui.click(x=int(x), y=int(y), button=button, clicks=clicks)
-        else:
-            # Click at current mouse position
-            pyautogui.click(button=button, clicks=clicks)
 
-    elif action == "move_mouse":
-        execution_state["current_step"] += 1
-        report_progress()
-        x = int(step.get("x", 0))
-        y = int(step.get("y", 0))
-        duration = float(step.get("duration", 0))
-        pyautogui.moveTo(x, y, duration=duration)
+def _control_job(job_id, action):
+    """Apply a stop/pause/resume request to a job and return its state."""
+    state = executor.get(job_id)
+    if state is None:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    if state.finished:
+        return jsonify({"error": f"Job '{job_id}' has already finished"}), 409
+    action(job_id)
+    return jsonify(state.to_dict())
 
 
-@app.route("/run", methods=["POST"])
-def run_sequence():
-    """Execute the automation sequence."""
-    global execution_state
+@app.route("/jobs/<job_id>/stop", methods=["POST"])
+def stop_job(job_id):
+    """Stop a job; a run in the middle of a wait stops within milliseconds."""
+    return _control_job(job_id, executor.stop)
+
+
+@app.route("/jobs/<job_id>/pause", methods=["POST"])
+def pause_job(job_id):
+    """Pause a job before its next step (or in the middle of a wait)."""
+    return _control_job(job_id, executor.pause)
+
+
+@app.route("/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    """Resume a paused job at the step and loop where it paused."""
+    return _control_job(job_id, executor.resume)
+
+
+@app.route("/checkpoints", methods=["GET"])
+def list_checkpoints():
+    """List the last finished loop of interrupted runs (resume with "resume": true)."""
+    return jsonify({"checkpoints": executor.journal.list()})
 
+
+@app.route("/checkpoints/<pattern_hash>", methods=["DELETE"])
+def delete_checkpoint(pattern_hash):
+    """Forget a checkpoint so the next resume starts from loop 1."""
+    if not executor.journal.clear(pattern_hash):
+        return jsonify({"error": f"Checkpoint '{pattern_hash}' not found"}), 404
+    return jsonify({"success": True})
+
+
+# =============================================================================
+# Batch Queue Endpoints
+# =============================================================================
+
+
+def _queue_priority(data):
+    """The "priority" of a queue request as an int (default 0), or None if invalid."""
+    priority = data.get("priority", 0)
+    if isinstance(priority, str) and priority.strip().lstrip("-").isdigit():
+        return int(priority)
+    if isinstance(priority, int) and not isinstance(priority, bool):
+        return priority
+    return None
+
+
+@app.route("/queue", methods=["GET"])
+def get_queue():
+    """Return pending queue entries in run order plus recent history."""
+    return jsonify(pattern_queue.snapshot())
+
+
+@app.route("/queue", methods=["POST"])
+def enqueue_pattern():
+    """Add a saved pattern to the batch queue."""
     try:
-        data = request.json
+        data = request.json or {}
+        name = data.get("pattern", "").strip()
 
-        target_window = data.get("target_window")
-        target_mode = data.get("target_mode", "manual")
-        start_delay = int(data.get("start_delay", 3))
-        loop_count = int(data.get("loop_count", 1))
-        startup_sequence = data.get("startup_sequence", [])
-        sequence = data.get("sequence", [])
-
-        if not sequence and not startup_sequence:
-            return jsonify({"error": "Both sequences are empty"}), 400
-
-        # Initialize progress tracking
-        total_steps = count_total_steps(startup_sequence, sequence, loop_count)
-        execution_state["running"] = True
-        execution_state["current_loop"] = 0
-        execution_state["total_loops"] = loop_count
-        execution_state["current_step"] = 0
-        execution_state["total_steps"] = total_steps
-        execution_state["progress_queue"] = queue.Queue(maxsize=100)
-
-        # Step 1: Focus target window (if auto mode)
-        if target_mode == "auto" and target_window:
-            try:
-                # Use cross-platform window manager
-                if window_exists(target_window):
-                    success = activate_window(target_window)
-                    if not success:
-                        execution_state["running"] = False
-                        return jsonify(
-                            {
-                                "error": f"Failed to activate '{target_window}'. Try selecting it manually."
-                            }
-                        ), 400
-                    time.sleep(0.5)  # Brief pause for window to come to front
-                else:
-                    execution_state["running"] = False
-                    return jsonify(
-                        {
-                            "error": f"Window '{target_window}' not found. Please refresh the window list."
-                        }
-                    ), 400
-            except Exception as e:
-                execution_state["running"] = False
-                return jsonify({"error": f"Failed to focus window: {str(e)}"}), 500
-
-        # Step 2: Start delay (handled by frontend with countdown)
-        time.sleep(start_delay)
-
-        # Step 3: Execute startup sequence ONCE
-        if startup_sequence:
-            execution_state["current_loop"] = 0  # 0 indicates startup phase
-            for step in startup_sequence:
-                execute_step(step, 1)  # loop_index = 1 for startup
-
-        # Step 4: Execute main sequence in loops
-        for i in range(1, loop_count + 1):
-            execution_state["current_loop"] = i
-            for step in sequence:
-                execute_step(step, i)
-
-        execution_state["running"] = False
-
-        # Send completion message
-        if execution_state["progress_queue"]:
-            try:
-                execution_state["progress_queue"].put_nowait({"type": "complete"})
-            except queue.Full:
-                pass
+        if not name:
+            return jsonify({"error": "Pattern name is required"}), 400
 
-        return jsonify(
-            {
-                "success": True,
-                "message": f"Completed {loop_count} loop(s) successfully!",
-            }
-        )
+        priority = _queue_priority(data)
+        if priority is None:
+            return jsonify({"error": "'priority' must be an integer"}), 400
 
-    except pyautogui.FailSafeException:
-        execution_state["running"] = False
-        if execution_state["progress_queue"]:
-            try:
-                execution_state["progress_queue"].put_nowait({"type": "stopped"})
-            except queue.Full:
-                pass
-        return jsonify(
-            {"error": "Emergency stop triggered! Mouse moved to top-left corner."}
-        ), 400
+        overrides = {field: data[field] for field in OVERRIDABLE_FIELDS if field in data}
+
+        try:
+            entry = pattern_queue.enqueue(name, priority, overrides)
+        except KeyError:
+            return jsonify({"error": f"Pattern '{name}' not found"}), 404
+        except PlanError as e:
+            return jsonify({"error": f"Invalid step: {e}"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"success": True, "entry": entry}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/queue/order", methods=["PUT"])
+def reorder_queue():
+    """Move the listed pending entries to the front of the queue, in order."""
+    try:
+        ids = (request.json or {}).get("ids", [])
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return jsonify({"error": "'ids' must be a list of queue entry ids"}), 400
+        try:
+            return jsonify(pattern_queue.reorder(ids))
+        except KeyError as e:
+            return jsonify({"error": f"Queue entry {e} is not pending"}), 404
     except Exception as e:
-        execution_state["running"] = False
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/queue/<entry_id>", methods=["PATCH"])
+def update_queue_entry(entry_id):
+    """Change the priority of a pending queue entry."""
+    try:
+        priority = _queue_priority(request.json or {})
+        if priority is None:
+            return jsonify({"error": "'priority' must be an integer"}), 400
+        try:
+            entry = pattern_queue.set_priority(entry_id, priority)
+        except KeyError:
+            return jsonify({"error": f"Queue entry '{entry_id}' not found"}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 409
+        return jsonify({"success": True, "entry": entry})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/queue/<entry_id>", methods=["DELETE"])
+def cancel_queue_entry(entry_id):
+    """Cancel a pending queue entry."""
+    try:
+        entry = pattern_queue.cancel(entry_id)
+    except KeyError:
+        return jsonify({"error": f"Queue entry '{entry_id}' not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"success": True, "entry": entry})
+
+
+@app.route("/queue/pause", methods=["POST"])
+def pause_queue():
+    """Stop starting new queue entries."""
+    pattern_queue.pause()
+    return jsonify({"success": True, "paused": True})
+
+
+@app.route("/queue/resume", methods=["POST"])
+def resume_queue():
+    """Resume running queue entries."""
+    pattern_queue.resume()
+    return jsonify({"success": True, "paused": False})
+
+
 @app.route("/progress")
 def progress_stream():
-    """Server-Sent Events endpoint for execution progress."""
+    """
+    Server-Sent Events endpoint for execution progress.
+
+    Any number of clients can follow the same job. Progress is coalesced to
+    the newest state, at most max_rate updates per second per client, and a
+    reconnecting EventSource resumes after its Last-Event-ID.
+    """
+    job_id = request.args.get("job")
+    state = executor.get(job_id) if job_id else executor.latest()
+    if state is None:
+        return jsonify({"error": "No job to follow"}), 404
+
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or 0)
+        max_rate = float(request.args.get("max_rate", DEFAULT_MAX_RATE))
+    except ValueError:
+        return jsonify({"error": "Invalid Last-Event-ID or max_rate"}), 400
 
     def generate():
-        while True:
-            if execution_state["progress_queue"]:
-                try:
-                    msg = execution_state["progress_queue"].get(timeout=1)
-                    yield f"data: {json.dumps(msg)}\n\n"
-                    if msg.get("type") in ["complete", "stopped"]:
-                        break
-                except queue.Empty:
-                    # Send heartbeat
-                    yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
+        # Tell the browser to reconnect quickly if the connection drops
+        yield "retry: 1000\n\n"
+        for event_id, msg in state.progress.subscribe(last_event_id, max_rate):
+            if event_id is None:
+                # Send heartbeat
+                yield f"data: {json.dumps({'type': 'heartbeat'})}\n\n"
             else:
-                time.sleep(0.1)
+                yield f"id: {event_id}\ndata: {json.dumps(msg)}\n\n"
 
     return Response(generate(), mimetype="text/event-stream")
 
 
 @app.route("/patterns", methods=["GET"])
 def list_patterns():
-    """List all saved patterns."""
+    """
+    List saved patterns, newest first.
+
+    Query parameters:
+        q: Search text matched against name and description
+        target_window: Only patterns targeting this window
+        limit, offset: Pagination (all patterns by default)
+    """
     try:
-        patterns = []
-        for filename in os.listdir(PATTERNS_DIR):
-            if filename.endswith(".json"):
-                filepath = os.path.join(PATTERNS_DIR, filename)
-                try:
-                    with open(filepath, "r", encoding="utf-8") as f:
-                        pattern = json.load(f)
-                        patterns.append(
-                            {
-                                "name": pattern.get("name", filename[:-5]),
-                                "description": pattern.get("description", ""),
-                                "step_count": len(pattern.get("sequence", [])),
-                                "loop_count": pattern.get("loop_count", 1),
-                                "created_at": pattern.get("created_at", ""),
-                                "updated_at": pattern.get("updated_at", ""),
-                            }
-                        )
-                except (json.JSONDecodeError, IOError):
-                    continue
-
-        # Sort by updated_at descending (newest first)
-        patterns.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-        return jsonify({"patterns": patterns})
+        try:
+            limit = request.args.get("limit", type=int)
+            offset = max(0, request.args.get("offset", 0, type=int))
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+
+        patterns, total = pattern_store.list(
+            q=request.args.get("q", "").strip() or None,
+            target_window=request.args.get("target_window") or None,
+            limit=limit,
+            offset=offset,
+        )
+        return jsonify({"patterns": patterns, "total": total})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _conditional_request():
+    """Whether the request carries If-Match or If-None-Match."""
+    return bool(request.if_match or request.if_none_match)
+
+
+def _check_preconditions(name, current):
+    """
+    Evaluate If-Match / If-None-Match for a write to a pattern.
+
+    If-Match with the ETag the client loaded detects that another tab saved
+    the pattern in the meantime; If-None-Match: * only creates new patterns.
+
+    Args:
+        name: Pattern name
+        current: The stored pattern, or None if it does not exist
+
+    Returns:
+        A 412 response if a precondition fails, else None
+    """
+    etag = pattern_etag(current) if current is not None else None
+    if request.if_match:
+        if etag is None or not (request.if_match.star_tag or request.if_match.contains(etag)):
+            message = (
+                f"Pattern '{name}' was changed elsewhere since it was loaded"
+                if etag is not None
+                else f"Pattern '{name}' not found"
+            )
+            return jsonify({"error": message, "exists": etag is not None, "etag": etag}), 412
+    if request.if_none_match and etag is not None:
+        if request.if_none_match.star_tag or request.if_none_match.contains(etag):
+            return jsonify(
+                {"error": f"Pattern '{name}' already exists", "exists": True, "etag": etag}
+            ), 412
+    return None
+
+
+def _autosave():
+    """
+    Whether the client marked this save as an autosave (?autosave=1).
+
+    Autosaves may be held in memory briefly and merged with the next save to
+    the same pattern; every other save is on disk before the response.
+    """
+    return request.args.get("autosave") == "1"
+
+
+def _saved_response(body, pattern):
+    """
+    Response to a save: body plus the new ETag and the timestamps the server
+    set, which are all a client needs to match its copy to the stored one.
+    """
+    etag = pattern_etag(pattern)
+    response = jsonify(
+        dict(
+            body,
+            etag=etag,
+            created_at=pattern.get("created_at"),
+            updated_at=pattern.get("updated_at"),
+        )
+    )
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/patterns", methods=["POST"])
 def save_pattern():
-    """Save a new pattern."""
+    """
+    Save a new pattern.
+
+    Accepts If-None-Match: * (fail with 412 if the pattern exists) and
+    If-Match: <etag> (fail with 412 if it changed since it was loaded).
+    With ?autosave=1 the write may be coalesced with the next one (see
+    _autosave); "written" in the response says whether it is on disk yet.
+    """
     try:
         data = request.json
         name = data.get("name", "").strip()
@@ -458,36 +532,43 @@ def save_pattern():
         if not name:
             return jsonify({"error": "Pattern name is required"}), 400
 
-        filepath = get_pattern_filepath(name)
-
-        # Check if pattern already exists
-        exists = os.path.exists(filepath)
+        with pattern_store.lock(name):
+            # Check if pattern already exists
+            if _conditional_request():
+                current = pattern_store.get(name)
+                failed = _check_preconditions(name, current)
+                if failed:
+                    return failed
+                exists = current is not None
+            else:
+                exists = pattern_store.exists(name)
+
+            # Prepare pattern data
+            now = datetime.utcnow().isoformat() + "Z"
+            pattern = {
+                "name": name,
+                "description": data.get("description", ""),
+                "created_at": data.get("created_at", now) if exists else now,
+                "updated_at": now,
+                "target_window": data.get("target_window"),
+                "target_mode": data.get("target_mode", "manual"),
+                "start_delay": data.get("start_delay", 3),
+                "loop_count": data.get("loop_count", 1),
+                "default_delay": data.get("default_delay", 0.1),
+                "startup_sequence": data.get("startup_sequence", []),
+                "sequence": data.get("sequence", []),
+            }
 
-        # Prepare pattern data
-        now = datetime.utcnow().isoformat() + "Z"
-        pattern = {
-            "name": name,
-            "description": data.get("description", ""),
-            "created_at": data.get("created_at", now) if exists else now,
-            "updated_at": now,
-            "target_window": data.get("target_window"),
-            "target_mode": data.get("target_mode", "manual"),
-            "start_delay": data.get("start_delay", 3),
-            "loop_count": data.get("loop_count", 1),
-            "default_delay": data.get("default_delay", 0.1),
-            "startup_sequence": data.get("startup_sequence", []),
-            "sequence": data.get("sequence", []),
-        }
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(pattern, f, indent=2, ensure_ascii=False)
+            written = pattern_store.save(name, pattern, coalesce=_autosave())
 
-        return jsonify(
+        return _saved_response(
             {
                 "success": True,
                 "message": f"Pattern '{name}' saved successfully!",
                 "existed": exists,
-            }
+                "written": written,
+            },
+            pattern,
         )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -495,56 +576,122 @@ def save_pattern():
 
 @app.route("/patterns/<path:name>", methods=["GET"])
 def get_pattern(name):
-    """Load a specific pattern."""
+    """
+    Load a specific pattern.
+
+    The response carries a content-hash ETag; If-None-Match with that ETag
+    is answered with 304 Not Modified.
+    """
     try:
-        filepath = get_pattern_filepath(name)
+        pattern = pattern_store.get(name)
 
-        if not os.path.exists(filepath):
+        if pattern is None:
             return jsonify({"error": f"Pattern '{name}' not found"}), 404
 
-        with open(filepath, "r", encoding="utf-8") as f:
-            pattern = json.load(f)
-
-        return jsonify(pattern)
+        response = jsonify(pattern)
+        response.set_etag(pattern_etag(pattern))
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/patterns/<path:name>", methods=["PUT"])
 def update_pattern(name):
-    """Update an existing pattern."""
+    """
+    Update an existing pattern.
+
+    Accepts If-Match: <etag> (fail with 412 if it changed since it was loaded)
+    and ?autosave=1, as for POST /patterns.
+    """
     try:
-        filepath = get_pattern_filepath(name)
+        with pattern_store.lock(name):
+            # Load existing pattern to preserve created_at
+            existing = pattern_store.get(name)
+
+            if existing is None:
+                return jsonify({"error": f"Pattern '{name}' not found"}), 404
+
+            failed = _check_preconditions(name, existing)
+            if failed:
+                return failed
+
+            data = request.json
+            now = datetime.utcnow().isoformat() + "Z"
+
+            pattern = {
+                "name": name,
+                "description": data.get("description", existing.get("description", "")),
+                "created_at": existing.get("created_at", now),
+                "updated_at": now,
+                "target_window": data.get("target_window"),
+                "target_mode": data.get("target_mode", "manual"),
+                "start_delay": data.get("start_delay", 3),
+                "loop_count": data.get("loop_count", 1),
+                "default_delay": data.get("default_delay", 0.1),
+                "startup_sequence": data.get("startup_sequence", []),
+                "sequence": data.get("sequence", []),
+            }
 
-        if not os.path.exists(filepath):
-            return jsonify({"error": f"Pattern '{name}' not found"}), 404
+            written = pattern_store.save(name, pattern, coalesce=_autosave())
 
-        # Load existing pattern to preserve created_at
-        with open(filepath, "r", encoding="utf-8") as f:
-            existing = json.load(f)
+        return _saved_response(
+            {
+                "success": True,
+                "message": f"Pattern '{name}' updated successfully!",
+                "written": written,
+            },
+            pattern,
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        data = request.json
-        now = datetime.utcnow().isoformat() + "Z"
 
-        pattern = {
-            "name": name,
-            "description": data.get("description", existing.get("description", "")),
-            "created_at": existing.get("created_at", now),
-            "updated_at": now,
-            "target_window": data.get("target_window"),
-            "target_mode": data.get("target_mode", "manual"),
-            "start_delay": data.get("start_delay", 3),
-            "loop_count": data.get("loop_count", 1),
-            "default_delay": data.get("default_delay", 0.1),
-            "startup_sequence": data.get("startup_sequence", []),
-            "sequence": data.get("sequence", []),
-        }
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(pattern, f, indent=2, ensure_ascii=False)
+@app.route("/patterns/<path:name>", methods=["PATCH"])
+def patch_pattern(name):
+    """
+    Apply a JSON Patch (RFC 6902) to a pattern.
 
-        return jsonify(
-            {"success": True, "message": f"Pattern '{name}' updated successfully!"}
+    The body is a list of operations, applied atomically: either all of them
+    take effect or the pattern is left unchanged. Only the operations are
+    written to disk, so small edits to large patterns stay cheap. Accepts
+    If-Match: <etag> (fail with 412 if it changed since it was loaded).
+    """
+    try:
+        operations = request.get_json(silent=True)
+        if not isinstance(operations, list):
+            return jsonify({"error": "Body must be a JSON Patch (a list of operations)"}), 400
+
+        with pattern_store.lock(name):
+            existing = pattern_store.get(name)
+
+            failed = _check_preconditions(name, existing)
+            if failed:
+                return failed
+
+            if existing is None:
+                return jsonify({"error": f"Pattern '{name}' not found"}), 404
+
+            now = datetime.utcnow().isoformat() + "Z"
+            operations = operations + [{"op": "add", "path": "/updated_at", "value": now}]
+            try:
+                pattern = apply_patch(existing, operations)
+            except JsonPatchTestFailed as e:
+                return jsonify({"error": str(e)}), 409
+            except JsonPatchError as e:
+                return jsonify({"error": f"Invalid patch: {e}"}), 422
+
+            if not isinstance(pattern, dict) or pattern.get("name") != existing.get("name"):
+                return jsonify({"error": "A patch cannot rename or replace the pattern"}), 422
+            for field in ("startup_sequence", "sequence"):
+                if not isinstance(pattern.get(field, []), list):
+                    return jsonify({"error": f"'{field}' must stay a list"}), 422
+
+            pattern_store.save_patch(name, pattern, operations)
+
+        return _saved_response(
+            {"success": True, "message": f"Pattern '{name}' updated successfully!"},
+            pattern,
         )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -554,12 +701,9 @@ def update_pattern(name):
 def delete_pattern(name):
     """Delete a pattern."""
     try:
-        filepath = get_pattern_filepath(name)
-
-        if not os.path.exists(filepath):
+        if not pattern_store.delete(name):
             return jsonify({"error": f"Pattern '{name}' not found"}), 404
 
-        os.remove(filepath)
         return jsonify(
             {"success": True, "message": f"Pattern '{name}' deleted successfully!"}
         )
@@ -571,34 +715,19 @@ def delete_pattern(name):
 def duplicate_pattern(name):
     """Duplicate a pattern."""
     try:
-        filepath = get_pattern_filepath(name)
-
-        if not os.path.exists(filepath):
-            return jsonify({"error": f"Pattern '{name}' not found"}), 404
-
         # Load existing pattern
-        with open(filepath, "r", encoding="utf-8") as f:
-            pattern = json.load(f)
+        pattern = pattern_store.get(name)
 
-        # Generate new name
-        base_name = name + " (Copy)"
-        new_name = base_name
-        counter = 2
-
-        while os.path.exists(get_pattern_filepath(new_name)):
-            new_name = f"{base_name} {counter}"
-            counter += 1
+        if pattern is None:
+            return jsonify({"error": f"Pattern '{name}' not found"}), 404
 
         # Update pattern data
         now = datetime.utcnow().isoformat() + "Z"
-        pattern["name"] = new_name
         pattern["created_at"] = now
         pattern["updated_at"] = now
 
         # Save new pattern
-        new_filepath = get_pattern_filepath(new_name)
-        with open(new_filepath, "w", encoding="utf-8") as f:
-            json.dump(pattern, f, indent=2, ensure_ascii=False)
+        new_name = save_copy(pattern_store, name, pattern)
 
         return jsonify(
             {
@@ -611,6 +740,88 @@ def duplicate_pattern(name):
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/archive/export", methods=["GET"])
+def export_patterns():
+    """
+    Stream saved patterns as one archive, reading one pattern at a time.
+
+    Query parameters:
+        format: "zip" (default, one <name>.json per pattern) or "ndjson"
+        q, target_window: Filters, as for GET /patterns
+        name: Export exactly these patterns (repeatable)
+    """
+    try:
+        fmt = request.args.get("format", "zip").lower()
+        if fmt not in FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+        names = export_names(
+            pattern_store,
+            q=request.args.get("q", "").strip() or None,
+            target_window=request.args.get("target_window") or None,
+            names=request.args.getlist("name"),
+        )
+        response = Response(iter_export(pattern_store, names, fmt), mimetype=MIMETYPES[fmt])
+        response.headers["Content-Disposition"] = f'attachment; filename="keystroker-patterns.{fmt}"'
+        response.headers["X-Pattern-Count"] = str(len(names))
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/archive/import", methods=["POST"])
+def import_patterns_archive():
+    """
+    Import a zip or NDJSON archive of patterns, saving each one as it is read.
+
+    The archive is the request body, or the "file" field of a form upload.
+    NDJSON is read as it arrives; a zip is spooled to a temporary file first.
+
+    Query parameters:
+        policy: When a pattern exists: "skip" (default), "overwrite", or
+            "rename" (saved as "name (Copy)", like duplicating)
+        format: "zip" or "ndjson" (default: from the content type or
+            filename; required for an upload that has neither)
+    """
+    try:
+        policy = request.args.get("policy", "skip").lower()
+        if policy not in CONFLICT_POLICIES:
+            return jsonify({"error": f"policy must be one of: {', '.join(CONFLICT_POLICIES)}"}), 400
+
+        upload = request.files.get("file")
+        stream = upload.stream if upload is not None else request.stream
+
+        fmt = request.args.get("format", "").lower()
+        if not fmt and upload is not None:
+            filename = (upload.filename or "").lower()
+            if upload.mimetype == MIMETYPES["zip"] or filename.endswith(".zip"):
+                fmt = "zip"
+            elif filename:
+                fmt = "ndjson"
+            else:
+                return jsonify({"error": "Upload has no filename; pass format=zip or format=ndjson"}), 400
+        elif not fmt:
+            fmt = "zip" if request.mimetype == MIMETYPES["zip"] else "ndjson"
+        if fmt not in FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+        if fmt == "zip":
+            # Form uploads are already spooled by werkzeug; a raw body is not seekable
+            archive = stream if upload is not None else spool(stream)
+            try:
+                result = import_patterns(pattern_store, read_zip(archive), policy)
+            except zipfile.BadZipFile:
+                return jsonify({"error": "Not a zip archive"}), 400
+            finally:
+                archive.close()
+        else:
+            result = import_patterns(pattern_store, read_ndjson(stream), policy)
+
+        return jsonify(dict(result, success=True))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # =============================================================================
 # Version and Update Endpoints
 # =============================================================================
@@ -626,88 +837,19 @@ def get_version():
 
 @app.route("/api/check-update", methods=["GET"])
 def check_update():
-    """Check GitHub for latest release version."""
-    try:
-        # Query GitHub API for latest release
-        headers = {
-            "Accept": "application/vnd.github.v3+json",
-            "User-Agent": f"{APP_NAME}/{VERSION}",
-        }
-
-        response = requests.get(GITHUB_API_URL, headers=headers, timeout=10)
-
-        if response.status_code == 404:
-            # No releases yet
-            return jsonify(
-                {
-                    "update_available": False,
-                    "current_version": VERSION,
-                    "message": "No releases found yet.",
-                }
-            )
-
-        response.raise_for_status()
-        release_data = response.json()
-
-        latest_version = release_data.get("tag_name", "").lstrip("v")
-        release_name = release_data.get("name", "")
-        release_notes = release_data.get("body", "")
-        html_url = release_data.get("html_url", GITHUB_RELEASES_URL)
-        published_at = release_data.get("published_at", "")
-
-        # Find download URL for Windows executable
-        download_url = None
-        assets = release_data.get("assets", [])
-        for asset in assets:
-            asset_name = asset.get("name", "").lower()
-            if asset_name.endswith(".exe"):
-                download_url = asset.get("browser_download_url")
-                break
-
-        # Compare versions (simple string comparison works for semantic versioning)
-        def parse_version(v):
-            """Parse version string into tuple of integers."""
-            try:
-                return tuple(int(x) for x in v.split("."))
-            except (ValueError, AttributeError):
-                return (0, 0, 0)
-
-        current_ver = parse_version(VERSION)
-        latest_ver = parse_version(latest_version)
-
-        update_available = latest_ver > current_ver
-
-        return jsonify(
-            {
-                "update_available": update_available,
-                "current_version": VERSION,
-                "latest_version": latest_version,
-                "release_name": release_name,
-                "release_notes": release_notes,
-                "release_url": html_url,
-                "download_url": download_url,
-                "published_at": published_at,
-            }
-        )
+    """
+    Check GitHub for latest release version.
 
-    except requests.exceptions.Timeout:
-        return jsonify(
-            {
-                "error": "Request timed out. Please try again.",
-                "current_version": VERSION,
-            }
-        ), 504
-    except requests.exceptions.RequestException as e:
-        return jsonify(
-            {
-                "error": f"Failed to check for updates: {str(e)}",
-                "current_version": VERSION,
-            }
-        ), 500
-    except Exception as e:
-        return jsonify(
-            {"error": f"Unexpected error: {str(e)}", "current_version": VERSION}
-        ), 500
+    Answers from the shared update cache; stale results are refreshed in the
+    background. refresh=1 (the Updates button) forces a refresh and waits
+    briefly for it.
+    """
+    result = update_checker.check(force=request.args.get("refresh") == "1")
+    if result.get("pending"):
+        return jsonify(result), 202
+    if "error" in result:
+        return jsonify(result), 504 if result["error_kind"] == "timeout" else 500
+    return jsonify(result)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for KeyStroker.
+
+Measures the hot paths without touching the real keyboard and mouse: the
+engine runs against the null input backend. The results are written as JSON
+and can be compared against a stored baseline, so a slower hot path shows up
+as a number instead of a feeling.
+
+Usage:
+    python benchmark.py                          # run all, print a table
+    python benchmark.py --only engine store      # run some groups
+    python benchmark.py --save-baseline          # store results as the baseline
+    python benchmark.py --compare                # fail if slower than the baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+
+from version import VERSION
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmark_baseline.json")
+
+# A result this much worse than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.20
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run in this environment."""
+
+
+def measure(fn, number, repeat=5):
+    """
+    Time fn() number times, repeat times over.
+
+    Returns:
+        float: Best (lowest) seconds per call across the repeats
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _us(seconds):
+    return round(seconds * 1e6, 3)
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+# Per-instruction overhead of execute_plan: dispatch, progress reporting and
+# backend call. Uses the null backend, so no input is sent.
+
+ENGINE_ACTIONS = {
+    "type": {"action": "type", "value": "Item_{i}"},
+    "type_range": {"action": "type_range", "start": 1, "end": 500, "use_padding": True, "min_digits": 3},
+    "key": {"action": "key", "value": "tab"},
+    "hotkey": {"action": "hotkey", "keys": ["ctrl", "s"]},
+    "wait": {"action": "wait", "value": 0},
+    "click": {"action": "click", "x": 10, "y": 20},
+    "move_mouse": {"action": "move_mouse", "x": 10, "y": 20},
+}
+
+
+def bench_engine():
+    try:
+        import engine
+        from plan import compile_sequence
+        from scheduler import DeadlineScheduler
+        from input_backends import NullBackend
+        from clipboard import ClipboardSession
+    except Exception as e:
+        raise Skip(f"engine not importable ({e})")
+
+    results = {}
+    batch = 200
+    for name, step in ENGINE_ACTIONS.items():
+        plan = compile_sequence([dict(step) for _ in range(batch)])
+        state = engine.RunState("benchmark", {"startup_plan": [], "main_plan": plan})
+        state.scheduler = DeadlineScheduler()
+        state.backend = NullBackend()
+        state.clipboard = ClipboardSession(enabled=False)
+        if name == "hotkey":
+            # The hotkey's 20 ms release delay is a deliberate wait, not overhead
+            state.scheduler.sleep = lambda duration, control=None: None
+
+        loop = iter(range(1, 10**9))
+        seconds = measure(lambda: engine.execute_plan(plan, next(loop), state), number=20)
+        results[f"engine.{name}"] = (_us(seconds / batch), "us/op")
+    return results
+
+
+# =============================================================================
+# Plan
+# =============================================================================
+
+
+def _nested_repeat(depth, width):
+    """A repeat block nested depth levels deep, with width key steps per level."""
+    step = {"action": "key", "value": "tab"}
+    for _ in range(depth):
+        step = {
+            "action": "repeat",
+            "times": 2,
+            "delay": 0,
+            "children": [{"action": "key", "value": "tab"} for _ in range(width)] + [step],
+        }
+    return [step]
+
+
+def bench_plan():
+    from plan import compile_pattern, count_plan_steps, coalesce_plan
+
+    results = {}
+    sequence = _nested_repeat(depth=30, width=5)
+    _, plan = compile_pattern([], sequence)
+
+    seconds = measure(lambda: compile_pattern([], sequence), number=50)
+    results["plan.compile_nested"] = (_us(seconds), "us/op")
+
+    seconds = measure(lambda: count_plan_steps(plan), number=500)
+    results["plan.count_steps_nested"] = (_us(seconds), "us/op")
+
+    flat = compile_pattern([], [{"action": "key", "value": "tab"}] * 2000)[1]
+    seconds = measure(lambda: coalesce_plan(flat), number=20)
+    results["plan.coalesce_2000_keys"] = (_us(seconds), "us/op")
+    return results
+
+
+# =============================================================================
+# Pattern Store
+# =============================================================================
+
+STORE_PATTERNS = 10000
+
+
+def _synthetic_pattern(n, rng):
+    steps = [{"action": "key", "value": "tab"} for _ in range(rng.randint(1, 20))]
+    return {
+        "name": f"Pattern {n:05d}",
+        "description": f"Synthetic pattern number {n} for zone {n % 37}",
+        "target_window": f"Window {n % 11}",
+        "loop_count": rng.randint(1, 100),
+        "sequence": steps,
+        "created_at": "2025-01-01T00:00:00",
+        "updated_at": "2025-01-01T00:00:00",
+    }
+
+
+def _bench_store(prefix, store, names):
+    results = {}
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    store.list()
+    results[f"{prefix}.list_cold"] = (round((time.perf_counter() - start) * 1000, 3), "ms")
+
+    seconds = measure(lambda: store.list(), number=3)
+    results[f"{prefix}.list_all"] = (round(seconds * 1000, 3), "ms")
+
+    seconds = measure(lambda: store.list(limit=50, offset=5000), number=3)
+    results[f"{prefix}.list_page"] = (round(seconds * 1000, 3), "ms")
+
+    seconds = measure(lambda: store.list(q="zone 7", limit=50), number=3)
+    results[f"{prefix}.search"] = (round(seconds * 1000, 3), "ms")
+
+    seconds = measure(lambda: store.get(rng.choice(names)), number=200)
+    results[f"{prefix}.get"] = (_us(seconds), "us/op")
+    return results
+
+
+def bench_store():
+    from pattern_store import FilePatternStore, SQLitePatternStore
+
+    rng = random.Random(0)
+    patterns = [_synthetic_pattern(n, rng) for n in range(STORE_PATTERNS)]
+    names = [p["name"] for p in patterns]
+
+    tmp = tempfile.mkdtemp(prefix="keystroker-bench-")
+    try:
+        results = {}
+
+        file_store = FilePatternStore(os.path.join(tmp, "patterns"))
+        for pattern in patterns:
+            file_store.save(pattern["name"], pattern)
+        results.update(_bench_store("store.file", FilePatternStore(file_store.directory), names))
+
+        db_store = SQLitePatternStore(os.path.join(tmp, "patterns.db"))
+        db_store.save_many((p["name"], p) for p in patterns)
+        results.update(_bench_store("store.sqlite", db_store, names))
+        return results
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =============================================================================
+# Clipboard Paste
+# =============================================================================
+
+
+def bench_paste():
+    try:
+        import pyperclip
+        import engine
+        from clipboard import ClipboardSession
+        from input_backends import NullBackend
+
+        pyperclip.paste()
+    except Exception as e:
+        reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+        raise Skip(f"no usable clipboard ({reason})")
+
+    class PasteBackend(NullBackend):
+        """Null backend that still types through the clipboard."""
+
+        uses_clipboard = True
+
+    backend = PasteBackend()
+    texts = iter(f"Item_{n}" for n in range(10**9))
+    with ClipboardSession(paste_hold=0) as session:
+        seconds = measure(
+            lambda: engine.type_text_safe(next(texts), 0, session, backend), number=50
+        )
+    return {"paste.type_text_safe": (_us(seconds), "us/op")}
+
+
+# =============================================================================
+# Progress Stream
+# =============================================================================
+
+PROGRESS_SUBSCRIBERS = 10
+
+
+def _drain(broadcaster):
+    for _ in broadcaster.subscribe(max_rate=0):
+        pass
+
+
+def bench_progress():
+    from progress import ProgressBroadcaster
+
+    results = {}
+    message = {"type": "progress", "current_step": 1}
+
+    # Cost to the run of publishing one update, alone and with live subscribers
+    broadcaster = ProgressBroadcaster()
+    seconds = measure(lambda: broadcaster.publish(message), number=10000)
+    results["progress.publish"] = (_us(seconds), "us/op")
+
+    broadcaster = ProgressBroadcaster()
+    threads = [
+        threading.Thread(target=_drain, args=(broadcaster,), daemon=True)
+        for _ in range(PROGRESS_SUBSCRIBERS)
+    ]
+    for thread in threads:
+        thread.start()
+    seconds = measure(lambda: broadcaster.publish(message), number=10000)
+    broadcaster.publish({"type": "complete"})
+    for thread in threads:
+        thread.join()
+    results[f"progress.publish_{PROGRESS_SUBSCRIBERS}_subscribers"] = (_us(seconds), "us/op")
+    return results
+
+
+def bench_sse():
+    """End to end through the /progress SSE route, unthrottled."""
+    try:
+        from app import app
+        from jobs import executor
+        from plan import parse_run_params
+    except Exception as e:
+        raise Skip(f"app not importable ({e})")
+
+    params = parse_run_params(
+        {
+            "sequence": [{"action": "key", "value": "tab"}, {"action": "wait", "value": 0.0005}],
+            "loop_count": 1000,
+            "start_delay": 0,
+            "backend": "null",
+        }
+    )
+    state = executor.submit(params)
+    received = 0
+    start = time.perf_counter()
+    response = app.test_client().get(f"/progress?job={state.job_id}&max_rate=0", buffered=False)
+    for chunk in response.response:
+        received += chunk.count(b"id: ")
+    elapsed = time.perf_counter() - start
+    response.close()
+    state.done.wait()
+    return {"sse.events_per_s": (round(received / elapsed, 1), "events/s")}
+
+
+BENCHMARKS = {
+    "engine": bench_engine,
+    "plan": bench_plan,
+    "store": bench_store,
+    "paste": bench_paste,
+    "progress": bench_progress,
+    "sse": bench_sse,
+}
+
+# Units where a higher number is better; everything else is a duration
+HIGHER_IS_BETTER = ("events/s",)
+
+
+# =============================================================================
+# Results
+# =============================================================================
+
+
+def run_benchmarks(groups):
+    """
+    Run the selected benchmark groups.
+
+    Returns:
+        dict: {"meta": {...}, "results": {name: {"value", "unit"}}, "skipped": {group: reason}}
+    """
+    results = {}
+    skipped = {}
+    for group in groups:
+        try:
+            for name, (value, unit) in BENCHMARKS[group]().items():
+                results[name] = {"value": value, "unit": unit}
+        except Skip as e:
+            skipped[group] = str(e)
+    return {
+        "meta": {
+            "version": VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a baseline.
+
+    Returns:
+        list: (name, baseline value, current value, change, regressed) per
+        benchmark present in both; change is relative, positive means worse
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["value"]:
+            continue
+        change = (result["value"] - base["value"]) / base["value"]
+        if result["unit"] in HIGHER_IS_BETTER:
+            change = -change
+        rows.append((name, base["value"], result["value"], change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the KeyStroker benchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="Run only these benchmark groups")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline file (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare against the baseline; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown counted as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.only or list(BENCHMARKS))
+
+    for name, result in current["results"].items():
+        print(f"{name:32} {result['value']:>14} {result['unit']}")
+    for group, reason in current["skipped"].items():
+        print(f"{group:32} skipped: {reason}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}", file=sys.stderr)
+            return 2
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+        rows = compare(current, baseline, args.threshold)
+        print()
+        for name, base, value, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:32} {base:>12} -> {value:<12} {change:+.1%}{flag}")
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Run checkpoints for KeyStroker.
+Records how far a loop run got, so an interrupted run can continue where it stopped.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from plan import OP_TYPE_RANGE, OP_REPEAT
+from pattern_store import atomic_write
+
+DEFAULT_JOURNAL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "checkpoints.json"
+)
+
+# A finished loop is written to disk at most this often while a run is going,
+# so loops shorter than this do not each pay for a synced write. The last
+# finished loop is always written when the run stops or fails; only a hard
+# crash (power loss, killed process) can lose the loops of the last interval,
+# which a resumed run then types again
+MIN_SAVE_INTERVAL = 0.5
+
+# Number of checkpoints kept in the journal (oldest are dropped first)
+MAX_CHECKPOINTS = 50
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def type_range_cursor(plan, next_loop):
+    """Numbers the type_range steps of a plan will type in loop next_loop."""
+    cursor = []
+    for instruction in plan:
+        if instruction[0] == OP_TYPE_RANGE:
+            _, start, range_length, _, _ = instruction
+            cursor.append(start + ((next_loop - 1) % range_length))
+        elif instruction[0] == OP_REPEAT:
+            cursor.extend(type_range_cursor(instruction[3], next_loop))
+    return cursor
+
+
+class CheckpointJournal:
+    """
+    Small JSON journal of the last finished loop per pattern.
+
+    Keyed by pattern_hash. Written atomically and synced (temp file + fsync
+    + rename), so a crash leaves either the old or the new journal, never a
+    torn one. See MIN_SAVE_INTERVAL for how often it is written.
+    Errors writing the file are ignored; the run matters more than its
+    checkpoint.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, min_interval=MIN_SAVE_INTERVAL,
+                 fsync=None):
+        self.path = path
+        self.min_interval = min_interval
+        if fsync is None:
+            fsync = os.environ.get("KEYSTROKER_FSYNC", "1") != "0"
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._last_save = 0.0
+        self._dirty = False
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("checkpoints", {})
+        except (json.JSONDecodeError, IOError, AttributeError):
+            return {}
+
+    def _save(self):
+        """Write the journal file atomically. Caller must hold the lock."""
+        ordered = sorted(self._entries.items(), key=lambda item: item[1]["updated_at"])
+        for key, _ in ordered[: max(0, len(ordered) - MAX_CHECKPOINTS)]:
+            del self._entries[key]
+
+        self._last_save = time.monotonic()
+        text = json.dumps({"checkpoints": self._entries}, indent=2, ensure_ascii=False)
+        try:
+            atomic_write(self.path, text, self.fsync)
+            self._dirty = False
+        except OSError:
+            # A journal that cannot be written must not break the run itself;
+            # checkpoints stay in memory and are retried on the next save
+            pass
+
+    def get(self, key):
+        """Return the checkpoint for a pattern hash, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def list(self):
+        """Return all checkpoints, most recent first."""
+        with self._lock:
+            entries = [dict(entry, pattern_hash=key) for key, entry in self._entries.items()]
+        return sorted(entries, key=lambda e: e["updated_at"], reverse=True)
+
+    def record(self, key, checkpoint):
+        """
+        Store the checkpoint for a pattern hash.
+
+        The entry is always updated in memory; the file is rewritten at most
+        every min_interval seconds (call flush() to write it right away), and
+        once a later record() or flush() writes it, it is on disk.
+        """
+        with self._lock:
+            self._entries[key] = dict(checkpoint, updated_at=_now())
+            self._dirty = True
+            if time.monotonic() - self._last_save >= self.min_interval:
+                self._save()
+
+    def flush(self):
+        """Write checkpoints that were only recorded in memory."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def clear(self, key):
+        """Forget the checkpoint for a pattern hash. Returns True if one existed."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            del self._entries[key]
+            self._save()
+            return True
@@ -0,0 +1,204 @@
+"""
+Clipboard handling for KeyStroker.
+Text is typed by pasting from the clipboard so it works with any keyboard layout.
+"""
+
+import time
+import threading
+import importlib.util
+from collections import deque
+
+# pyperclip is used for clipboard-based typing (better keyboard layout
+# support). It is only imported once a session actually uses the clipboard.
+PYPERCLIP_AVAILABLE = importlib.util.find_spec("pyperclip") is not None
+
+# Longest time to wait for the clipboard to report newly copied text
+DEFAULT_SYNC_TIMEOUT = 0.5
+
+# Minimum time pasted text stays on the clipboard before it may be replaced,
+# giving the target application time to read it
+DEFAULT_PASTE_HOLD = 0.05
+
+# Polling backoff bounds while waiting for the clipboard to settle
+POLL_INITIAL = 0.0005
+POLL_MAX = 0.008
+
+# Percentile of recent settle times waited out before the first read. Below
+# the median, so the wait stays under what copies usually take
+INITIAL_WAIT_PERCENTILE = 0.4
+
+
+class ClipboardTimeout(Exception):
+    """Raised when the clipboard does not report the copied text in time."""
+
+
+class SettleStats:
+    """
+    Recent clipboard settle latencies: how long a copy took, initial wait
+    included, until the copied content read back.
+
+    A percentile a little below the median is used as the initial wait
+    before polling, so on a fast machine a copy costs about one read, and on
+    a slow one the polling does not waste reads that are bound to fail.
+    A copy that already reads back after the wait only shows that it took
+    at most that long, so it is sampled a quarter below the wait. Waits
+    that are too long thus pull the percentile down and waits that are too
+    short push it up, and it settles instead of ratcheting.
+    """
+
+    def __init__(self, size=50):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def expected(self, percentile=0.5):
+        """
+        Observed latency in seconds at percentile (default: the median);
+        0 until something is recorded.
+        """
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)]
+
+    def snapshot(self):
+        """Summary of the recorded latencies in milliseconds."""
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"count": 0, "median_ms": None, "max_ms": None}
+        ordered = sorted(samples)
+        return {
+            "count": len(samples),
+            "median_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+
+# Shared across runs so the learned latency survives from one run to the next
+settle_stats = SettleStats()
+
+
+class ClipboardSession:
+    """
+    Borrows the user's clipboard for the duration of a run.
+
+    The original content is saved once when the session opens and restored
+    once when it closes, instead of around every typed field. Use it as a
+    context manager so the clipboard is restored even when the run aborts.
+
+    Instead of fixed sleeps, a copy waits until the clipboard reads back the
+    new text, and replacing pasted text waits only for whatever is left of
+    the paste hold time.
+
+    A session created with enabled=False leaves the clipboard untouched.
+    """
+
+    def __init__(self, timeout=DEFAULT_SYNC_TIMEOUT, paste_hold=DEFAULT_PASTE_HOLD, enabled=True):
+        self.available = PYPERCLIP_AVAILABLE and enabled
+        self._clip = None
+        if self.available:
+            import pyperclip
+
+            self._clip = pyperclip
+        self.timeout = timeout
+        self.paste_hold = paste_hold
+        self._saved = ""
+        self._current = None
+        self._pasted_at = None
+
+    def open(self):
+        """Save the current clipboard content."""
+        if not self.available:
+            return
+        try:
+            self._saved = self._clip.paste()
+        except Exception:
+            self._saved = ""
+
+    def close(self):
+        """Restore the clipboard content saved by open()."""
+        if not self.available:
+            return
+        try:
+            if self._saved:
+                self._wait_paste_hold()
+                self._clip.copy(self._saved)
+        except Exception:
+            pass
+        self._current = None
+
+    def copy(self, text):
+        """
+        Put text on the clipboard and wait until it is readable.
+
+        Returns:
+            bool: True if the clipboard content changed, False if it already
+            held this text (no copy needed)
+
+        Raises:
+            ClipboardTimeout: If the clipboard does not settle within timeout
+        """
+        if text == self._current:
+            return False
+
+        self._wait_paste_hold()
+        self._current = None
+        self._clip.copy(text)
+        self._wait_for(text)
+        self._current = text
+        return True
+
+    def mark_pasted(self):
+        """Record that the paste shortcut was just sent."""
+        self._pasted_at = time.perf_counter()
+
+    def _wait_paste_hold(self):
+        if self._pasted_at is None:
+            return
+        remaining = self.paste_hold - (time.perf_counter() - self._pasted_at)
+        if remaining > 0:
+            time.sleep(remaining)
+        self._pasted_at = None
+
+    def _wait_for(self, text):
+        """Poll with exponential backoff until the clipboard holds text."""
+        start = time.perf_counter()
+        expected = min(settle_stats.expected(INITIAL_WAIT_PERCENTILE), self.timeout)
+        if expected > 0:
+            time.sleep(expected)
+
+        delay = POLL_INITIAL
+        first_read = True
+        while True:
+            try:
+                ready = self._clip.paste() == text
+            except Exception:
+                ready = False
+            now = time.perf_counter()
+            elapsed = now - start
+            if ready:
+                # Ready on the first read: it got there some time during the
+                # wait, so count it as a little faster than the wait
+                latency = elapsed - expected / 4 if first_read else elapsed
+                settle_stats.record(min(latency, self.timeout))
+                return
+            first_read = False
+            if elapsed >= self.timeout:
+                raise ClipboardTimeout(
+                    f"Clipboard did not update within {self.timeout * 1000:.0f} ms"
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,608 @@
+"""
+Execution engine for KeyStroker.
+Runs compiled pattern plans against the keyboard and mouse.
+"""
+
+import time
+import threading
+from datetime import datetime
+
+# Import cross-platform window manager
+from window_manager import WindowTarget
+
+from plan import (
+    count_plan_steps,
+    instruction_steps,
+    OP_NOP,
+    OP_TYPE,
+    OP_TYPE_RANGE,
+    OP_KEY,
+    OP_HOTKEY,
+    OP_WAIT,
+    OP_CLICK,
+    OP_MOVE,
+    OP_REPEAT,
+    OP_KEYS,
+)
+
+from clipboard import ClipboardSession, DEFAULT_SYNC_TIMEOUT
+from scheduler import DeadlineScheduler
+from progress import ProgressBroadcaster
+from input_backends import create_backend, failsafe_exception, DEFAULT_BACKEND
+from checkpoint import type_range_cursor
+
+# Job status values
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_PAUSED = "paused"
+STATUS_COMPLETED = "completed"
+STATUS_STOPPED = "stopped"
+STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_STOPPED, STATUS_FAILED)
+
+
+class RunError(Exception):
+    """Raised when a run cannot start or continue (e.g. target window missing)."""
+
+
+class RunStopped(Exception):
+    """Raised inside a run when a stop was requested through the jobs API."""
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class RunState:
+    """
+    Progress and result of a single pattern run.
+
+    Each run owns its own counters and progress broadcaster, so concurrent
+    runs never share state.
+
+    Stop and pause requests (request_stop/request_pause/request_resume) are
+    picked up by checkpoint(), which the engine calls before every
+    instruction, and wake any scheduler wait immediately via wait().
+    """
+
+    def __init__(self, job_id, params):
+        self.job_id = job_id
+        self.params = params
+        self.status = STATUS_QUEUED
+        self.current_loop = 0
+        self.total_loops = 0
+        self.current_step = 0
+        self.total_steps = 0
+        self.message = ""
+        self.error = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = ProgressBroadcaster()
+        self.done = threading.Event()
+        self.clipboard = None  # ClipboardSession while the run is active
+        self.scheduler = None  # DeadlineScheduler timing the run's waits
+        self.backend = None  # InputBackend the run sends input through
+        self.timing = None  # Final timing statistics once finished
+        self.on_resume = None  # Called after a pause, before input continues
+        self.resumed_from = None  # Last finished loop of the checkpoint resumed from
+        self.window = None  # WindowTarget in auto target mode
+        self.refocused = 0  # Times the target had to be brought back to the front
+
+        # Control requests; _interrupted is read without the lock on the hot path
+        self._control = threading.Condition()
+        self._stop_requested = False
+        self._pause_requested = False
+        self._interrupted = False
+
+    @property
+    def running(self):
+        return self.status == STATUS_RUNNING
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    # Control
+
+    def request_stop(self):
+        """Ask the run to stop; takes effect at the next checkpoint or wait."""
+        with self._control:
+            self._stop_requested = True
+            self._interrupted = True
+            self._control.notify_all()
+
+    def request_pause(self):
+        """Ask the run to pause before its next instruction (or mid-wait)."""
+        with self._control:
+            self._pause_requested = True
+            self._interrupted = True
+            self._control.notify_all()
+
+    def request_resume(self):
+        """Let a paused run continue."""
+        with self._control:
+            self._pause_requested = False
+            self._interrupted = self._stop_requested
+            self._control.notify_all()
+
+    def wait(self, timeout):
+        """
+        Sleep up to timeout seconds unless a stop or pause is requested.
+
+        Returns:
+            bool: True if woken early by a control request
+        """
+        with self._control:
+            return self._control.wait_for(lambda: self._interrupted, timeout)
+
+    def checkpoint(self):
+        """
+        Act on pending control requests.
+
+        Raises RunStopped if a stop was requested. While paused, blocks until
+        resumed or stopped; the paused time is taken out of the schedule so
+        the run continues exactly where it left off.
+
+        Raises:
+            RunStopped: If the run should stop
+        """
+        # Loops when the run is paused or stopped again during on_resume
+        while self._interrupted:
+            with self._control:
+                if self._stop_requested:
+                    raise RunStopped()
+                if not self._pause_requested:
+                    return
+
+                if self.backend is not None:
+                    self.backend.flush()
+                self.status = STATUS_PAUSED
+                self.publish({"type": "paused", "job_id": self.job_id})
+                paused_at = time.perf_counter()
+                self._control.wait_for(
+                    lambda: self._stop_requested or not self._pause_requested
+                )
+                if self._stop_requested:
+                    raise RunStopped()
+                self.status = STATUS_RUNNING
+                if self.scheduler is not None:
+                    self.scheduler.shift(time.perf_counter() - paused_at)
+
+            if self.on_resume is not None:
+                self.on_resume()
+            self.publish({"type": "resumed", "job_id": self.job_id})
+
+    def report_progress(self):
+        """Send progress update to SSE clients."""
+        self.publish(
+            {
+                "type": "progress",
+                "current_loop": self.current_loop,
+                "total_loops": self.total_loops,
+                "current_step": self.current_step,
+                "total_steps": self.total_steps,
+            }
+        )
+
+    def publish(self, message):
+        """Broadcast a message to SSE clients (progress updates are coalesced)."""
+        self.progress.publish(message)
+
+    def finish(self, status, message="", error=None):
+        """Mark the run as finished and notify listeners."""
+        self.status = status
+        self.message = message
+        self.error = error
+        self.finished_at = _now()
+        if self.scheduler is not None:
+            self.timing = self.scheduler.stats()
+        self.publish(self.terminal_message())
+        self.done.set()
+
+    def terminal_message(self):
+        """SSE message announcing the end of the run."""
+        return {
+            "type": "complete" if self.status == STATUS_COMPLETED else "stopped",
+            "job_id": self.job_id,
+            "status": self.status,
+        }
+
+    def to_dict(self):
+        """Serialize the run state for the jobs API."""
+        timing = self.timing
+        if timing is None and self.scheduler is not None:
+            timing = self.scheduler.stats()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "current_loop": self.current_loop,
+            "total_loops": self.total_loops,
+            "current_step": self.current_step,
+            "total_steps": self.total_steps,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timing": timing,
+            "backend": self.params.get("backend", DEFAULT_BACKEND),
+            "resumed_from": self.resumed_from,
+            "refocused": self.refocused,
+        }
+
+
+def type_text_safe(text, interval=0, clipboard=None, backend=None):
+    """
+    Type text using clipboard paste method for non-QWERTY keyboard compatibility.
+    This works correctly with AZERTY, QWERTZ, and other keyboard layouts.
+    Falls back to direct typing if clipboard method fails.
+
+    Args:
+        text: The text to type
+        interval: Delay between characters (only used in fallback mode)
+        clipboard: Open ClipboardSession of the current run. Without one, the
+            user's clipboard is saved and restored around this single call.
+        backend: InputBackend to type through (pyautogui if not given)
+    """
+    if not text:
+        return
+
+    if backend is None:
+        backend = create_backend()
+
+    if clipboard is None and backend.uses_clipboard:
+        with ClipboardSession() as session:
+            return type_text_safe(text, interval, session, backend)
+
+    # Try clipboard method first (works with any keyboard layout)
+    if backend.uses_clipboard and clipboard.available:
+        try:
+            # Copy text to clipboard (waits until the clipboard reports it)
+            clipboard.copy(text)
+
+            # Paste using keyboard shortcut
+            backend.paste()
+
+            # Keep the text on the clipboard long enough for the paste to land
+            clipboard.mark_pasted()
+
+            return  # Success - exit function
+
+        except failsafe_exception():
+            raise
+        except Exception:
+            pass  # Fall through to direct typing (also on clipboard timeout)
+
+    # Fallback: direct typing (may not work correctly with non-QWERTY keyboards)
+    backend.write(text, interval)
+
+
+# =============================================================================
+# Instruction Handlers
+# =============================================================================
+
+
+def _format_text(parts, loop_index):
+    """Rebuild typed text from its pre-split parts, inserting the loop index for {i}."""
+    if len(parts) == 1:
+        return parts[0]
+    return str(loop_index).join(parts)
+
+
+def _sleep(state, duration):
+    """Deliver queued input, then wait until the next deadline."""
+    state.backend.flush()
+    state.scheduler.sleep(duration, state)
+
+
+def _run_nop(instruction, loop_index, state):
+    pass
+
+
+def _run_type(instruction, loop_index, state):
+    _, parts, interval, _ = instruction
+    # Use clipboard-based typing for keyboard layout compatibility (AZERTY, etc.)
+    type_text_safe(_format_text(parts, loop_index), interval, state.clipboard, state.backend)
+
+
+def _run_type_range(instruction, loop_index, state):
+    _, start, range_length, width, interval = instruction
+    # Calculate current number with wrap-around
+    current_number = start + ((loop_index - 1) % range_length)
+    number_str = str(current_number).zfill(width) if width else str(current_number)
+    type_text_safe(number_str, interval, state.clipboard, state.backend)
+
+
+def _run_key(instruction, loop_index, state):
+    state.backend.press((instruction[1],))
+
+
+def _run_keys(instruction, loop_index, state):
+    state.backend.press(instruction[1])
+
+
+def _run_hotkey(instruction, loop_index, state):
+    _, keys, modifiers = instruction
+    state.backend.hotkey(keys, modifiers)
+    # Small delay to ensure keys are fully released
+    _sleep(state, 0.02)
+
+
+def _run_wait(instruction, loop_index, state):
+    _sleep(state, instruction[1])
+
+
+def _run_click(instruction, loop_index, state):
+    _, x, y, button, clicks = instruction
+    # x is None for a click at the current mouse position
+    state.backend.click(x, y, button, clicks)
+
+
+def _run_move(instruction, loop_index, state):
+    _, x, y, duration = instruction
+    state.backend.move_to(x, y, duration)
+
+
+# Opcode dispatch table for compiled plan instructions
+INSTRUCTION_HANDLERS = {
+    OP_NOP: _run_nop,
+    OP_TYPE: _run_type,
+    OP_TYPE_RANGE: _run_type_range,
+    OP_KEY: _run_key,
+    OP_KEYS: _run_keys,
+    OP_HOTKEY: _run_hotkey,
+    OP_WAIT: _run_wait,
+    OP_CLICK: _run_click,
+    OP_MOVE: _run_move,
+}
+
+
+def execute_plan(plan, loop_index, state):
+    """
+    Execute a compiled instruction list (see plan.compile_sequence).
+
+    Args:
+        plan: List of instruction tuples
+        loop_index: The current loop iteration (1-based) for {i} replacement
+        state: RunState receiving progress updates
+    """
+    for instruction in plan:
+        opcode = instruction[0]
+
+        if opcode == OP_REPEAT:
+            # Counted repeat block - execute body multiple times
+            _, times, delay, body, _ = instruction
+            for r in range(times):
+                execute_plan(body, loop_index, state)
+
+                # Delay between repetitions (not after the last one)
+                if delay > 0 and r < times - 1:
+                    _sleep(state, delay)
+            continue
+
+        state.checkpoint()
+        state.current_step += instruction_steps(instruction)
+        state.report_progress()
+        INSTRUCTION_HANDLERS[opcode](instruction, loop_index, state)
+
+
+# =============================================================================
+# Run Orchestration
+# =============================================================================
+
+
+def focus_target_window(target, scheduler, control=None):
+    """
+    Bring the target window to the foreground.
+
+    Args:
+        target: WindowTarget to focus (resolved on first use, then cached)
+        scheduler: DeadlineScheduler timing the run
+        control: RunState whose stop/pause requests interrupt the settle wait
+
+    Raises:
+        RunError: If the window is missing or cannot be activated
+    """
+    try:
+        # Use cross-platform window manager
+        found = target.exists()
+        success = found and target.activate()
+    except Exception as e:
+        raise RunError(f"Failed to focus window: {str(e)}")
+
+    if not found:
+        raise RunError(
+            f"Window '{target.name}' not found. Please refresh the window list."
+        )
+    if not success:
+        raise RunError(
+            f"Failed to activate '{target.name}'. Try selecting it manually."
+        )
+    scheduler.sleep(0.5, control)  # Brief pause for window to come to front
+
+
+def guard_foreground(state):
+    """
+    Make sure the target window still has focus before the next loop.
+
+    A popup that took focus would otherwise receive the loop's input. The
+    check uses the cached window handle; if focus was lost, the target is
+    brought back to the front.
+
+    Raises:
+        RunError: If the target window cannot be brought back
+    """
+    if state.window is None:
+        return
+    # Deliver the previous loop's input to the window it was meant for
+    state.backend.flush()
+    if state.window.is_foreground() is False:
+        state.refocused += 1
+        focus_target_window(state.window, state.scheduler, state)
+
+
+def resume_countdown(state):
+    """
+    Runs when a paused run resumes, before any more input is sent.
+
+    The user just clicked Resume, so the browser has the focus: wait the
+    start delay again (announced with a "resuming" event for the countdown),
+    then bring the target window back to the front in auto target mode.
+
+    The countdown runs from now, off the run's timeline, which is then moved
+    by the time it took, so a wait the pause interrupted keeps what it had
+    left. Another pause or a stop ends the countdown early; checkpoint()
+    then handles it.
+    """
+    delay = state.params["start_delay"]
+    started = time.perf_counter()
+    try:
+        if delay > 0:
+            state.publish({"type": "resuming", "job_id": state.job_id, "delay": delay})
+            if state.wait(delay):
+                return
+        if state.window is not None:
+            focus_target_window(state.window, DeadlineScheduler())
+    finally:
+        state.scheduler.shift(time.perf_counter() - started)
+
+
+def _journal_finished_loop(state, journal, loop_index):
+    """Journal that loop_index (0 = startup sequence) has finished."""
+    params = state.params
+    journal.record(
+        params["pattern_hash"],
+        {
+            "name": params.get("name"),
+            "job_id": state.job_id,
+            "loop": loop_index,
+            "loop_count": params["loop_count"],
+            "step": state.current_step,
+            "type_range": type_range_cursor(params["main_plan"], loop_index + 1),
+        },
+    )
+
+
+def run_pattern(state, journal=None):
+    """
+    Execute the run described by state.params, updating state as it goes.
+
+    Args:
+        state: RunState of the run
+        journal: CheckpointJournal recording each finished loop. With the
+            "resume" run option, the run continues after the journaled loop
+            (the startup sequence is not repeated).
+
+    The "start_loop" run option skips the loops before it; the startup
+    sequence still runs first.
+
+    Never raises; the outcome is recorded on the RunState.
+    """
+    params = state.params
+    startup_plan = params["startup_plan"]
+    main_plan = params["main_plan"]
+    loop_count = params["loop_count"]
+
+    first_loop = params.get("start_loop", 1)
+    checkpoint = None
+    if journal is not None and params.get("resume"):
+        checkpoint = journal.get(params["pattern_hash"])
+    if checkpoint is not None:
+        first_loop = checkpoint["loop"] + 1
+        state.resumed_from = checkpoint["loop"]
+
+    # Initialize progress tracking
+    state.total_loops = loop_count
+    state.total_steps = (
+        count_plan_steps(startup_plan) + count_plan_steps(main_plan) * loop_count
+    )
+    if checkpoint is not None:
+        # Steps done before the checkpoint count as done
+        state.current_step = min(checkpoint["step"], state.total_steps)
+    elif first_loop > 1:
+        # So do the loops skipped with start_loop
+        state.current_step = min(
+            count_plan_steps(main_plan) * (first_loop - 1), state.total_steps
+        )
+    state.status = STATUS_RUNNING
+    state.started_at = _now()
+    clipboard_timeout = params.get("clipboard_timeout") or DEFAULT_SYNC_TIMEOUT
+    scheduler = state.scheduler = DeadlineScheduler(
+        precise=params.get("precise_timing", False)
+    )
+
+    try:
+        # Step 1: Focus target window (if auto mode)
+        if params["target_mode"] == "auto" and params["target_window"]:
+            state.window = WindowTarget(params["target_window"])
+            focus_target_window(state.window, scheduler, state)
+
+        # Input after a pause goes to the target again, not to the browser
+        state.on_resume = lambda: resume_countdown(state)
+
+        # Step 2: Start delay (countdown is also shown by the frontend)
+        state.checkpoint()
+        scheduler.sleep(params["start_delay"], state)
+
+        state.backend = create_backend(params.get("backend", DEFAULT_BACKEND))
+
+        # Borrow the clipboard once for the whole run; it is restored when
+        # the block exits, including on an emergency stop
+        with ClipboardSession(
+            timeout=clipboard_timeout, enabled=state.backend.uses_clipboard
+        ) as clipboard:
+            state.clipboard = clipboard
+
+            # Step 3: Execute startup sequence ONCE (already done when resuming)
+            if startup_plan and checkpoint is None:
+                state.current_loop = 0  # 0 indicates startup phase
+                execute_plan(startup_plan, 1, state)  # loop_index = 1 for startup
+                if journal is not None:
+                    _journal_finished_loop(state, journal, 0)
+
+            # Step 4: Execute main sequence in loops
+            for i in range(first_loop, loop_count + 1):
+                state.current_loop = i
+                guard_foreground(state)
+                execute_plan(main_plan, i, state)
+                if journal is not None:
+                    _journal_finished_loop(state, journal, i)
+
+            state.backend.flush()
+
+        if journal is not None:
+            journal.clear(params["pattern_hash"])
+
+        if checkpoint is None and first_loop > loop_count:
+            message = f"Nothing to run: start loop {first_loop} is after the last loop ({loop_count})"
+        elif checkpoint is None and first_loop > 1:
+            message = f"Completed loops {first_loop}-{loop_count} successfully!"
+        elif checkpoint is None:
+            message = f"Completed {loop_count} loop(s) successfully!"
+        elif first_loop > loop_count:
+            message = f"Nothing to resume: loop {first_loop - 1} of {loop_count} was already done"
+        else:
+            message = f"Resumed after loop {first_loop - 1}; completed loops {first_loop}-{loop_count}"
+        state.finish(STATUS_COMPLETED, message=message)
+
+    except RunStopped:
+        state.finish(STATUS_STOPPED, error="Stopped by user.")
+    except failsafe_exception():
+        state.finish(
+            STATUS_STOPPED,
+            error="Emergency stop triggered! Mouse moved to top-left corner.",
+        )
+    except Exception as e:
+        state.finish(STATUS_FAILED, error=str(e))
+    finally:
+        state.clipboard = None
+        if journal is not None:
+            # Make sure the last finished loop is on disk for a later resume
+            journal.flush()
+        if state.backend is not None:
+            try:
+                state.backend.close()
+            except Exception:
+                pass
@@ -0,0 +1,436 @@
+"""
+Input backends for KeyStroker.
+The engine sends keyboard and mouse input through one of these, selected per run.
+"""
+
+import os
+import sys
+import time
+import importlib.util
+
+from window_manager import get_platform
+
+# Backend names accepted by the "backend" run option
+BACKEND_PYAUTOGUI = "pyautogui"
+BACKEND_XTEST = "xtest"
+BACKEND_NULL = "null"
+BACKEND_RECORDING = "recording"
+
+BACKENDS = (BACKEND_PYAUTOGUI, BACKEND_XTEST, BACKEND_NULL, BACKEND_RECORDING)
+
+DEFAULT_BACKEND = BACKEND_PYAUTOGUI
+
+# Mouse moves with a duration are sent as this many positions per second
+MOVE_STEPS_PER_SECOND = 60
+
+
+class _FailSafeNotLoaded(Exception):
+    """Stands in for pyautogui.FailSafeException while pyautogui is not imported."""
+
+
+def failsafe_exception():
+    """
+    Return pyautogui.FailSafeException without importing pyautogui for it.
+
+    pyautogui is only imported by the backends that use it; until then no
+    fail-safe can have fired, and a placeholder that is never raised is
+    returned instead.
+    """
+    pyautogui = sys.modules.get("pyautogui")
+    return pyautogui.FailSafeException if pyautogui is not None else _FailSafeNotLoaded
+
+
+class InputBackend:
+    """
+    Interface the execution engine sends input through.
+
+    Backends may queue events and only deliver them on flush(). The engine
+    flushes before every wait, so timing between waits is unaffected.
+
+    Attributes:
+        name: Backend name as used in the "backend" run option
+        uses_clipboard: Whether text is typed by pasting from the clipboard
+    """
+
+    name = None
+    uses_clipboard = True
+
+    def press(self, keys):
+        """Press and release each key in keys, in order."""
+        raise NotImplementedError
+
+    def hotkey(self, keys, modifiers=()):
+        """Press keys together, then make sure modifiers are released."""
+        raise NotImplementedError
+
+    def write(self, text, interval=0):
+        """Type text key by key, waiting interval seconds after each character."""
+        raise NotImplementedError
+
+    def click(self, x, y, button="left", clicks=1):
+        """Click at (x, y), or at the current position if x is None."""
+        raise NotImplementedError
+
+    def move_to(self, x, y, duration=0):
+        """Move the mouse to (x, y) over duration seconds."""
+        raise NotImplementedError
+
+    def paste(self):
+        """Send the platform's paste shortcut."""
+        if get_platform() == "macos":
+            self.hotkey(("command", "v"))
+        else:
+            self.hotkey(("ctrl", "v"))
+
+    def flush(self):
+        """Deliver any queued events."""
+
+    def close(self):
+        """Flush and release resources at the end of a run."""
+        self.flush()
+
+
+# =============================================================================
+# pyautogui
+# =============================================================================
+
+
+class PyAutoGUIBackend(InputBackend):
+    """
+    Sends input through pyautogui, one call per action.
+
+    pyautogui applies its PAUSE after every call and checks the fail-safe
+    corner before each one.
+    """
+
+    name = BACKEND_PYAUTOGUI
+
+    def __init__(self):
+        import pyautogui
+
+        # Enable failsafe - move mouse to top-left corner to abort
+        pyautogui.FAILSAFE = True
+        self._gui = pyautogui
+
+    def press(self, keys):
+        # One call for the whole batch, so pyautogui's pause is paid once
+        self._gui.press(list(keys))
+
+    def hotkey(self, keys, modifiers=()):
+        self._gui.hotkey(*keys)
+        # Explicitly release modifier keys to prevent them from getting "stuck"
+        for key in modifiers:
+            self._gui.keyUp(key)
+
+    def write(self, text, interval=0):
+        self._gui.write(text, interval=interval)
+
+    def click(self, x, y, button="left", clicks=1):
+        if x is not None:
+            self._gui.click(x=x, y=y, button=button, clicks=clicks)
+        else:
+            self._gui.click(button=button, clicks=clicks)
+
+    def move_to(self, x, y, duration=0):
+        self._gui.moveTo(x, y, duration=duration)
+
+
+# =============================================================================
+# XTest (Linux/X11)
+# =============================================================================
+# pyautogui key names that differ from X keysym names
+X_KEYSYMS = {
+    "enter": "Return",
+    "return": "Return",
+    "\n": "Return",
+    "tab": "Tab",
+    "\t": "Tab",
+    "space": "space",
+    " ": "space",
+    "esc": "Escape",
+    "escape": "Escape",
+    "backspace": "BackSpace",
+    "delete": "Delete",
+    "del": "Delete",
+    "insert": "Insert",
+    "home": "Home",
+    "end": "End",
+    "pageup": "Prior",
+    "pgup": "Prior",
+    "pagedown": "Next",
+    "pgdn": "Next",
+    "up": "Up",
+    "down": "Down",
+    "left": "Left",
+    "right": "Right",
+    "shift": "Shift_L",
+    "shiftleft": "Shift_L",
+    "shiftright": "Shift_R",
+    "ctrl": "Control_L",
+    "ctrlleft": "Control_L",
+    "ctrlright": "Control_R",
+    "alt": "Alt_L",
+    "altleft": "Alt_L",
+    "altright": "Alt_R",
+    "win": "Super_L",
+    "winleft": "Super_L",
+    "winright": "Super_R",
+    "command": "Super_L",
+    "capslock": "Caps_Lock",
+    "numlock": "Num_Lock",
+    "scrolllock": "Scroll_Lock",
+    "printscreen": "Print",
+    "pause": "Pause",
+    "apps": "Menu",
+}
+
+X_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+
+def xtest_available():
+    """Whether the XTest backend can be used (python-xlib and an X display)."""
+    return (
+        get_platform() == "linux"
+        and bool(os.environ.get("DISPLAY"))
+        and importlib.util.find_spec("Xlib") is not None
+    )
+
+
+class XTestBackend(InputBackend):
+    """
+    Sends input as raw XTest events on one X connection (Linux only).
+
+    Events are written into the connection's output buffer and delivered
+    together on flush(), which waits for the X server to process them.
+    There is no per-event pause, so keys and typed text go out as fast as
+    the server accepts them. The pyautogui fail-safe corner is checked once
+    per flush.
+    """
+
+    name = BACKEND_XTEST
+
+    def __init__(self, display=None):
+        from Xlib import X, XK
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+        import pyautogui
+
+        self._X = X
+        self._XK = XK
+        self._xtest = xtest
+        pyautogui.FAILSAFE = True
+        self._gui = pyautogui
+        self._display = Display(display)
+        self._root = self._display.screen().root
+        self._keycodes = {}  # key -> (keycode, needs_shift)
+        self._shift = self._display.keysym_to_keycode(XK.string_to_keysym("Shift_L"))
+        self._pending = 0
+
+    # Key lookup
+
+    def _keysym(self, key):
+        name = X_KEYSYMS.get(key) or X_KEYSYMS.get(key.lower())
+        if name is not None:
+            return self._XK.string_to_keysym(name)
+        if len(key) == 1:
+            # Latin-1 keysyms equal the code point; others use the Unicode range
+            code = ord(key)
+            return code if 0x20 <= code <= 0xFF else 0x01000000 | code
+        # Function keys and anything else named like its keysym (f1 -> F1)
+        return self._XK.string_to_keysym(key) or self._XK.string_to_keysym(key.capitalize())
+
+    def _lookup(self, key):
+        if key not in self._keycodes:
+            keysym = self._keysym(key)
+            keycode = self._display.keysym_to_keycode(keysym) if keysym else 0
+            needs_shift = (
+                keycode != 0
+                and self._display.keycode_to_keysym(keycode, 0) != keysym
+                and self._display.keycode_to_keysym(keycode, 1) == keysym
+            )
+            self._keycodes[key] = (keycode, needs_shift)
+        return self._keycodes[key]
+
+    # Event queueing
+
+    def _fake(self, event_type, detail=0, x=0, y=0):
+        if event_type == self._X.MotionNotify:
+            self._xtest.fake_input(self._display, event_type, x=x, y=y)
+        else:
+            self._xtest.fake_input(self._display, event_type, detail)
+        self._pending += 1
+
+    def _tap(self, key):
+        keycode, needs_shift = self._lookup(key)
+        if not keycode:
+            return  # Not on the keyboard map; pyautogui skips these too
+        if needs_shift:
+            self._fake(self._X.KeyPress, self._shift)
+        self._fake(self._X.KeyPress, keycode)
+        self._fake(self._X.KeyRelease, keycode)
+        if needs_shift:
+            self._fake(self._X.KeyRelease, self._shift)
+
+    # InputBackend
+
+    def press(self, keys):
+        self._gui.failSafeCheck()
+        for key in keys:
+            self._tap(key)
+
+    def hotkey(self, keys, modifiers=()):
+        self._gui.failSafeCheck()
+        keycodes = [self._lookup(key)[0] for key in keys]
+        for keycode in keycodes:
+            if keycode:
+                self._fake(self._X.KeyPress, keycode)
+        # Released in reverse order, so modifiers always come up last
+        for keycode in reversed(keycodes):
+            if keycode:
+                self._fake(self._X.KeyRelease, keycode)
+        self.flush()
+
+    def write(self, text, interval=0):
+        self._gui.failSafeCheck()
+        for char in text:
+            self._tap(char)
+            if interval > 0:
+                self.flush()
+                time.sleep(interval)
+
+    def click(self, x, y, button="left", clicks=1):
+        self._gui.failSafeCheck()
+        if x is not None:
+            self._fake(self._X.MotionNotify, x=x, y=y)
+        detail = X_BUTTONS[button]
+        for _ in range(clicks):
+            self._fake(self._X.ButtonPress, detail)
+            self._fake(self._X.ButtonRelease, detail)
+        self.flush()
+
+    def move_to(self, x, y, duration=0):
+        self._gui.failSafeCheck()
+        steps = int(duration * MOVE_STEPS_PER_SECOND)
+        if steps > 1:
+            pointer = self._root.query_pointer()
+            start_x, start_y = pointer.root_x, pointer.root_y
+            for n in range(1, steps):
+                self._fake(
+                    self._X.MotionNotify,
+                    x=start_x + (x - start_x) * n // steps,
+                    y=start_y + (y - start_y) * n // steps,
+                )
+                self.flush()
+                time.sleep(duration / steps)
+        self._fake(self._X.MotionNotify, x=x, y=y)
+        self.flush()
+
+    def flush(self):
+        if self._pending:
+            # sync() round-trips, so the server has processed every event
+            self._display.sync()
+            self._pending = 0
+            self._gui.failSafeCheck()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._display.close()
+
+
+# =============================================================================
+# Null / Recording
+# =============================================================================
+
+
+class NullBackend(InputBackend):
+    """
+    Discards all input and only counts events. Text is passed through as
+    typed text instead of going through the clipboard.
+    """
+
+    name = BACKEND_NULL
+    uses_clipboard = False
+
+    def __init__(self):
+        self.event_count = 0
+
+    def _record(self, action, *args):
+        self.event_count += 1
+
+    def press(self, keys):
+        for key in keys:
+            self._record("press", key)
+
+    def hotkey(self, keys, modifiers=()):
+        self._record("hotkey", tuple(keys))
+
+    def write(self, text, interval=0):
+        self._record("write", text)
+
+    def click(self, x, y, button="left", clicks=1):
+        self._record("click", x, y, button, clicks)
+
+    def move_to(self, x, y, duration=0):
+        self._record("move", x, y, duration)
+
+
+class RecordingBackend(NullBackend):
+    """
+    Records every input action with its time offset instead of sending it.
+
+    events holds (seconds since the backend was created, action, *args)
+    tuples, e.g. (0.0012, "press", "tab") or (0.05, "write", "Item_1").
+    """
+
+    name = BACKEND_RECORDING
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self._started = time.perf_counter()
+
+    def _record(self, action, *args):
+        self.event_count += 1
+        self.events.append((time.perf_counter() - self._started, action) + args)
+
+
+# =============================================================================
+# Selection
+# =============================================================================
+
+BACKEND_CLASSES = {
+    BACKEND_PYAUTOGUI: PyAutoGUIBackend,
+    BACKEND_XTEST: XTestBackend,
+    BACKEND_NULL: NullBackend,
+    BACKEND_RECORDING: RecordingBackend,
+}
+
+
+def check_backend(name):
+    """
+    Validate a backend name for this machine.
+
+    Raises:
+        ValueError: If the backend is unknown or cannot run here
+    """
+    if name not in BACKEND_CLASSES:
+        raise ValueError(
+            f"Unknown input backend {name!r} (expected one of: {', '.join(BACKENDS)})"
+        )
+    if name == BACKEND_XTEST and not xtest_available():
+        raise ValueError(
+            "The xtest backend needs Linux with an X display and python-xlib installed"
+        )
+
+
+def create_backend(name=DEFAULT_BACKEND):
+    """
+    Create an input backend by name.
+
+    Raises:
+        ValueError: If the backend is unknown or cannot run here
+    """
+    check_backend(name)
+    return BACKEND_CLASSES[name]()
@@ -0,0 +1,338 @@
+"""
+Persistent pattern run queue for KeyStroker.
+Lets a batch of saved patterns run back to back without operator interaction.
+"""
+
+import os
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime
+
+from engine import STATUS_COMPLETED, STATUS_STOPPED
+from pattern_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Queue entry status values
+ENTRY_PENDING = "pending"
+ENTRY_RUNNING = "running"
+ENTRY_COMPLETED = "completed"
+ENTRY_FAILED = "failed"
+ENTRY_STOPPED = "stopped"
+ENTRY_CANCELLED = "cancelled"
+ENTRY_INTERRUPTED = "interrupted"
+
+# Run options a queue entry may override on top of the saved pattern
+OVERRIDABLE_FIELDS = (
+    "loop_count",
+    "start_loop",
+    "start_delay",
+    "target_window",
+    "target_mode",
+    "coalesce",
+    "paste_tabs",
+    "clipboard_timeout",
+    "precise_timing",
+    "backend",
+    "resume",
+)
+
+# Number of finished entries kept in the queue file
+MAX_FINISHED_ENTRIES = 200
+
+
+def _now():
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _valid_entry(entry):
+    """Whether a loaded queue file entry has the fields the queue relies on."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("id"), str)
+        and isinstance(entry.get("status"), str)
+        and isinstance(entry.get("priority"), int)
+        and isinstance(entry.get("position"), int)
+    )
+
+
+class PatternQueue:
+    """
+    Priority/FIFO queue of pattern runs, persisted to a JSON file.
+
+    Entries with a higher priority run first; entries with equal priority run
+    in their queue order. A single consumer thread submits one entry at a time
+    to the job executor and waits for it to finish before taking the next.
+
+    The queue comes back paused after a restart so saved entries never start
+    typing on their own; an entry that was running at shutdown is marked
+    interrupted rather than re-run. An emergency stop (failsafe) also pauses
+    the queue, so the next pattern does not start behind the operator's back.
+    """
+
+    def __init__(self, path, executor, load_pattern, build_params, fsync=None):
+        """
+        Args:
+            path: JSON file the queue is persisted to
+            executor: JobExecutor used to run entries
+            load_pattern: Callable returning the pattern dict for a name
+            build_params: Callable turning a run payload into executor params
+            fsync: Sync each write to disk (default: unless KEYSTROKER_FSYNC=0)
+        """
+        if fsync is None:
+            fsync = os.environ.get("KEYSTROKER_FSYNC", "1") != "0"
+        self.path = path
+        self.fsync = fsync
+        self.executor = executor
+        self.load_pattern = load_pattern
+        self.build_params = build_params
+        self.entries = []
+        self.paused = False
+        self._next_position = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._load()
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            return
+        # Entries edited into something else are dropped rather than
+        # breaking start-up
+        self.entries = [entry for entry in entries if _valid_entry(entry)]
+        for entry in self.entries:
+            if entry.get("status") == ENTRY_RUNNING:
+                entry["status"] = ENTRY_INTERRUPTED
+                entry["finished_at"] = _now()
+        self._next_position = 1 + max(
+            (e.get("position", 0) for e in self.entries), default=-1
+        )
+        self.paused = any(e["status"] == ENTRY_PENDING for e in self.entries)
+
+    def _save(self):
+        """Write the queue file atomically and synced. Caller must hold the lock."""
+        finished = [
+            e for e in self.entries if e["status"] not in (ENTRY_PENDING, ENTRY_RUNNING)
+        ]
+        for entry in finished[: max(0, len(finished) - MAX_FINISHED_ENTRIES)]:
+            self.entries.remove(entry)
+
+        text = json.dumps({"entries": self.entries}, indent=2, ensure_ascii=False)
+        atomic_write(self.path, text, self.fsync)
+
+    def _save_from_consumer(self):
+        """
+        _save for the consumer thread. Caller must hold the lock.
+
+        A queue file that cannot be written is logged instead of raised, so
+        the consumer keeps running the queue; the next save writes the state
+        again.
+        """
+        try:
+            self._save()
+        except OSError as e:
+            logger.error("Could not write the queue file %s: %s", self.path, e)
+
+    # -------------------------------------------------------------------------
+    # Queue Operations
+    # -------------------------------------------------------------------------
+
+    def enqueue(self, pattern_name, priority=0, overrides=None):
+        """
+        Add a pattern run to the queue and wake the consumer.
+
+        Raises:
+            KeyError: If the pattern does not exist
+            ValueError: If the pattern cannot be compiled
+        """
+        # Validate now so a broken pattern is rejected at enqueue time
+        self.build_params(self._payload(pattern_name, overrides or {}))
+
+        with self._cond:
+            entry = {
+                "id": uuid.uuid4().hex,
+                "pattern": pattern_name,
+                "priority": int(priority),
+                "position": self._next_position,
+                "overrides": overrides or {},
+                "status": ENTRY_PENDING,
+                "job_id": None,
+                "error": None,
+                "enqueued_at": _now(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._next_position += 1
+            self.entries.append(entry)
+            self._save()
+            self._ensure_thread()
+            self._cond.notify_all()
+            return dict(entry)
+
+    def reorder(self, entry_ids):
+        """
+        Move the given pending entries to the front of the queue, in that order.
+
+        Entries not listed keep their relative order behind them. Priority is
+        still honoured first.
+
+        Raises:
+            KeyError: If an id is unknown or not pending
+        """
+        with self._cond:
+            pending = {e["id"]: e for e in self.entries if e["status"] == ENTRY_PENDING}
+            for entry_id in entry_ids:
+                if entry_id not in pending:
+                    raise KeyError(entry_id)
+
+            listed = [pending[entry_id] for entry_id in entry_ids]
+            rest = sorted(
+                (e for e in pending.values() if e["id"] not in entry_ids),
+                key=lambda e: e["position"],
+            )
+            for position, entry in enumerate(listed + rest):
+                entry["position"] = position
+            self._next_position = len(listed) + len(rest)
+            self._save()
+            return self.snapshot()
+
+    def set_priority(self, entry_id, priority):
+        """Change the priority of a pending entry."""
+        with self._cond:
+            entry = self._find(entry_id)
+            if entry["status"] != ENTRY_PENDING:
+                raise ValueError(f"Entry is {entry['status']}, not pending")
+            entry["priority"] = int(priority)
+            self._save()
+            return dict(entry)
+
+    def cancel(self, entry_id):
+        """
+        Cancel a pending entry.
+
+        Raises:
+            KeyError: If the id is unknown
+            ValueError: If the entry is no longer pending
+        """
+        with self._cond:
+            entry = self._find(entry_id)
+            if entry["status"] != ENTRY_PENDING:
+                raise ValueError(f"Entry is {entry['status']}, not pending")
+            entry["status"] = ENTRY_CANCELLED
+            entry["finished_at"] = _now()
+            self._save()
+            return dict(entry)
+
+    def pause(self):
+        """Stop taking new entries (the running one finishes normally)."""
+        with self._cond:
+            self.paused = True
+
+    def resume(self):
+        """Resume taking entries from the queue."""
+        with self._cond:
+            self.paused = False
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """Return the queue state, pending entries in run order."""
+        with self._cond:
+            pending = sorted(
+                (e for e in self.entries if e["status"] == ENTRY_PENDING),
+                key=self._order_key,
+            )
+            others = [e for e in self.entries if e["status"] != ENTRY_PENDING]
+            return {
+                "paused": self.paused,
+                "pending": [dict(e) for e in pending],
+                "history": [dict(e) for e in reversed(others)],
+            }
+
+    # -------------------------------------------------------------------------
+    # Consumer
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _order_key(entry):
+        return (-entry["priority"], entry["position"])
+
+    def _find(self, entry_id):
+        for entry in self.entries:
+            if entry["id"] == entry_id:
+                return entry
+        raise KeyError(entry_id)
+
+    def _payload(self, pattern_name, overrides):
+        pattern = self.load_pattern(pattern_name)
+        payload = dict(pattern)
+        for field in OVERRIDABLE_FIELDS:
+            if field in overrides:
+                payload[field] = overrides[field]
+        return payload
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._consume, name="keystroker-queue", daemon=True
+            )
+            self._thread.start()
+
+    def _next_entry(self):
+        """Block until an entry is available and the queue is not paused."""
+        with self._cond:
+            while True:
+                if not self.paused:
+                    pending = [e for e in self.entries if e["status"] == ENTRY_PENDING]
+                    if pending:
+                        entry = min(pending, key=self._order_key)
+                        entry["status"] = ENTRY_RUNNING
+                        entry["started_at"] = _now()
+                        self._save_from_consumer()
+                        return entry
+                self._cond.wait()
+
+    def _consume(self):
+        while True:
+            entry = self._next_entry()
+            try:
+                params = self.build_params(
+                    self._payload(entry["pattern"], entry["overrides"])
+                )
+                state = self.executor.submit(params)
+                with self._cond:
+                    entry["job_id"] = state.job_id
+                    self._save_from_consumer()
+                state.done.wait()
+                error = state.error
+                if state.status == STATUS_COMPLETED:
+                    status = ENTRY_COMPLETED
+                elif state.status == STATUS_STOPPED:
+                    status = ENTRY_STOPPED
+                else:
+                    status = ENTRY_FAILED
+            except Exception as e:
+                status = ENTRY_FAILED
+                error = str(e)
+
+            with self._cond:
+                if status == ENTRY_STOPPED:
+                    self.paused = True
+                entry["status"] = status
+                entry["error"] = error
+                entry["finished_at"] = _now()
+                self._save_from_consumer()
@@ -0,0 +1,131 @@
+"""
+Background job executor for KeyStroker.
+Runs submitted patterns one at a time on a dedicated thread.
+"""
+
+import uuid
+import queue
+import threading
+from collections import OrderedDict
+
+from checkpoint import CheckpointJournal
+from engine import RunState, run_pattern, STATUS_QUEUED, STATUS_RUNNING, STATUS_STOPPED
+
+# Number of finished jobs kept around for GET /jobs/<id>
+MAX_FINISHED_JOBS = 100
+
+
+class JobExecutor:
+    """
+    Owns the executor thread and the registry of submitted jobs.
+
+    Jobs run strictly one after another: there is only one keyboard and
+    mouse, so overlapping runs would interleave their input.
+    """
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS, journal=None):
+        """
+        Args:
+            max_finished: Number of finished jobs kept for the jobs API
+            journal: CheckpointJournal runs record their progress in
+        """
+        self.max_finished = max_finished
+        self.journal = journal
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._thread = None
+
+    def submit(self, params):
+        """
+        Queue a run for execution.
+
+        Args:
+            params: Run parameters from plan.parse_run_params
+
+        Returns:
+            RunState: The state object tracking the new job
+        """
+        state = RunState(uuid.uuid4().hex, params)
+        with self._lock:
+            self._jobs[state.job_id] = state
+            self._prune()
+            self._ensure_thread()
+        self._pending.put(state)
+        return state
+
+    def get(self, job_id):
+        """Return the RunState for a job id, or None if unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        """Return the most recently submitted job, or None."""
+        with self._lock:
+            if not self._jobs:
+                return None
+            return next(reversed(self._jobs.values()))
+
+    def list(self):
+        """Return all known jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stop(self, job_id):
+        """
+        Stop a job. A queued job is cancelled before it starts; a running or
+        paused one stops at its next checkpoint, within milliseconds.
+
+        Returns:
+            RunState: The job, or None if unknown
+        """
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                return None
+            if state.status == STATUS_QUEUED:
+                state.finish(STATUS_STOPPED, error="Stopped before it started.")
+                return state
+        state.request_stop()
+        return state
+
+    def pause(self, job_id):
+        """Pause a job at its next instruction. Returns the RunState or None."""
+        state = self.get(job_id)
+        if state is not None:
+            state.request_pause()
+        return state
+
+    def resume(self, job_id):
+        """Resume a paused job where it left off. Returns the RunState or None."""
+        state = self.get(job_id)
+        if state is not None:
+            state.request_resume()
+        return state
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._worker, name="keystroker-executor", daemon=True
+            )
+            self._thread.start()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit."""
+        finished = [job_id for job_id, s in self._jobs.items() if s.finished]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            state = self._pending.get()
+            with self._lock:
+                # Stopped while still queued
+                if state.finished:
+                    continue
+                state.status = STATUS_RUNNING
+            run_pattern(state, self.journal)
+
+
+# Shared executor used by the Flask app
+executor = JobExecutor(journal=CheckpointJournal())
@@ -0,0 +1,185 @@
+"""
+JSON Patch (RFC 6902) for KeyStroker.
+Applies add/remove/replace/move/copy/test operations to pattern documents.
+"""
+
+import copy
+import json
+
+OPERATIONS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class JsonPatchError(ValueError):
+    """Raised when a patch is malformed or cannot be applied to the document."""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """Raised when a "test" operation does not match the document."""
+
+
+def copy_document(document):
+    """Deep copy of a JSON document (a JSON round trip, much faster than copy.deepcopy)."""
+    return json.loads(json.dumps(document))
+
+
+def parse_pointer(pointer):
+    """
+    Split a JSON Pointer (RFC 6901) into its unescaped reference tokens.
+
+    Raises:
+        JsonPatchError: If the pointer is not a string starting with "/"
+    """
+    if not isinstance(pointer, str):
+        raise JsonPatchError(f"Invalid JSON pointer {pointer!r}")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"JSON pointer {pointer!r} must start with '/'")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _array_index(token, array, allow_end=False):
+    """Index into array for a reference token; "-" (the end) only if allow_end."""
+    if allow_end and token == "-":
+        return len(array)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    limit = len(array) if allow_end else len(array) - 1
+    if index > limit:
+        raise JsonPatchError(f"Array index {index} out of range")
+    return index
+
+
+def _resolve(document, tokens, pointer):
+    """Return the value tokens point to."""
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"Path {pointer!r} does not exist")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(token, value)]
+        else:
+            raise JsonPatchError(f"Path {pointer!r} does not exist")
+    return value
+
+
+def _json_equal(a, b):
+    """JSON equality: like ==, but booleans never equal numbers."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _add(document, tokens, value, pointer):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1], pointer)
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(token, parent, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Path {pointer!r} does not exist")
+    return document
+
+
+def _remove(document, tokens, pointer):
+    """Remove the value at tokens; returns (document, removed value)."""
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent = _resolve(document, tokens[:-1], pointer)
+    token = tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path {pointer!r} does not exist")
+        return document, parent.pop(token)
+    if isinstance(parent, list):
+        return document, parent.pop(_array_index(token, parent))
+    raise JsonPatchError(f"Path {pointer!r} does not exist")
+
+
+def apply_operation(document, operation):
+    """
+    Apply one operation in place where possible.
+
+    Returns:
+        The patched document (a different object only if the root was replaced)
+
+    Raises:
+        JsonPatchError: If the operation is malformed or cannot be applied
+    """
+    if not isinstance(operation, dict):
+        raise JsonPatchError("Each operation must be an object")
+    op = operation.get("op")
+    if op not in OPERATIONS:
+        raise JsonPatchError(f"Unknown operation {op!r}")
+    pointer = operation.get("path")
+    tokens = parse_pointer(pointer)
+
+    if op in ("add", "replace", "test") and "value" not in operation:
+        raise JsonPatchError(f"'{op}' operation on {pointer!r} needs a 'value'")
+
+    if op == "add":
+        return _add(document, tokens, copy.deepcopy(operation["value"]), pointer)
+
+    if op == "remove":
+        return _remove(document, tokens, pointer)[0]
+
+    if op == "replace":
+        _resolve(document, tokens, pointer)  # Must exist
+        if not tokens:
+            return copy.deepcopy(operation["value"])
+        document = _remove(document, tokens, pointer)[0]
+        return _add(document, tokens, copy.deepcopy(operation["value"]), pointer)
+
+    if op == "test":
+        if not _json_equal(_resolve(document, tokens, pointer), operation["value"]):
+            raise JsonPatchTestFailed(f"Test failed at {pointer!r}")
+        return document
+
+    source = operation.get("from")
+    from_tokens = parse_pointer(source)
+
+    if op == "move":
+        if tokens[: len(from_tokens)] == from_tokens and len(tokens) > len(from_tokens):
+            raise JsonPatchError(f"Cannot move {source!r} into one of its children")
+        document, value = _remove(document, from_tokens, source)
+        return _add(document, tokens, value, pointer)
+
+    # copy
+    value = copy.deepcopy(_resolve(document, from_tokens, source))
+    return _add(document, tokens, value, pointer)
+
+
+def apply_patch(document, operations):
+    """
+    Apply a JSON Patch atomically.
+
+    The operations are applied to a copy, so the original document is left
+    untouched when any of them fails.
+
+    Args:
+        document: Parsed JSON document
+        operations: List of RFC 6902 operation objects
+
+    Returns:
+        The patched copy of document
+
+    Raises:
+        JsonPatchError: If the patch is malformed or cannot be applied
+            (JsonPatchTestFailed for a failing "test" operation)
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch must be a list of operations")
+    patched = copy_document(document)
+    for operation in operations:
+        patched = apply_operation(patched, operation)
+    return patched
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Headless command line for KeyStroker.
+
+Runs a saved pattern with the same engine as the web UI, without Flask or
+the system tray. Modules are imported only once they are needed, so the
+command starts fast enough to be driven from cron jobs and shell scripts.
+
+Usage:
+    python keystroker.py run <pattern name or .json file> [--loops N]
+        [--start-loop K] [--backend NAME] [--start-delay S]
+        [--target-mode auto|manual] [--resume]
+
+Exit status: 0 when the run completed, 1 when it failed or the pattern is
+invalid, 3 when it was stopped (Ctrl+C or the fail-safe corner).
+"""
+
+import os
+import sys
+import argparse
+
+PATTERNS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns")
+
+EXIT_COMPLETED = 0
+EXIT_FAILED = 1
+EXIT_STOPPED = 3
+
+
+def _log(message, quiet=False):
+    if not quiet:
+        print(message, file=sys.stderr, flush=True)
+
+
+def run_command(args):
+    """Load a pattern, apply the command line overrides and run it."""
+    from pattern_store import load_pattern
+    from plan import parse_run_params
+
+    try:
+        pattern = load_pattern(args.pattern, args.patterns_dir)
+    except KeyError:
+        print(f"Pattern '{args.pattern}' not found", file=sys.stderr)
+        return EXIT_FAILED
+
+    if args.loops is not None:
+        pattern["loop_count"] = args.loops
+    if args.start_loop is not None:
+        pattern["start_loop"] = args.start_loop
+    if args.start_delay is not None:
+        pattern["start_delay"] = args.start_delay
+    if args.backend:
+        pattern["backend"] = args.backend
+    if args.target_mode:
+        pattern["target_mode"] = args.target_mode
+    if args.resume:
+        pattern["resume"] = True
+
+    try:
+        params = parse_run_params(pattern)
+    except ValueError as e:
+        print(f"Invalid pattern: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    # The engine pulls in the input backend and clipboard only when the run starts
+    import threading
+    from engine import RunState, run_pattern, STATUS_COMPLETED, STATUS_STOPPED
+    from checkpoint import CheckpointJournal
+
+    state = RunState("cli", params)
+    journal = CheckpointJournal() if args.checkpoints else None
+    worker = threading.Thread(target=run_pattern, args=(state, journal), name="keystroker-run")
+
+    name = pattern.get("name", args.pattern)
+    _log(f"Running '{name}' ({params['loop_count']} loop(s), Ctrl+C to stop)", args.quiet)
+    worker.start()
+
+    shown_loop = None
+    while not state.done.is_set():
+        try:
+            state.done.wait(0.25)
+        except KeyboardInterrupt:
+            _log("Stopping...", args.quiet)
+            state.request_stop()
+            continue
+        if state.running and state.current_loop != shown_loop:
+            shown_loop = state.current_loop
+            if shown_loop == 0:
+                _log("Startup sequence", args.quiet)
+            else:
+                _log(f"Loop {shown_loop}/{state.total_loops}", args.quiet)
+    worker.join()
+
+    if state.status == STATUS_COMPLETED:
+        _log(state.message, args.quiet)
+        return EXIT_COMPLETED
+    print(state.error or state.message, file=sys.stderr)
+    return EXIT_STOPPED if state.status == STATUS_STOPPED else EXIT_FAILED
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="keystroker", description="KeyStroker command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run a saved pattern without the web UI")
+    run.add_argument("pattern", help="Pattern name or path to a pattern .json file")
+    run.add_argument("--loops", type=int, help="Override the pattern's loop count")
+    run.add_argument("--start-loop", type=int,
+                     help="Skip the loops before this one (the startup sequence still runs)")
+    run.add_argument("--start-delay", type=int, help="Override the start delay")
+    run.add_argument("--backend", help="Input backend (pyautogui, xtest, null, recording)")
+    run.add_argument("--target-mode", choices=("auto", "manual"),
+                     help="Override the target mode (manual: type into the focused window)")
+    run.add_argument("--resume", action="store_true",
+                     help="Continue from the pattern's checkpoint")
+    run.add_argument("--no-checkpoints", dest="checkpoints", action="store_false",
+                     help="Do not record checkpoints for this run")
+    run.add_argument("--quiet", action="store_true", help="Only print errors")
+    run.add_argument("--patterns-dir", default=PATTERNS_DIR)
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.resume and not args.checkpoints:
+        run.error("--resume needs checkpoints; it cannot be combined with --no-checkpoints")
+
+    if args.command == "run":
+        return run_command(args)
+    return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
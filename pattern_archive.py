@@ -0,0 +1,237 @@
+"""
+Bulk pattern import/export for KeyStroker.
+
+Archives are read and written one pattern at a time, so moving a whole
+library costs the memory of a single pattern, not of the archive:
+- ndjson: one pattern JSON object per line
+- zip: one <name>.json file per pattern (the layout of patterns/)
+"""
+
+import json
+import shutil
+import zipfile
+import tempfile
+
+from pattern_store import sanitize_filename, save_copy
+
+FORMATS = ("zip", "ndjson")
+
+MIMETYPES = {"zip": "application/zip", "ndjson": "application/x-ndjson"}
+
+CONFLICT_POLICIES = ("skip", "overwrite", "rename")
+
+# Largest single pattern accepted on import (one NDJSON line or zip member)
+MAX_PATTERN_BYTES = 16 * 1024 * 1024
+
+# An uploaded zip is spooled to a temporary file once it is larger than this
+# (its directory is at the end, so it cannot be read as it arrives)
+SPOOL_MEMORY = 1024 * 1024
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+
+class _ChunkSink:
+    """Write-only stream that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_names(store, q=None, target_window=None, names=None):
+    """
+    Names of the patterns to export, newest first.
+
+    Args:
+        store: Pattern store
+        q, target_window: Filters, as for store.list()
+        names: Export exactly these patterns instead (unknown names are dropped)
+    """
+    if names:
+        return [name for name in names if store.exists(name)]
+    summaries, _ = store.list(q=q, target_window=target_window)
+    return [summary["name"] for summary in summaries]
+
+
+def _stored_patterns(store, names):
+    for name in names:
+        pattern = store.get(name)
+        # None if it was deleted after the names were listed
+        if pattern is not None:
+            yield name, pattern
+
+
+def iter_ndjson(store, names):
+    """Yield the patterns as NDJSON, one encoded line per pattern."""
+    for _, pattern in _stored_patterns(store, names):
+        yield (json.dumps(pattern, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_zip(store, names):
+    """
+    Yield a zip archive of the patterns, in chunks.
+
+    Each pattern is compressed and yielded before the next one is read. The
+    stream is not seekable, so zipfile writes sizes after each member (data
+    descriptors) instead of going back to fill them in.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, pattern in _stored_patterns(store, names):
+            data = json.dumps(pattern, indent=2, ensure_ascii=False)
+            archive.writestr(sanitize_filename(name), data)
+            yield sink.drain()
+    # The central directory
+    yield sink.drain()
+
+
+def iter_export(store, names, fmt):
+    """Yield the archive for names in fmt ("zip" or "ndjson")."""
+    if fmt == "zip":
+        return iter_zip(store, names)
+    return iter_ndjson(store, names)
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+
+def read_ndjson(stream, max_bytes=MAX_PATTERN_BYTES):
+    """
+    Read patterns from an NDJSON byte stream as it arrives.
+
+    Yields:
+        tuple: (source, pattern, error) per non-blank line; pattern is None
+        when the line could not be read, and error says why
+    """
+    number = 0
+    while True:
+        line = stream.readline(max_bytes + 1)
+        if not line:
+            return
+        number += 1
+        source = f"line {number}"
+
+        if len(line) > max_bytes and not line.endswith(b"\n"):
+            # Skip the rest of the oversized line
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_bytes + 1)
+            yield source, None, f"Pattern is larger than {max_bytes} bytes"
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield source, json.loads(line), None
+        except ValueError as e:
+            yield source, None, f"Invalid JSON: {e}"
+
+
+def spool(stream):
+    """Copy a request body into a seekable file (in memory while it is small)."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+    shutil.copyfileobj(stream, spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def read_zip(fileobj, max_bytes=MAX_PATTERN_BYTES):
+    """
+    Read patterns from the .json members of a zip archive, one at a time.
+
+    Patterns without a name are named after their file.
+
+    Yields:
+        tuple: (source, pattern, error) as for read_ndjson
+
+    Raises:
+        zipfile.BadZipFile: If fileobj is not a zip archive
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(".json"):
+                continue
+            source = info.filename
+            if info.file_size > max_bytes:
+                yield source, None, f"Pattern is larger than {max_bytes} bytes"
+                continue
+            try:
+                with archive.open(info) as f:
+                    pattern = json.load(f)
+            except (ValueError, zipfile.BadZipFile) as e:
+                yield source, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(pattern, dict) and not pattern.get("name"):
+                pattern["name"] = info.filename.rsplit("/", 1)[-1][:-5]
+            yield source, pattern, None
+
+
+def _invalid(pattern):
+    """Why pattern cannot be imported, or None."""
+    if not isinstance(pattern, dict):
+        return "A pattern must be a JSON object"
+    name = pattern.get("name")
+    if not isinstance(name, str) or not name.strip():
+        return "Pattern name is required"
+    for field in ("startup_sequence", "sequence"):
+        if not isinstance(pattern.get(field, []), list):
+            return f"'{field}' must be a list"
+    return None
+
+
+def import_patterns(store, records, policy="skip"):
+    """
+    Save patterns from read_ndjson/read_zip into store as they are read.
+
+    Args:
+        store: Pattern store
+        records: (source, pattern, error) tuples
+        policy: What to do when a pattern with the same name exists:
+            "skip" it, "overwrite" the stored one, or "rename" the imported
+            one the way duplicating names copies ("name (Copy)", "name (Copy) 2")
+
+    Returns:
+        dict: Counts of imported and overwritten patterns, the names that
+        were skipped or renamed, and the records that could not be imported
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"policy must be one of {', '.join(CONFLICT_POLICIES)}")
+
+    result = {"imported": 0, "overwritten": 0, "renamed": [], "skipped": [], "errors": []}
+    for source, pattern, error in records:
+        error = error or _invalid(pattern)
+        if error:
+            result["errors"].append({"source": source, "error": error})
+            continue
+
+        name = pattern["name"].strip()
+        pattern["name"] = name
+        with store.lock(name):
+            exists = store.exists(name)
+            if not exists or policy == "overwrite":
+                store.save(name, pattern)
+                result["overwritten" if exists else "imported"] += 1
+                continue
+
+        if policy == "skip":
+            result["skipped"].append(name)
+        else:
+            result["renamed"].append({"name": name, "saved_as": save_copy(store, name, pattern)})
+            result["imported"] += 1
+    return result
@@ -0,0 +1,923 @@
+"""
+Pattern storage backends for KeyStroker.
+
+Two interchangeable stores sit behind the /patterns routes:
+- FilePatternStore: one JSON file per pattern in patterns/ (default)
+- SQLitePatternStore: a local SQLite database with indexed search
+
+Select the SQLite store by setting KEYSTROKER_STORE=sqlite (and optionally
+KEYSTROKER_DB to the database path). A save is written and synced to disk
+before it returns (KEYSTROKER_FSYNC=0 skips the sync); only saves that opt in
+to coalescing (autosave) may be held in memory for up to
+WRITE_COALESCE_INTERVAL seconds first. Existing JSON files can be migrated with:
+
+    python pattern_store.py import [--dir patterns] [--db patterns.db]
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+import argparse
+import tempfile
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from json_patch import apply_operation, JsonPatchError
+
+logger = logging.getLogger(__name__)
+
+# A pattern's patch journal is folded back into its JSON file once it grows
+# past this fraction of the file size (and at least JOURNAL_COMPACT_MIN_BYTES)
+JOURNAL_COMPACT_RATIO = 0.5
+JOURNAL_COMPACT_MIN_BYTES = 64 * 1024
+
+# A coalesced save to a pattern file written less than this many seconds ago
+# is held in memory and written once the interval has passed, replaced by any
+# later save in the meantime
+WRITE_COALESCE_INTERVAL = 0.5
+
+# Most recently used patterns the file store keeps parsed in memory
+PATTERN_CACHE_SIZE = 64
+
+
+def sanitize_filename(name):
+    """Convert pattern name to safe filename."""
+    # Remove or replace invalid characters
+    safe_name = re.sub(r'[<>:"/\\|?*]', "_", name)
+    safe_name = safe_name.strip()
+    return safe_name + ".json"
+
+
+def pattern_key(name):
+    """Storage key for a pattern name (the filename without extension)."""
+    return sanitize_filename(name)[:-5]
+
+
+def pattern_etag(pattern):
+    """Content hash of a pattern, used as its HTTP ETag."""
+    raw = json.dumps(pattern, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def summarize_pattern(pattern, filename):
+    """Build the summary shown in the patterns sidebar."""
+    return {
+        "name": pattern.get("name", filename[:-5]),
+        "description": pattern.get("description", ""),
+        "step_count": len(pattern.get("sequence", [])),
+        "loop_count": pattern.get("loop_count", 1),
+        "target_window": pattern.get("target_window"),
+        "created_at": pattern.get("created_at", ""),
+        "updated_at": pattern.get("updated_at", ""),
+    }
+
+
+def _matches(summary, query):
+    """Case-insensitive substring match used by the file store search."""
+    query = query.lower()
+    return query in summary["name"].lower() or query in (summary["description"] or "").lower()
+
+
+# =============================================================================
+# Atomic Writes
+# =============================================================================
+
+
+def atomic_write(path, text, fsync=True):
+    """
+    Replace the file at path with text atomically.
+
+    The text goes to a temporary file in the same directory, which then
+    replaces path (os.replace), so readers and a crash see either the old or
+    the new file, never a truncated one. With fsync the data reaches the
+    disk before the rename, and the rename itself is synced where the OS
+    supports syncing directories.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class PatternLocks:
+    """
+    One lock per key, so writes to different patterns never wait on each other.
+
+    A key's lock only exists while some thread holds or waits for it, so the
+    table does not grow with every pattern name ever written.
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [RLock, threads holding or waiting]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.RLock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class CoalescingWriter:
+    """
+    Atomic file writes, optionally coalesced per path.
+
+    write() puts the file on disk before it returns, unless the caller opts
+    in to coalescing (e.g. for autosave). A coalesced write to a path that
+    was written less than `interval` seconds ago is held in memory,
+    replacing any write already held for that path, and a timer writes it
+    once the interval has passed. A burst of such saves to one pattern costs
+    a write at its start and one at its end. A timer write that fails is
+    logged and retried every `interval` seconds until it succeeds, the path
+    is written again, or flush() reports the error.
+
+    Writes to a path are serialized by locks(path); callers that read, check
+    and then write hold it around all three.
+    """
+
+    def __init__(self, interval=WRITE_COALESCE_INTERVAL, fsync=True):
+        self.interval = interval
+        self.fsync = fsync
+        self.locks = PatternLocks()
+        self.writes = 0
+        self.failed_writes = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> (text, on_written)
+        self._scheduled = set()  # Paths with a timer write scheduled
+        self._last_write = {}  # path -> time.monotonic() of its last write
+
+    def write(self, path, text, on_written=None, coalesce=False):
+        """
+        Write text to path, or hold it to be coalesced.
+
+        Args:
+            path: File to replace
+            text: Its new content
+            on_written: Called (with the path lock held) once the file is on disk
+            coalesce: Hold the write if path was written less than interval
+                seconds ago
+
+        Returns:
+            bool: True if the file was written, False if the write is held
+
+        Raises:
+            OSError: If the file cannot be written (not for held writes)
+        """
+        with self.locks(path):
+            with self._lock:
+                delay = self._last_write.get(path, float("-inf")) + self.interval - time.monotonic()
+                if coalesce and delay > 0:
+                    self._pending[path] = (text, on_written)
+                    self._schedule(path, delay)
+                    return False
+                # Supersedes anything held for this path
+                self._pending.pop(path, None)
+            self._write(path, text, on_written)
+            return True
+
+    def _schedule(self, path, delay):
+        """Caller holds self._lock."""
+        if path in self._scheduled:
+            return
+        self._scheduled.add(path)
+        timer = threading.Timer(delay, self._timer_flush, (path,))
+        timer.daemon = True
+        timer.start()
+
+    def _timer_flush(self, path):
+        with self._lock:
+            self._scheduled.discard(path)
+        try:
+            self.flush(path)
+        except OSError as e:
+            logger.error("Could not write %s (retrying in %.1fs): %s", path, self.interval, e)
+            with self._lock:
+                if path in self._pending:
+                    self._schedule(path, self.interval)
+
+    def _write(self, path, text, on_written):
+        """Caller holds the path lock."""
+        try:
+            atomic_write(path, text, self.fsync)
+        except OSError:
+            with self._lock:
+                self.failed_writes += 1
+            raise
+        with self._lock:
+            self._last_write[path] = time.monotonic()
+            self.writes += 1
+        if on_written:
+            on_written()
+
+    def pending(self, path):
+        """Text held for path, or None."""
+        with self._lock:
+            entry = self._pending.get(path)
+        return entry[0] if entry else None
+
+    def flush(self, path=None):
+        """
+        Write what is held for path (every path if None) right away.
+
+        Raises:
+            OSError: If a held write fails (it stays held, to be retried)
+        """
+        with self._lock:
+            paths = [path] if path is not None else list(self._pending)
+        for p in paths:
+            with self.locks(p):
+                with self._lock:
+                    entry = self._pending.pop(p, None)
+                if entry is None:
+                    continue
+                try:
+                    self._write(p, *entry)
+                except OSError:
+                    # Keep it for the next flush unless a newer save replaced it
+                    with self._lock:
+                        self._pending.setdefault(p, entry)
+                    raise
+
+    def discard(self, path):
+        """Drop what is held for path (it was deleted). Caller holds the path lock."""
+        with self._lock:
+            self._pending.pop(path, None)
+            self._last_write.pop(path, None)
+
+
+# =============================================================================
+# File Store
+# =============================================================================
+
+
+def journal_path(filepath):
+    """Patch journal of a pattern file (JSON Patch operations, one list per line)."""
+    return filepath + ".patches"
+
+
+def journal_base(journal):
+    """ETag recorded in a patch journal's header, or None if there is none."""
+    try:
+        with open(journal, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return header.get("base") if isinstance(header, dict) else None
+
+
+def read_pattern_file(filepath):
+    """
+    Read a pattern file and replay its patch journal, if any.
+
+    The journal's first line records the ETag of the file it applies to. A
+    journal left over from before the file was rewritten is ignored, and a
+    torn last line (from a crash mid-append) ends the replay.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        pattern = json.load(f)
+
+    try:
+        with open(journal_path(filepath), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return pattern
+
+    try:
+        header = json.loads(lines[0]) if lines else {}
+    except json.JSONDecodeError:
+        return pattern
+    if not isinstance(header, dict) or header.get("base") != pattern_etag(pattern):
+        return pattern
+
+    # Every journaled patch applied cleanly when it was appended, so they are
+    # replayed in place instead of on a copy per line
+    for line in lines[1:]:
+        try:
+            operations = json.loads(line)
+            for operation in operations:
+                pattern = apply_operation(pattern, operation)
+        except (json.JSONDecodeError, JsonPatchError, TypeError):
+            break
+    return pattern
+
+
+class PatternIndex:
+    """
+    Cache of pattern summaries keyed by filename.
+
+    Each entry remembers the file's mtime and size. Listing only stats the
+    directory and re-reads files whose mtime or size changed, so edits made
+    outside the app (copying files into patterns/) are still picked up.
+    Writes through the app update the index in place.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._entries = {}  # filename -> (mtime_ns, size, summary or None)
+        self._lock = threading.Lock()
+
+    def list(self):
+        """
+        Return summaries of all readable patterns, newest first.
+
+        Files that fail to parse are skipped, as before, but their stat is
+        cached so they are not re-read until they change.
+        """
+        seen = set()
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                filename = dir_entry.name
+                if not filename.endswith(".json") or not dir_entry.is_file():
+                    continue
+                seen.add(filename)
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+
+                with self._lock:
+                    cached = self._entries.get(filename)
+                if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                    continue
+
+                summary = self._read_summary(dir_entry.path, filename)
+                with self._lock:
+                    self._entries[filename] = (stat.st_mtime_ns, stat.st_size, summary)
+
+        with self._lock:
+            for filename in list(self._entries):
+                if filename not in seen:
+                    del self._entries[filename]
+            patterns = [entry[2] for entry in self._entries.values() if entry[2]]
+
+        # Sort by updated_at descending (newest first)
+        patterns.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
+        return patterns
+
+    def update(self, filepath, pattern):
+        """Record a pattern that was just written to filepath."""
+        filename = os.path.basename(filepath)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            self.remove(filepath)
+            return
+        with self._lock:
+            self._entries[filename] = (
+                stat.st_mtime_ns,
+                stat.st_size,
+                summarize_pattern(pattern, filename),
+            )
+
+    def remove(self, filepath):
+        """Forget a pattern file that was deleted."""
+        with self._lock:
+            self._entries.pop(os.path.basename(filepath), None)
+
+    @staticmethod
+    def _read_summary(filepath, filename):
+        try:
+            return summarize_pattern(read_pattern_file(filepath), filename)
+        except (json.JSONDecodeError, IOError, AttributeError):
+            return None
+
+
+class FilePatternStore:
+    """
+    Stores each pattern as a pretty-printed JSON file in a directory.
+
+    Small edits (save_patch) are appended to a per-pattern patch journal
+    next to the file instead of rewriting it, so their cost does not grow
+    with the pattern. The journal is folded into the file when it gets
+    large, and on every full save. The latest version of each pattern read or
+    written (up to PATTERN_CACHE_SIZE) is kept in memory until its file or
+    journal changes on disk.
+
+    Files are replaced atomically. Saves made with coalesce=True may be
+    held back and merged (see CoalescingWriter); while held they are served
+    by get(), and they are written at exit or by flush().
+    """
+
+    def __init__(self, directory, fsync=True, coalesce_interval=WRITE_COALESCE_INTERVAL):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.fsync = fsync
+        self.writer = CoalescingWriter(coalesce_interval, fsync)
+        atexit.register(self.flush)
+        self.index = PatternIndex(directory)
+        self._base_etags = {}  # filepath -> ((mtime_ns, size), ETag) of the JSON file
+        self._patterns = OrderedDict()  # filepath -> (file and journal stat, pattern as JSON)
+        self._cache_lock = threading.Lock()
+
+    def filepath(self, name):
+        """Get full filepath for a pattern."""
+        return os.path.join(self.directory, sanitize_filename(name))
+
+    def lock(self, name):
+        """Lock serializing writes to a pattern; hold it to read, check and save."""
+        return self.writer.locks(self.filepath(name))
+
+    def exists(self, name):
+        return os.path.exists(self.filepath(name))
+
+    def get(self, name):
+        """Return the pattern dict, or None if it does not exist."""
+        filepath = self.filepath(name)
+        pending = self.writer.pending(filepath)
+        if pending is not None:
+            return json.loads(pending)
+        stamp = self._stamp(filepath)
+        if stamp is None:
+            self._forget(filepath)
+            return None
+        with self._cache_lock:
+            cached = self._patterns.get(filepath)
+            if cached is not None:
+                self._patterns.move_to_end(filepath)
+        if cached is None or cached[0] != stamp:
+            pattern = read_pattern_file(filepath)
+            self._cache(filepath, stamp, pattern)
+            return pattern
+        return json.loads(cached[1])
+
+    def _stamp(self, filepath):
+        """(mtime_ns, size) of a pattern file and its journal; None if there is no file."""
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        try:
+            jst = os.stat(journal_path(filepath))
+            journal = (jst.st_mtime_ns, jst.st_size)
+        except FileNotFoundError:
+            journal = None
+        return (st.st_mtime_ns, st.st_size, journal)
+
+    def _remember(self, filepath, pattern):
+        """Cache what was just written, so the next get() does not re-read it."""
+        stamp = self._stamp(filepath)
+        if stamp is not None:
+            self._cache(filepath, stamp, pattern)
+
+    def _cache(self, filepath, stamp, pattern):
+        entry = (stamp, json.dumps(pattern, ensure_ascii=False))
+        with self._cache_lock:
+            self._patterns[filepath] = entry
+            self._patterns.move_to_end(filepath)
+            while len(self._patterns) > PATTERN_CACHE_SIZE:
+                self._patterns.popitem(last=False)
+
+    def _forget(self, filepath):
+        with self._cache_lock:
+            self._patterns.pop(filepath, None)
+
+    def save(self, name, pattern, coalesce=False):
+        """
+        Store pattern under name.
+
+        Returns:
+            bool: True if it is on disk, False if it is held for coalescing
+        """
+        filepath = self.filepath(name)
+        text = json.dumps(pattern, indent=2, ensure_ascii=False)
+        etag = pattern_etag(pattern)
+
+        def written():
+            try:
+                st = os.stat(filepath)
+                self._base_etags[filepath] = ((st.st_mtime_ns, st.st_size), etag)
+            except FileNotFoundError:
+                pass
+            # The journal no longer matches the file; it is ignored even if this fails
+            try:
+                os.remove(journal_path(filepath))
+            except FileNotFoundError:
+                pass
+            self._remember(filepath, pattern)
+            self.index.update(filepath, pattern)
+
+        with self.lock(name):
+            if self.writer.write(filepath, text, written, coalesce):
+                return True
+            # Held back; list it with its new summary until it is written
+            self.index.update(filepath, pattern)
+            return False
+
+    def flush(self):
+        """
+        Write saves that are still held back for coalescing.
+
+        Raises:
+            OSError: If one cannot be written (it stays held)
+        """
+        self.writer.flush()
+
+    def _file_etag(self, filepath):
+        """
+        ETag of the pattern file on disk, without its journal.
+
+        Remembered per file stat, so the file is only read again when
+        something else (an editor, git, a sync tool) has changed it.
+        """
+        st = os.stat(filepath)
+        stat = (st.st_mtime_ns, st.st_size)
+        known = self._base_etags.get(filepath)
+        if known is not None and known[0] == stat:
+            return known[1]
+        with open(filepath, "r", encoding="utf-8") as f:
+            etag = pattern_etag(json.load(f))
+        self._base_etags[filepath] = (stat, etag)
+        return etag
+
+    def save_patch(self, name, pattern, operations):
+        """
+        Store pattern, which is the stored pattern with operations applied.
+
+        Only the operations are written (appended to the patch journal). A
+        journal whose header does not match the file on disk (the file was
+        changed outside the store) is ignored on read, so it is replaced by a
+        new one instead of appended to.
+
+        Args:
+            name: Pattern name
+            pattern: The patched pattern
+            operations: The JSON Patch that produced it from the stored one
+        """
+        filepath = self.filepath(name)
+        with self.lock(name):
+            # The journal applies to the file on disk, so a held save goes first
+            self.writer.flush(filepath)
+            if not os.path.exists(filepath):
+                self.save(name, pattern)
+                return
+
+            journal = journal_path(filepath)
+            base = self._file_etag(filepath)
+            lines = []
+            mode = "a"
+            if journal_base(journal) != base:
+                lines.append(json.dumps({"base": base}))
+                mode = "w"
+            lines.append(json.dumps(operations, ensure_ascii=False, separators=(",", ":")))
+            # A torn append only loses this line; replay stops before it
+            with open(journal, mode, encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            limit = max(JOURNAL_COMPACT_MIN_BYTES, os.path.getsize(filepath) * JOURNAL_COMPACT_RATIO)
+            if os.path.getsize(journal) > limit:
+                self.save(name, pattern)
+            else:
+                self._remember(filepath, pattern)
+                self.index.update(filepath, pattern)
+
+    def delete(self, name):
+        """Delete a pattern. Returns False if it did not exist."""
+        filepath = self.filepath(name)
+        with self.lock(name):
+            self.writer.discard(filepath)
+            if not os.path.exists(filepath):
+                return False
+            os.remove(filepath)
+            try:
+                os.remove(journal_path(filepath))
+            except FileNotFoundError:
+                pass
+            self._base_etags.pop(filepath, None)
+            self._forget(filepath)
+            self.index.remove(filepath)
+            return True
+
+    def list(self, q=None, target_window=None, limit=None, offset=0):
+        """
+        Return (summaries, total) for patterns matching the filters, newest first.
+
+        q matches name or description; target_window must match exactly.
+        """
+        patterns = self.index.list()
+        if q:
+            patterns = [p for p in patterns if _matches(p, q)]
+        if target_window:
+            patterns = [p for p in patterns if p.get("target_window") == target_window]
+        total = len(patterns)
+        end = offset + limit if limit is not None else None
+        return patterns[offset:end], total
+
+
+# =============================================================================
+# SQLite Store
+# =============================================================================
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patterns (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    target_window TEXT,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    loop_count INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patterns_name ON patterns (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_patterns_updated_at ON patterns (updated_at);
+CREATE INDEX IF NOT EXISTS idx_patterns_target_window ON patterns (target_window);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS patterns_fts USING fts5(
+    name, description, content='patterns', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS patterns_ai AFTER INSERT ON patterns BEGIN
+    INSERT INTO patterns_fts (rowid, name, description)
+    VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS patterns_ad AFTER DELETE ON patterns BEGIN
+    INSERT INTO patterns_fts (patterns_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS patterns_au AFTER UPDATE ON patterns BEGIN
+    INSERT INTO patterns_fts (patterns_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO patterns_fts (rowid, name, description)
+    VALUES (new.rowid, new.name, new.description);
+END;
+"""
+
+SUMMARY_COLUMNS = "name, description, target_window, step_count, loop_count, created_at, updated_at"
+
+
+def _fts_query(q):
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+class SQLitePatternStore:
+    """
+    Stores patterns in a single SQLite database.
+
+    Summary fields are kept in indexed columns so listing never parses the
+    pattern JSON, and name/description are full-text indexed when the SQLite
+    build supports FTS5 (falling back to LIKE otherwise).
+
+    Every save is its own transaction, which SQLite already makes atomic
+    and cheap, so nothing is held back for coalescing.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._locks = PatternLocks()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs every commit; NORMAL only at checkpoints (still never corrupt)
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._conn.commit()
+
+    def lock(self, name):
+        """Lock serializing writes to a pattern; hold it to read, check and save."""
+        return self._locks(pattern_key(name))
+
+    def exists(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM patterns WHERE key = ?", (pattern_key(name),)
+            ).fetchone()
+        return row is not None
+
+    def get(self, name):
+        """Return the pattern dict, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM patterns WHERE key = ?", (pattern_key(name),)
+            ).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def save(self, name, pattern, coalesce=False):
+        """Store pattern under name; always committed before it returns (True)."""
+        with self._lock, self._conn:
+            self._upsert(pattern_key(name), pattern)
+        return True
+
+    def save_patch(self, name, pattern, operations):
+        """Store pattern, which is the stored pattern with operations applied."""
+        self.save(name, pattern)
+
+    def flush(self):
+        """Nothing is held back; every save is committed before it returns."""
+
+    def save_many(self, patterns):
+        """Insert or replace many (name, pattern) pairs in one transaction."""
+        count = 0
+        with self._lock, self._conn:
+            for name, pattern in patterns:
+                self._upsert(pattern_key(name), pattern)
+                count += 1
+        return count
+
+    def delete(self, name):
+        """Delete a pattern. Returns False if it did not exist."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM patterns WHERE key = ?", (pattern_key(name),)
+            )
+        return cursor.rowcount > 0
+
+    def list(self, q=None, target_window=None, limit=None, offset=0):
+        """
+        Return (summaries, total) for patterns matching the filters, newest first.
+
+        q matches name or description; target_window must match exactly.
+        """
+        where = []
+        args = []
+        if q:
+            if self.fts and _fts_query(q):
+                where.append(
+                    "rowid IN (SELECT rowid FROM patterns_fts WHERE patterns_fts MATCH ?)"
+                )
+                args.append(_fts_query(q))
+            else:
+                where.append("(name LIKE ? OR description LIKE ?)")
+                args.extend([f"%{q}%", f"%{q}%"])
+        if target_window:
+            where.append("target_window = ?")
+            args.append(target_window)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM patterns {where_sql}", args
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM patterns {where_sql} "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                args + [limit if limit is not None else -1, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def _upsert(self, key, pattern):
+        self._conn.execute(
+            "INSERT INTO patterns (key, name, description, target_window, step_count, "
+            "loop_count, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET name = excluded.name, "
+            "description = excluded.description, target_window = excluded.target_window, "
+            "step_count = excluded.step_count, loop_count = excluded.loop_count, "
+            "created_at = excluded.created_at, updated_at = excluded.updated_at, "
+            "data = excluded.data",
+            (
+                key,
+                pattern.get("name", key),
+                pattern.get("description", "") or "",
+                pattern.get("target_window"),
+                len(pattern.get("sequence", [])),
+                pattern.get("loop_count", 1),
+                pattern.get("created_at", ""),
+                pattern.get("updated_at", ""),
+                json.dumps(pattern, ensure_ascii=False),
+            ),
+        )
+
+
+# =============================================================================
+# Store Selection and Migration
+# =============================================================================
+
+
+def create_store(patterns_dir):
+    """Create the store selected by KEYSTROKER_STORE (default: JSON files)."""
+    fsync = os.environ.get("KEYSTROKER_FSYNC", "1") != "0"
+    if os.environ.get("KEYSTROKER_STORE", "file").lower() == "sqlite":
+        db_path = os.environ.get(
+            "KEYSTROKER_DB", os.path.join(os.path.dirname(patterns_dir), "patterns.db")
+        )
+        return SQLitePatternStore(db_path, fsync=fsync)
+    return FilePatternStore(patterns_dir, fsync=fsync)
+
+
+def save_copy(store, name, pattern):
+    """
+    Save pattern under the first free copy name: "name (Copy)", "name (Copy) 2", ...
+
+    Each candidate is checked and saved under its lock, so concurrent copies
+    never claim the same name.
+
+    Returns:
+        str: The name the copy was saved as
+    """
+    base_name = name + " (Copy)"
+    new_name = base_name
+    counter = 2
+
+    while True:
+        with store.lock(new_name):
+            if not store.exists(new_name):
+                pattern["name"] = new_name
+                store.save(new_name, pattern)
+                return new_name
+        new_name = f"{base_name} {counter}"
+        counter += 1
+
+
+def load_pattern(value, patterns_dir):
+    """
+    Load a pattern from a .json path or by name from the store for patterns_dir.
+
+    Raises:
+        KeyError: If no such pattern exists
+    """
+    if value.endswith(".json") and os.path.exists(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    pattern = create_store(patterns_dir).get(value)
+    if pattern is None:
+        raise KeyError(value)
+    return pattern
+
+
+def import_json_patterns(store, directory):
+    """
+    Copy every readable JSON pattern file in directory into store.
+
+    Returns:
+        tuple: (imported_count, skipped_filenames)
+    """
+    patterns = []
+    skipped = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            pattern = read_pattern_file(os.path.join(directory, filename))
+        except (json.JSONDecodeError, IOError):
+            skipped.append(filename)
+            continue
+        # Key by filename so URLs that worked before keep working
+        patterns.append((filename[:-5], pattern))
+    return store.save_many(patterns), skipped
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="KeyStroker pattern store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser(
+        "import", help="Import JSON pattern files into the SQLite store"
+    )
+    import_parser.add_argument("--dir", default=os.path.join(base_dir, "patterns"))
+    import_parser.add_argument("--db", default=os.path.join(base_dir, "patterns.db"))
+    args = parser.parse_args()
+
+    store = SQLitePatternStore(args.db)
+    imported, skipped = import_json_patterns(store, args.dir)
+    print(f"Imported {imported} pattern(s) into {args.db}")
+    for filename in skipped:
+        print(f"  Skipped unreadable file: {filename}")
+
+
+if __name__ == "__main__":
+    main()
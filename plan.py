@@ -0,0 +1,521 @@
+"""
+Execution plan compiler for KeyStroker.
+Turns raw pattern step dictionaries into a validated, pre-parsed instruction list.
+"""
+
+import json
+import hashlib
+
+from input_backends import check_backend, DEFAULT_BACKEND
+
+# =============================================================================
+# Opcodes
+# =============================================================================
+
+OP_NOP = 0
+OP_TYPE = 1
+OP_TYPE_RANGE = 2
+OP_KEY = 3
+OP_HOTKEY = 4
+OP_WAIT = 5
+OP_CLICK = 6
+OP_MOVE = 7
+OP_REPEAT = 8
+OP_KEYS = 9
+
+# Modifier keys that are explicitly released after a hotkey
+MODIFIER_KEYS = ("shift", "ctrl", "alt", "win", "command")
+
+MOUSE_BUTTONS = ("left", "right", "middle")
+
+
+class PlanError(ValueError):
+    """Raised when a pattern step cannot be compiled into an instruction."""
+
+
+# =============================================================================
+# Field Parsing Helpers
+# =============================================================================
+
+
+def _int_field(step, field, default, path):
+    value = step.get(field, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PlanError(f"{path}: invalid '{field}' value {value!r} (expected integer)")
+
+
+def _float_field(step, field, default, path):
+    value = step.get(field, default)
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        raise PlanError(f"{path}: invalid '{field}' value {value!r} (expected number)")
+    if result < 0:
+        raise PlanError(f"{path}: '{field}' must not be negative")
+    return result
+
+
+def _str_field(step, field, path):
+    value = step.get(field, "")
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise PlanError(f"{path}: invalid '{field}' value {value!r} (expected text)")
+    return value
+
+
+# =============================================================================
+# Step Compilers
+# =============================================================================
+# Each compiler returns one instruction tuple whose first element is the opcode.
+#
+#   (OP_NOP,)
+#   (OP_TYPE, parts, interval, steps)  parts: text split on "{i}"
+#   (OP_TYPE_RANGE, start, length, width, interval)
+#   (OP_KEY, key)
+#   (OP_HOTKEY, keys, modifiers)
+#   (OP_WAIT, duration)
+#   (OP_CLICK, x, y, button, clicks)   x/y are None for current position
+#   (OP_MOVE, x, y, duration)
+#   (OP_REPEAT, times, delay, body, body_steps)
+#   (OP_KEYS, keys)                    only produced by coalesce_plan
+#
+# steps is the number of original pattern steps an instruction stands for,
+# so progress stays per original step after coalescing.
+
+
+def _compile_type(step, path):
+    text = _str_field(step, "value", path)
+    interval = _float_field(step, "interval", 0, path)
+    if not text:
+        return (OP_NOP,)
+    return (OP_TYPE, tuple(text.split("{i}")), interval, 1)
+
+
+def _compile_type_range(step, path):
+    start = _int_field(step, "start", 0, path)
+    end = _int_field(step, "end", 0, path)
+    interval = _float_field(step, "interval", 0, path)
+    if end < start:
+        raise PlanError(f"{path}: 'end' ({end}) must not be lower than 'start' ({start})")
+
+    width = 0
+    if step.get("use_padding", False):
+        min_digits = _int_field(step, "min_digits", 1, path)
+        if min_digits > 1:
+            width = min_digits
+
+    return (OP_TYPE_RANGE, start, end - start + 1, width, interval)
+
+
+def _compile_key(step, path):
+    key = _str_field(step, "value", path)
+    if not key:
+        return (OP_NOP,)
+    return (OP_KEY, key)
+
+
+def _compile_hotkey(step, path):
+    keys = step.get("keys", [])
+    if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+        raise PlanError(f"{path}: 'keys' must be a list of key names")
+    keys = tuple(k for k in keys if k)
+    if not keys:
+        return (OP_NOP,)
+    modifiers = tuple(k for k in keys if k.lower() in MODIFIER_KEYS)
+    return (OP_HOTKEY, keys, modifiers)
+
+
+def _compile_wait(step, path):
+    return (OP_WAIT, _float_field(step, "value", 0, path))
+
+
+def _compile_click(step, path):
+    button = step.get("button", "left")
+    if button not in MOUSE_BUTTONS:
+        raise PlanError(f"{path}: invalid 'button' value {button!r}")
+    clicks = _int_field(step, "clicks", 1, path)
+    if clicks < 1:
+        raise PlanError(f"{path}: 'clicks' must be at least 1")
+
+    if step.get("x") is not None and step.get("y") is not None:
+        x = _int_field(step, "x", 0, path)
+        y = _int_field(step, "y", 0, path)
+    else:
+        x = y = None
+
+    return (OP_CLICK, x, y, button, clicks)
+
+
+def _compile_move(step, path):
+    x = _int_field(step, "x", 0, path)
+    y = _int_field(step, "y", 0, path)
+    duration = _float_field(step, "duration", 0, path)
+    return (OP_MOVE, x, y, duration)
+
+
+def _compile_repeat(step, path):
+    times = _int_field(step, "times", 1, path)
+    delay = _float_field(step, "delay", 0, path)
+    children = step.get("children", [])
+    if not isinstance(children, list):
+        raise PlanError(f"{path}: 'children' must be a list of steps")
+
+    body = compile_sequence(children, f"{path}.children")
+
+    # Skip if times is 0 or no children, same as the interpreter always did
+    if times <= 0 or not body:
+        return None
+
+    return (OP_REPEAT, times, delay, body, count_plan_steps(body))
+
+
+STEP_COMPILERS = {
+    "type": _compile_type,
+    "type_range": _compile_type_range,
+    "key": _compile_key,
+    "hotkey": _compile_hotkey,
+    "wait": _compile_wait,
+    "click": _compile_click,
+    "move_mouse": _compile_move,
+    "repeat": _compile_repeat,
+}
+
+
+# =============================================================================
+# Public API
+# =============================================================================
+
+
+def compile_sequence(sequence, path="sequence"):
+    """
+    Compile a list of step dictionaries into a list of instructions.
+
+    Args:
+        sequence: List of raw step dictionaries
+        path: Location prefix used in error messages
+
+    Returns:
+        list: Instruction tuples, with repeat blocks compiled into counted blocks
+
+    Raises:
+        PlanError: If any step is malformed
+    """
+    if not isinstance(sequence, list):
+        raise PlanError(f"{path}: must be a list of steps")
+
+    instructions = []
+    for index, step in enumerate(sequence):
+        step_path = f"{path}[{index}]"
+        if not isinstance(step, dict):
+            raise PlanError(f"{step_path}: step must be an object")
+
+        action = step.get("action")
+        compiler = STEP_COMPILERS.get(action)
+        if compiler is None:
+            raise PlanError(f"{step_path}: unknown action {action!r}")
+
+        instruction = compiler(step, step_path)
+        if instruction is not None:
+            instructions.append(instruction)
+    return instructions
+
+
+def instruction_steps(instruction):
+    """Number of original pattern steps a (non-repeat) instruction stands for."""
+    opcode = instruction[0]
+    if opcode == OP_KEYS:
+        return len(instruction[1])
+    if opcode == OP_TYPE:
+        return instruction[3]
+    return 1
+
+
+def count_plan_steps(plan):
+    """Count the progress steps a compiled instruction list reports per run."""
+    total = 0
+    for instruction in plan:
+        if instruction[0] == OP_REPEAT:
+            total += instruction[1] * instruction[4]
+        else:
+            total += instruction_steps(instruction)
+    return total
+
+
+def compile_pattern(startup_sequence, sequence):
+    """
+    Compile both sequences of a pattern.
+
+    Returns:
+        tuple: (startup_plan, main_plan)
+
+    Raises:
+        PlanError: If any step is malformed
+    """
+    startup_plan = compile_sequence(startup_sequence or [], "startup_sequence")
+    main_plan = compile_sequence(sequence or [], "sequence")
+    return startup_plan, main_plan
+
+
+# =============================================================================
+# Run Parameters
+# =============================================================================
+
+
+def _optional_float(data, field):
+    value = data.get(field)
+    return float(value) if value is not None else None
+
+
+def pattern_hash(startup_sequence, sequence):
+    """
+    Identify the work a pattern does, independent of its loop count.
+
+    Two payloads with the same steps share checkpoints, so a run can be
+    resumed with a different loop_count or start delay.
+    """
+    raw = json.dumps(
+        [startup_sequence or [], sequence or []], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_run_params(data):
+    """
+    Validate a /run payload and compile its sequences.
+
+    Returns:
+        dict: Run parameters including the compiled plans
+
+    Raises:
+        ValueError: If the payload is invalid (PlanError for malformed steps)
+    """
+    startup_sequence = data.get("startup_sequence", [])
+    sequence = data.get("sequence", [])
+
+    if not sequence and not startup_sequence:
+        raise ValueError("Both sequences are empty")
+
+    backend = data.get("backend") or DEFAULT_BACKEND
+    check_backend(backend)
+
+    start_loop = int(data.get("start_loop", 1))
+    if start_loop < 1:
+        raise ValueError("start_loop must be at least 1")
+
+    # Compile and validate both sequences before anything is typed
+    startup_plan, main_plan = compile_pattern(startup_sequence, sequence)
+
+    # Batch adjacent key presses and typed text unless the run opts out
+    if data.get("coalesce", True):
+        join_tabs = bool(data.get("paste_tabs", False))
+        startup_plan = coalesce_plan(startup_plan, join_tabs)
+        main_plan = coalesce_plan(main_plan, join_tabs)
+
+    return {
+        "target_window": data.get("target_window"),
+        "target_mode": data.get("target_mode", "manual"),
+        "start_delay": int(data.get("start_delay", 3)),
+        "loop_count": int(data.get("loop_count", 1)),
+        "start_loop": start_loop,
+        "clipboard_timeout": _optional_float(data, "clipboard_timeout"),
+        "precise_timing": bool(data.get("precise_timing", False)),
+        "backend": backend,
+        "name": data.get("name"),
+        "pattern_hash": pattern_hash(startup_sequence, sequence),
+        "resume": bool(data.get("resume", False)),
+        "startup_plan": startup_plan,
+        "main_plan": main_plan,
+    }
+
+
+# =============================================================================
+# Coalescing Pass
+# =============================================================================
+
+
+# Most keys or characters coalesced into one instruction. The engine checks
+# for stop/pause and reports progress between instructions, so batches stay
+# short enough for those to act promptly
+MAX_BATCH = 256
+
+
+def _as_keys(instruction):
+    if instruction[0] == OP_KEY:
+        return (instruction[1],)
+    if instruction[0] == OP_KEYS:
+        return instruction[1]
+    return None
+
+
+def _batch_size(instruction):
+    """Keys or characters in a batchable instruction; None if it cannot be batched."""
+    keys = _as_keys(instruction)
+    if keys is not None:
+        return len(keys)
+    if instruction[0] == OP_TYPE:
+        return sum(len(part) for part in instruction[1])
+    return None
+
+
+class _Batch:
+    """
+    Keys or typed text being coalesced into one instruction.
+
+    Kept in lists while it grows, so coalescing costs time linear in the
+    number of keys and characters; build() returns the instruction.
+    """
+
+    def __init__(self, instruction):
+        keys = _as_keys(instruction)
+        if keys is not None:
+            self.keys = list(keys)
+            self.parts = None
+            self.interval = None
+            self.steps = len(keys)
+        else:
+            _, parts, self.interval, self.steps = instruction
+            self.keys = None
+            self.parts = list(parts)
+        self.size = _batch_size(instruction)
+
+    def _append_parts(self, parts):
+        self.parts[-1] += parts[0]
+        self.parts.extend(parts[1:])
+
+    def add(self, instruction, join_tabs):
+        """Append instruction if it can be merged; returns False otherwise."""
+        size = _batch_size(instruction)
+        if size is None or self.size + size > MAX_BATCH:
+            return False
+        keys = _as_keys(instruction)
+
+        if self.keys is not None and keys is not None:
+            self.keys.extend(keys)
+            self.steps += len(keys)
+        elif self.parts is not None and instruction[0] == OP_TYPE:
+            # Only merge texts typed at the same speed (interval applies in fallback mode)
+            if self.interval != instruction[2]:
+                return False
+            self._append_parts(instruction[1])
+            self.steps += instruction[3]
+        elif join_tabs and self.parts is not None and keys is not None:
+            if any(key != "tab" for key in keys):
+                return False
+            self.parts[-1] += "\t" * len(keys)
+            self.steps += len(keys)
+        elif join_tabs and self.keys is not None and instruction[0] == OP_TYPE:
+            if any(key != "tab" for key in self.keys):
+                return False
+            self.parts = ["\t" * len(self.keys)]
+            self.keys = None
+            self.interval = instruction[2]
+            self._append_parts(instruction[1])
+            self.steps += instruction[3]
+        else:
+            return False
+        self.size += size
+        return True
+
+    def build(self):
+        if self.keys is not None:
+            return (OP_KEYS, tuple(self.keys))
+        return (OP_TYPE, tuple(self.parts), self.interval, self.steps)
+
+
+def _repeated(instruction, times):
+    """instruction's keys or text repeated times, as one instruction."""
+    batch = _Batch(instruction)
+    if batch.keys is not None:
+        batch.keys *= times
+        batch.steps *= times
+    else:
+        parts = list(instruction[1])
+        for _ in range(times - 1):
+            batch._append_parts(parts)
+        batch.steps *= times
+    return batch.build()
+
+
+def _unroll_repeat(instruction):
+    """
+    Flatten a repeat block with no delay whose body is a single batch.
+
+    Up to MAX_BATCH keys or characters become one instruction; a longer
+    block becomes a repeat of such a batch (plus one for the remainder).
+
+    Returns:
+        list: The flattened instructions, or None if the block must stay counted
+    """
+    _, times, delay, body, _ = instruction
+    if len(body) != 1 or (delay > 0 and times > 1):
+        return None
+
+    inner = body[0]
+    size = _batch_size(inner)
+    if size is None:
+        return None
+
+    per_batch = max(1, MAX_BATCH // max(size, 1))
+    if times <= per_batch:
+        return [_repeated(inner, times)]
+
+    full, rest = divmod(times, per_batch)
+    batch = _repeated(inner, per_batch)
+    flattened = [(OP_REPEAT, full, 0, [batch], instruction_steps(batch))]
+    if rest:
+        flattened.append(_repeated(inner, rest))
+    return flattened
+
+
+def coalesce_plan(plan, join_tabs=False):
+    """
+    Merge adjacent input instructions into batched operations.
+
+    Consecutive key presses become one multi-key press, and consecutive typed
+    texts become one paste. Waits, hotkeys, clicks, typed number ranges and
+    repeat blocks with a delay act as barriers, so explicit timing is kept.
+    Repeat blocks without a delay around a single key or text are flattened.
+    Batches hold at most MAX_BATCH keys or characters, so stop, pause and
+    progress still act between them.
+
+    Args:
+        plan: Instruction list from compile_sequence
+        join_tabs: Also fold tab presses that follow typed text into the paste
+            ("text\\tmore text"). Only safe for targets that treat a pasted tab
+            like a typed one, so it is off by default.
+
+    Returns:
+        list: New instruction list reporting the same number of progress steps
+    """
+    result = []
+    batch = None
+
+    def push(instruction):
+        nonlocal batch
+        if batch is not None and batch.add(instruction, join_tabs):
+            return
+        if batch is not None:
+            result.append(batch.build())
+            batch = None
+        if _batch_size(instruction) is not None:
+            batch = _Batch(instruction)
+        else:
+            result.append(instruction)
+
+    for instruction in plan:
+        if instruction[0] == OP_REPEAT:
+            _, times, delay, body, body_steps = instruction
+            body = coalesce_plan(body, join_tabs)
+            instruction = (OP_REPEAT, times, delay, body, body_steps)
+            flattened = _unroll_repeat(instruction)
+            for item in flattened if flattened is not None else [instruction]:
+                push(item)
+            continue
+        push(instruction)
+
+    if batch is not None:
+        result.append(batch.build())
+    return result
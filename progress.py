@@ -0,0 +1,130 @@
+"""
+Progress broadcasting for KeyStroker.
+Fans a run's progress out to any number of SSE subscribers without slowing the run down.
+"""
+
+import time
+import threading
+from collections import deque
+
+# Most progress updates a subscriber is sent per second (the newest wins)
+DEFAULT_MAX_RATE = 20
+
+# Seconds of silence after which a subscriber is sent a heartbeat
+HEARTBEAT_INTERVAL = 15
+
+# Discrete (non-progress) events kept for Last-Event-ID replay
+MAX_EVENT_LOG = 100
+
+TERMINAL_TYPES = ("complete", "stopped")
+
+
+class ProgressBroadcaster:
+    """
+    Latest-state progress channel for one run.
+
+    The run publishes with publish(), which only takes a lock and bumps a
+    sequence number, so it never waits on subscribers. Progress updates
+    overwrite each other; every other message (such as the terminal message)
+    is kept in a short log. Each subscriber keeps its own cursor (the last
+    event id it saw), so it receives the newest progress plus every discrete
+    event it has not seen yet. A reconnecting subscriber resumes from its
+    Last-Event-ID.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._progress = None  # (event_id, message) of the newest progress update
+        self._events = deque(maxlen=MAX_EVENT_LOG)  # (event_id, message)
+        self._closed = False
+
+    def publish(self, message):
+        """Publish a message to all current and future subscribers."""
+        with self._cond:
+            self._seq += 1
+            if message.get("type") == "progress":
+                self._progress = (self._seq, message)
+            else:
+                self._events.append((self._seq, message))
+                if message.get("type") in TERMINAL_TYPES:
+                    self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        """True once a terminal message has been published."""
+        return self._closed
+
+    def _pending(self, cursor, send_progress):
+        """
+        Events after cursor, in id order (caller holds the lock).
+
+        Progress held back by the throttle still goes out when a discrete
+        event published after it is pending: moving the cursor past that
+        event would otherwise drop the progress, and a "paused" event would
+        arrive without the step it paused at.
+        """
+        pending = [event for event in self._events if event[0] > cursor]
+        progress = self._progress
+        if progress is not None and progress[0] > cursor and (
+            send_progress or (pending and pending[-1][0] > progress[0])
+        ):
+            pending.append(progress)
+            pending.sort(key=lambda event: event[0])
+        return pending
+
+    def subscribe(self, last_event_id=0, max_rate=DEFAULT_MAX_RATE, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        Iterate over (event_id, message) pairs for one subscriber.
+
+        Blocks on a condition variable between events. Yields (None, None)
+        after heartbeat seconds without events, so the caller can write a
+        keep-alive (and notice a closed connection). Stops after the
+        terminal message.
+
+        Args:
+            last_event_id: Id of the last event the subscriber already has
+            max_rate: Most progress updates per second sent to this subscriber
+            heartbeat: Seconds of silence before a heartbeat is yielded
+        """
+        cursor = last_event_id or 0
+        min_interval = 1.0 / max_rate if max_rate else 0.0
+        last_progress = None
+
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + heartbeat
+                while True:
+                    now = time.monotonic()
+                    # Once the run is over, the final progress goes out unthrottled
+                    throttled = (
+                        not self._closed
+                        and last_progress is not None
+                        and now - last_progress < min_interval
+                    )
+                    pending = self._pending(cursor, send_progress=not throttled)
+                    if pending:
+                        break
+                    if self._closed:
+                        # Reconnected after the terminal message; nothing left to send
+                        return
+                    if now >= deadline:
+                        break
+                    wake = deadline
+                    if throttled and self._pending(cursor, send_progress=True):
+                        # Progress is waiting; wake up when it may be sent
+                        wake = min(last_progress + min_interval, deadline)
+                    self._cond.wait(wake - now)
+
+            if not pending:
+                yield None, None
+                continue
+
+            for event_id, message in pending:
+                cursor = event_id
+                if message.get("type") == "progress":
+                    last_progress = time.monotonic()
+                yield event_id, message
+                if message.get("type") in TERMINAL_TYPES:
+                    return
@@ -8,6 +8,7 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # Import and run
 from app import app
+from serving import create_server
 
 if __name__ == "__main__":
     print("\n" + "=" * 50)
@@ -16,4 +17,5 @@ if __name__ == "__main__":
     print("\n  Open your browser and go to: http://127.0.0.1:5001")
     print("\n  SAFETY: Move mouse to top-left corner to stop!")
     print("=" * 50 + "\n")
-    app.run(debug=False, host="127.0.0.1", port=5001, threaded=True)
+    server_name, serve = create_server(app, "127.0.0.1", 5001)
+    serve()
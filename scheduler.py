@@ -0,0 +1,124 @@
+"""
+Deadline-based step timing for KeyStroker.
+Keeps waits on a fixed monotonic timeline so actuation overhead does not add up.
+"""
+
+import math
+import time
+
+# Below this much remaining time, precise mode spins instead of sleeping
+SPIN_THRESHOLD = 0.002
+
+# If a run falls this far behind schedule (e.g. a slow window activation),
+# the timeline is re-anchored instead of firing the missed waits back to back
+RESYNC_AFTER = 1.0
+
+
+class DeadlineScheduler:
+    """
+    Turns a run's sleeps into absolute deadlines on the monotonic clock.
+
+    Each sleep(duration) advances the deadline by duration from the previous
+    deadline, not from "now", and sleeps only what is left. Time spent
+    pressing keys between two waits is therefore absorbed by the next wait
+    instead of pushing the whole run later and later.
+
+    Lateness (how far past its deadline each wait woke up) is tracked so
+    drift and jitter can be reported per run.
+
+    A wait can be made interruptible by passing a control object with
+    wait(timeout) -> bool (True when woken early) and checkpoint(), which
+    may raise to abort or block to pause (see engine.RunState).
+    """
+
+    def __init__(self, precise=False, spin_threshold=SPIN_THRESHOLD, resync_after=RESYNC_AFTER):
+        self.precise = precise
+        self.spin_threshold = spin_threshold
+        self.resync_after = resync_after
+        self._deadline = time.perf_counter()
+        self._started = self._deadline
+        self._nominal = 0.0
+
+        # Lateness statistics (Welford's running mean/variance)
+        self.waits = 0
+        self.overruns = 0
+        self.resyncs = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max = 0.0
+        self._last = 0.0
+
+    def sleep(self, duration, control=None):
+        """Sleep until the next deadline, duration after the previous one."""
+        if duration <= 0:
+            return
+
+        now = time.perf_counter()
+        if now - self._deadline > self.resync_after:
+            # Too far behind to catch up sensibly; start a new timeline
+            self._deadline = now
+            self.resyncs += 1
+
+        self._deadline += duration
+        self._nominal += duration
+        remaining = self._deadline - now
+        if remaining <= 0:
+            # Actuations since the last wait took longer than this wait
+            self.overruns += 1
+        else:
+            self._wait_until(control)
+
+        self._record(time.perf_counter() - self._deadline)
+
+    def shift(self, seconds):
+        """Move the timeline later, e.g. by the time a run spent paused."""
+        self._deadline += seconds
+
+    def _wait_until(self, control=None):
+        # Precise mode: coarse sleep, then spin through the last couple of ms
+        spin = self.spin_threshold if self.precise else 0.0
+        while True:
+            remaining = self._deadline - time.perf_counter() - spin
+            if remaining <= 0:
+                break
+            if control is None:
+                time.sleep(remaining)
+                break
+            if not control.wait(remaining):
+                break
+            # Woken by a stop or pause request; a pause shifts the deadline
+            control.checkpoint()
+
+        if self.precise:
+            while time.perf_counter() < self._deadline:
+                pass
+
+    def _record(self, lateness):
+        lateness = max(0.0, lateness)
+        self.waits += 1
+        delta = lateness - self._mean
+        self._mean += delta / self.waits
+        self._m2 += delta * (lateness - self._mean)
+        self._max = max(self._max, lateness)
+        self._last = lateness
+
+    def stats(self):
+        """
+        Timing statistics for the run so far, in milliseconds.
+
+        drift_ms is how far behind schedule the most recent wait woke up;
+        jitter_ms is the standard deviation of the lateness of all waits.
+        """
+        jitter = math.sqrt(self._m2 / self.waits) if self.waits > 1 else 0.0
+        return {
+            "precise": self.precise,
+            "waits": self.waits,
+            "overruns": self.overruns,
+            "resyncs": self.resyncs,
+            "drift_ms": round(self._last * 1000, 3),
+            "mean_late_ms": round(self._mean * 1000, 3),
+            "max_late_ms": round(self._max * 1000, 3),
+            "jitter_ms": round(jitter * 1000, 3),
+            "nominal_wait_ms": round(self._nominal * 1000, 3),
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000, 3),
+        }
@@ -0,0 +1,238 @@
+"""
+Production serving for KeyStroker.
+
+- create_server(): binds the WSGI server, waitress when it is installed and
+  werkzeug's development server otherwise
+- StaticAssets: static files with content-hash fingerprinted URLs, gzip (and
+  brotli, if installed) variants compressed once at startup, and
+  Cache-Control: immutable
+- render_cached(): rendered templates kept in memory, compressed
+"""
+
+import os
+import gzip
+import hashlib
+import mimetypes
+import importlib.util
+
+from flask import current_app, render_template, request, Response, abort
+
+# Select the WSGI server: "waitress", "werkzeug" or "auto" (waitress if installed)
+SERVER_ENV = "KEYSTROKER_SERVER"
+
+# waitress worker threads. Every open SSE stream (one per tab for the window
+# list, plus one per followed run) holds a thread for as long as it is open
+WAITRESS_THREADS = 48
+
+# Connections waitress accepts before it stops accepting new ones
+WAITRESS_CONNECTION_LIMIT = 200
+
+# Seconds an idle connection is kept open; must outlast the SSE heartbeat
+WAITRESS_CHANNEL_TIMEOUT = 60
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# Content encodings in order of preference
+ENCODINGS = ("br", "gzip")
+
+
+# =============================================================================
+# WSGI Server
+# =============================================================================
+
+
+def server_kind():
+    """The WSGI server create_server will use, from KEYSTROKER_SERVER."""
+    kind = os.environ.get(SERVER_ENV, "auto").lower()
+    if kind == "auto":
+        return "waitress" if importlib.util.find_spec("waitress") else "werkzeug"
+    if kind not in ("waitress", "werkzeug"):
+        raise ValueError(f"{SERVER_ENV} must be 'auto', 'waitress' or 'werkzeug', not {kind!r}")
+    return kind
+
+
+def create_server(app, host, port, kind=None):
+    """
+    Bind a WSGI server for app on host:port.
+
+    The socket is listening when this returns, so the caller can signal
+    readiness before it starts serving.
+
+    Args:
+        app: The Flask app
+        host, port: Address to listen on
+        kind: "waitress" or "werkzeug" (default: server_kind())
+
+    Returns:
+        tuple: (server name, function that serves requests forever)
+
+    Raises:
+        OSError: If the address cannot be bound (e.g. the port is in use)
+    """
+    kind = kind or server_kind()
+    if kind == "waitress":
+        from waitress import create_server as create_waitress_server
+
+        server = create_waitress_server(
+            app,
+            host=host,
+            port=port,
+            threads=WAITRESS_THREADS,
+            connection_limit=WAITRESS_CONNECTION_LIMIT,
+            channel_timeout=WAITRESS_CHANNEL_TIMEOUT,
+            ident="KeyStroker",
+        )
+        return kind, server.run
+
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    return kind, server.serve_forever
+
+
+# =============================================================================
+# Compressed Responses
+# =============================================================================
+
+
+def _compressible(mimetype, body):
+    return len(body) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_variants(body, mimetype):
+    """
+    Compress body once for every supported content encoding.
+
+    Returns:
+        dict: encoding -> bytes ("identity" is always present). brotli is
+        only included when the Brotli package is installed.
+    """
+    variants = {"identity": body}
+    if not _compressible(mimetype, body):
+        return variants
+    variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    if importlib.util.find_spec("brotli"):
+        import brotli
+
+        variants["br"] = brotli.compress(body)
+    return variants
+
+
+def variant_response(variants, mimetype, etag, cache_control):
+    """
+    Build a response from precompressed variants for the current request.
+
+    Picks the best encoding the client accepts, sets ETag and
+    Cache-Control, and answers a matching If-None-Match with 304.
+    """
+    encoding = "identity"
+    if len(variants) > 1:
+        offered = [e for e in ENCODINGS if e in variants]
+        encoding = request.accept_encodings.best_match(offered) or "identity"
+
+    response = Response(variants[encoding], mimetype=mimetype)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    if len(variants) > 1:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = cache_control
+    response.set_etag(f"{etag}-{encoding}")
+    return response.make_conditional(request)
+
+
+# =============================================================================
+# Fingerprinted Static Assets
+# =============================================================================
+
+
+class StaticAssets:
+    """
+    Static files served under content-hash fingerprinted URLs.
+
+    Each file in folder is read once, hashed, and compressed in every
+    supported encoding. url("style.css") returns e.g.
+    "/assets/style.3f2a9c1b7d.css"; since the name changes whenever the
+    content does, responses are cached by the browser as immutable.
+
+    In debug mode url() returns the plain /static/ URL instead, so edits show
+    up on reload.
+    """
+
+    def __init__(self, folder, url_prefix="/assets"):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self._urls = {}  # Relative path -> fingerprinted path
+        self._files = {}  # Fingerprinted path -> (mimetype, digest, variants)
+
+    def load(self):
+        """Read, fingerprint and compress every file under folder."""
+        urls = {}
+        files = {}
+        for root, _, filenames in os.walk(self.folder):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                digest = hashlib.sha256(body).hexdigest()[:10]
+                stem, ext = os.path.splitext(name)
+                fingerprinted = f"{stem}.{digest}{ext}"
+                mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                urls[name] = fingerprinted
+                files[fingerprinted] = (mimetype, digest, compress_variants(body, mimetype))
+        self._urls = urls
+        self._files = files
+
+    def url(self, name):
+        """URL of a static file; fingerprinted unless the app runs in debug mode."""
+        if current_app.debug or name not in self._urls:
+            return f"/static/{name}"
+        return f"{self.url_prefix}/{self._urls[name]}"
+
+    def serve(self, path):
+        """View serving a fingerprinted file (404 for unknown names)."""
+        entry = self._files.get(path)
+        if entry is None:
+            abort(404)
+        mimetype, digest, variants = entry
+        return variant_response(variants, mimetype, digest, IMMUTABLE_CACHE)
+
+    def init_app(self, app):
+        """Load the assets and register the asset route and asset_url template helper."""
+        self.load()
+        app.add_url_rule(f"{self.url_prefix}/<path:path>", "assets", self.serve)
+        app.add_template_global(self.url, "asset_url")
+
+
+# =============================================================================
+# Cached Templates
+# =============================================================================
+
+# (template, context items) -> (etag, variants)
+_page_cache = {}
+
+
+def render_cached(template_name, **context):
+    """
+    Render a template once and serve it from memory, compressed.
+
+    The page is revalidated on every load (Cache-Control: no-cache), which
+    costs a 304 while it is unchanged. Rendered again on every call in
+    debug mode.
+    """
+    if current_app.debug:
+        return render_template(template_name, **context)
+
+    key = (template_name, tuple(sorted(context.items())))
+    cached = _page_cache.get(key)
+    if cached is None:
+        body = render_template(template_name, **context).encode("utf-8")
+        cached = (hashlib.sha256(body).hexdigest()[:16], compress_variants(body, "text/html"))
+        _page_cache[key] = cached
+    etag, variants = cached
+    return variant_response(variants, "text/html", etag, "no-cache")
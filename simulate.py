@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Dry-run simulation for KeyStroker.
+
+Estimates how long a pattern run takes and how many input events it sends,
+without touching the keyboard or mouse and without actually waiting. Repeat
+blocks and loops are multiplied out rather than stepped through, so patterns
+with millions of steps are estimated instantly.
+
+Usage:
+    python simulate.py <pattern name or .json file> [--loops N] [--pause S]
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import Counter
+
+from plan import (
+    parse_run_params,
+    count_plan_steps,
+    OP_NOP,
+    OP_TYPE,
+    OP_TYPE_RANGE,
+    OP_KEY,
+    OP_KEYS,
+    OP_HOTKEY,
+    OP_WAIT,
+    OP_CLICK,
+    OP_MOVE,
+    OP_REPEAT,
+)
+from scheduler import RESYNC_AFTER
+from input_backends import BACKEND_PYAUTOGUI, BACKEND_CLASSES, DEFAULT_BACKEND
+from pattern_store import load_pattern
+
+# pyautogui defaults the estimate is based on
+PYAUTOGUI_PAUSE = 0.1  # pyautogui.PAUSE, applied after every public call
+PYAUTOGUI_MINIMUM_DURATION = 0.1  # moves shorter than this are instant
+
+# Fixed delays used by the engine, window manager and clipboard session
+HOTKEY_RELEASE_DELAY = 0.02  # scheduled
+ACTIVATION_PAUSE = 0.3  # activate_window's own sleep (not scheduled)
+ACTIVATION_DELAY = 0.5  # scheduled pause after activation
+
+
+# =============================================================================
+# Virtual Timeline
+# =============================================================================
+# The engine schedules waits as deadlines (see scheduler.DeadlineScheduler),
+# so a wait absorbs the actuation time spent since the previous deadline.
+# A piece of a run is summarized as a "span" that can be concatenated and
+# repeated without stepping through it:
+#
+#   (actuation,)                                no scheduled waits
+#   (prefix, first_wait, middle, suffix)        at least one scheduled wait
+#
+# prefix is the actuation before the first wait, which a preceding span's
+# suffix adds to; middle is the elapsed time from the end of the first wait
+# to the end of the last one; suffix is the actuation after the last wait.
+
+EMPTY_SPAN = (0.0,)
+
+
+def _gap(actuation, wait):
+    """Elapsed time of actuation followed by a scheduled wait."""
+    if actuation > RESYNC_AFTER:
+        # The scheduler re-anchors instead of catching up
+        return actuation + wait
+    return max(actuation, wait)
+
+
+def actuation_span(seconds):
+    return (seconds,)
+
+
+def wait_span(seconds):
+    return (0.0, seconds, 0.0, 0.0)
+
+
+def concat(x, y):
+    """Span of x immediately followed by y."""
+    if len(x) == 1 and len(y) == 1:
+        return (x[0] + y[0],)
+    if len(x) == 1:
+        return (x[0] + y[0], y[1], y[2], y[3])
+    if len(y) == 1:
+        return (x[0], x[1], x[2], x[3] + y[0])
+    return (x[0], x[1], x[2] + _gap(x[3] + y[0], y[1]) + y[2], y[3])
+
+
+def repeat_span(span, times):
+    """Span of span repeated times in a row (by squaring, O(log times))."""
+    result = EMPTY_SPAN
+    while times > 0:
+        if times & 1:
+            result = concat(result, span)
+        span = concat(span, span)
+        times >>= 1
+    return result
+
+
+def span_seconds(span):
+    """Wall time of a span that starts on schedule."""
+    if len(span) == 1:
+        return span[0]
+    return _gap(span[0], span[1]) + span[2] + span[3]
+
+
+# =============================================================================
+# Cost Model
+# =============================================================================
+
+
+class Simulator:
+    """
+    Virtual-clock cost model of the execution engine.
+
+    Args:
+        pause: pyautogui.PAUSE in seconds
+        clipboard: Whether text is pasted (True) or typed key by key (False)
+        settle: Expected clipboard settle time per copy, in seconds
+    """
+
+    def __init__(self, pause=PYAUTOGUI_PAUSE, clipboard=True, settle=0.0):
+        self.pause = pause
+        self.clipboard = clipboard
+        self.settle = settle
+
+    def plan_span(self, plan, loop_index):
+        """Timeline span of a plan for the given loop index."""
+        span = EMPTY_SPAN
+        for instruction in plan:
+            if instruction[0] == OP_REPEAT:
+                _, times, delay, body, _ = instruction
+                body_span = self.plan_span(body, loop_index)
+                if delay > 0 and times > 1:
+                    unit = concat(body_span, wait_span(delay))
+                    block = concat(repeat_span(unit, times - 1), body_span)
+                else:
+                    block = repeat_span(body_span, times)
+                span = concat(span, block)
+            else:
+                span = concat(span, self._instruction_span(instruction, loop_index))
+        return span
+
+    def plan_events(self, plan):
+        """Event counts of one pass through a plan (typed characters excluded)."""
+        events = Counter()
+        for instruction in plan:
+            opcode = instruction[0]
+            if opcode == OP_REPEAT:
+                _, times, delay, body, _ = instruction
+                for name, count in self.plan_events(body).items():
+                    events[name] += count * times
+                if delay > 0 and times > 1:
+                    events["waits"] += times - 1
+            elif opcode in (OP_TYPE, OP_TYPE_RANGE):
+                events["pastes" if self.clipboard else "typed_texts"] += 1
+                events["input_calls"] += 1
+            elif opcode in (OP_KEY, OP_KEYS):
+                events["key_presses"] += 1 if opcode == OP_KEY else len(instruction[1])
+                events["input_calls"] += 1
+            elif opcode == OP_HOTKEY:
+                events["hotkeys"] += 1
+                events["input_calls"] += 1 + len(instruction[2])
+            elif opcode == OP_WAIT:
+                events["waits"] += 1
+            elif opcode == OP_CLICK:
+                events["clicks"] += instruction[4]
+                events["input_calls"] += 1
+            elif opcode == OP_MOVE:
+                events["moves"] += 1
+                events["input_calls"] += 1
+        return events
+
+    def _instruction_span(self, instruction, loop_index):
+        opcode = instruction[0]
+
+        if opcode == OP_NOP:
+            return EMPTY_SPAN
+
+        if opcode in (OP_TYPE, OP_TYPE_RANGE):
+            if self.clipboard:
+                return actuation_span(self.settle + self.pause)
+            # pyautogui.write: one key per character, interval after each
+            interval = instruction[2] if opcode == OP_TYPE else instruction[4]
+            length = typed_length(instruction, loop_index)
+            return actuation_span(length * interval + self.pause)
+
+        if opcode in (OP_KEY, OP_KEYS, OP_CLICK):
+            return actuation_span(self.pause)
+
+        if opcode == OP_HOTKEY:
+            # hotkey() plus one keyUp() per modifier, then a scheduled release delay
+            span = actuation_span(self.pause * (1 + len(instruction[2])))
+            return concat(span, wait_span(HOTKEY_RELEASE_DELAY))
+
+        if opcode == OP_WAIT:
+            return wait_span(instruction[1])
+
+        if opcode == OP_MOVE:
+            duration = instruction[3]
+            move = duration if duration >= PYAUTOGUI_MINIMUM_DURATION else 0.0
+            return actuation_span(move + self.pause)
+
+        return EMPTY_SPAN
+
+
+def typed_length(instruction, loop_index):
+    """Number of characters a type or type_range instruction types in a loop."""
+    if instruction[0] == OP_TYPE:
+        parts = instruction[1]
+        return sum(len(p) for p in parts) + len(str(loop_index)) * (len(parts) - 1)
+    _, start, range_length, width, _ = instruction
+    number = start + ((loop_index - 1) % range_length)
+    return max(len(str(number)), width)
+
+
+def _digit_chars(first, last, width):
+    """Total characters of the numbers first..last, each padded to width."""
+    total = 0
+    number = first
+    while number <= last:
+        if number < 0:
+            digits = len(str(-number))
+            end = min(last, -(10 ** (digits - 1)))
+            total += (end - number + 1) * max(digits + 1, width)
+        else:
+            digits = len(str(number))
+            end = min(last, 10**digits - 1)
+            total += (end - number + 1) * max(digits, width)
+        number = end + 1
+    return total
+
+
+def typed_chars(instruction, loops):
+    """Characters a type or type_range instruction types over loops 1..loops."""
+    if instruction[0] == OP_TYPE:
+        parts = instruction[1]
+        fixed = loops * sum(len(p) for p in parts)
+        return fixed + (len(parts) - 1) * _digit_chars(1, loops, 0)
+    _, start, range_length, width, _ = instruction
+    cycles, rest = divmod(loops, range_length)
+    return cycles * _digit_chars(start, start + range_length - 1, width) + _digit_chars(
+        start, start + rest - 1, width
+    )
+
+
+def _loop_groups(typed, first_loop, loop_count):
+    """[signature, first_loop, count] runs of loops first_loop..loop_count typing the same lengths."""
+    groups = []
+    i = first_loop
+    while i <= loop_count:
+        signature = tuple(typed_length(instr, i) for _, instr in typed)
+        stride = min([_next_change(instr, i) for _, instr in typed] + [loop_count + 1 - i])
+        if groups and groups[-1][0] == signature:
+            groups[-1][2] += stride
+        else:
+            groups.append([signature, i, stride])
+        i += stride
+    return groups
+
+
+def _next_change(instruction, loop_index):
+    """Loops until typed_length of an instruction may change (at least 1)."""
+    if instruction[0] == OP_TYPE:
+        if len(instruction[1]) == 1:
+            return float("inf")
+        return 10 ** len(str(loop_index)) - loop_index
+    _, start, range_length, _, _ = instruction
+    offset = (loop_index - 1) % range_length
+    number = start + offset
+    until_wrap = range_length - offset
+    if number < 0:
+        return 1
+    return min(until_wrap, 10 ** len(str(number)) - number)
+
+
+def _typed_instructions(plan, mult=1):
+    """(multiplicity, instruction) for every typing instruction in a plan."""
+    found = []
+    for instruction in plan:
+        if instruction[0] == OP_REPEAT:
+            found.extend(_typed_instructions(instruction[3], mult * instruction[1]))
+        elif instruction[0] in (OP_TYPE, OP_TYPE_RANGE):
+            found.append((mult, instruction))
+    return found
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def simulate_run(params, pause=None, clipboard=None, settle=0.0, checkpoint=None):
+    """
+    Estimate a run without executing it.
+
+    Covers the loops the engine would run: from params["start_loop"], or
+    after the checkpoint's loop (without the startup sequence) when resuming.
+
+    Args:
+        params: Run parameters from plan.parse_run_params
+        pause: Pause after every input call in seconds (default: pyautogui.PAUSE
+            for the pyautogui backend, none for the others)
+        clipboard: Whether text is pasted (True) or typed key by key (False);
+            defaults to what the run's input backend does
+        settle: Expected clipboard settle time per copy, in seconds
+        checkpoint: Checkpoint the run resumes from (CheckpointJournal.get),
+            or None
+
+    Returns:
+        dict: Estimated total time, per-phase and per-loop breakdown and
+        event counts (times in milliseconds)
+    """
+    backend = params.get("backend", DEFAULT_BACKEND)
+    if pause is None:
+        pause = PYAUTOGUI_PAUSE if backend == BACKEND_PYAUTOGUI else 0.0
+    if clipboard is None:
+        clipboard = BACKEND_CLASSES[backend].uses_clipboard
+
+    simulator = Simulator(pause=pause, clipboard=clipboard, settle=settle)
+    loop_count = params["loop_count"]
+    main_plan = params["main_plan"]
+    startup_plan = params["startup_plan"] if checkpoint is None else []
+    if checkpoint is not None:
+        first_loop = checkpoint["loop"] + 1
+    else:
+        first_loop = params.get("start_loop", 1)
+    run_loops = max(0, loop_count - first_loop + 1)
+
+    # Setup: window activation and start delay, all before the first step
+    setup = EMPTY_SPAN
+    if params["target_mode"] == "auto" and params["target_window"]:
+        setup = concat(actuation_span(ACTIVATION_PAUSE), wait_span(ACTIVATION_DELAY))
+    setup = concat(setup, wait_span(float(params["start_delay"])))
+
+    startup = simulator.plan_span(startup_plan, 1)
+    timeline = concat(setup, startup)
+    setup_seconds = span_seconds(setup)
+    startup_seconds = span_seconds(timeline) - setup_seconds
+
+    # Loops only differ in how many characters they type, which matters only
+    # when typing key by key. Consecutive loops that type the same lengths
+    # share one span and are repeated by squaring.
+    typed = _typed_instructions(main_plan)
+    if clipboard:
+        groups = [[(), first_loop, run_loops]] if run_loops > 0 else []
+    else:
+        groups = _loop_groups(typed, first_loop, loop_count)
+
+    loops = []
+    spans = {}
+    before_loops = span_seconds(timeline)
+    for signature, first, count in groups:
+        if signature not in spans:
+            spans[signature] = simulator.plan_span(main_plan, first)
+        loop_span = spans[signature]
+
+        # The first loop of a group can differ (it absorbs the previous suffix);
+        # after that every loop adds the same time
+        start_seconds = span_seconds(timeline)
+        one = concat(timeline, loop_span)
+        first_ms = _ms(span_seconds(one) - start_seconds)
+        _add_loop_range(loops, first, first, first_ms)
+        if count > 1:
+            two = concat(one, loop_span)
+            steady_ms = _ms(span_seconds(two) - span_seconds(one))
+            _add_loop_range(loops, first + 1, first + count - 1, steady_ms)
+        timeline = concat(timeline, repeat_span(loop_span, count))
+
+    total = span_seconds(timeline)
+
+    events = simulator.plan_events(startup_plan)
+    for name, count in simulator.plan_events(main_plan).items():
+        events[name] += count * run_loops
+    events["typed_chars"] = sum(
+        mult * typed_chars(instr, 1) for mult, instr in _typed_instructions(startup_plan)
+    ) + sum(
+        mult * (typed_chars(instr, loop_count) - typed_chars(instr, first_loop - 1))
+        for mult, instr in typed
+        if run_loops > 0
+    )
+
+    return {
+        "total_ms": _ms(total),
+        "setup_ms": _ms(setup_seconds),
+        "startup_ms": _ms(startup_seconds),
+        "loops_ms": _ms(total - before_loops),
+        "loop_count": run_loops,
+        "first_loop": first_loop,
+        "loops": loops,
+        "total_steps": count_plan_steps(startup_plan)
+        + count_plan_steps(main_plan) * run_loops,
+        "events": dict(events),
+        "assumptions": {
+            "backend": backend,
+            "pause_ms": _ms(pause),
+            "clipboard": clipboard,
+            "settle_ms": _ms(settle),
+        },
+    }
+
+
+def _add_loop_range(loops, first, last, ms):
+    """Append a loop range, merging it into the previous one if the time matches."""
+    if loops and loops[-1]["ms"] == ms and loops[-1]["to"] == first - 1:
+        loops[-1]["to"] = last
+    else:
+        loops.append({"from": first, "to": last, "ms": ms})
+
+
+def _format_duration(ms):
+    seconds = ms / 1000
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{int(hours)}h {int(minutes)}m {secs:.1f}s"
+    if minutes:
+        return f"{int(minutes)}m {secs:.1f}s"
+    return f"{secs:.3f}s"
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Estimate a KeyStroker pattern run")
+    parser.add_argument("pattern", help="Pattern name or path to a pattern .json file")
+    parser.add_argument("--loops", type=int, help="Override the pattern's loop count")
+    parser.add_argument("--start-delay", type=int, help="Override the start delay")
+    parser.add_argument("--pause", type=float,
+                        help="Pause after each input call in seconds "
+                             "(default: 0.1 for the pyautogui backend, else 0)")
+    parser.add_argument("--backend", help="Estimate for this input backend")
+    parser.add_argument("--no-clipboard", action="store_true",
+                        help="Assume direct typing instead of clipboard paste")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="Estimate without batching adjacent input steps")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    parser.add_argument("--patterns-dir", default=os.path.join(base_dir, "patterns"))
+    args = parser.parse_args(argv)
+
+    try:
+        pattern = load_pattern(args.pattern, args.patterns_dir)
+    except KeyError:
+        print(f"Pattern '{args.pattern}' not found", file=sys.stderr)
+        return 1
+
+    if args.loops is not None:
+        pattern["loop_count"] = args.loops
+    if args.start_delay is not None:
+        pattern["start_delay"] = args.start_delay
+    if args.backend:
+        pattern["backend"] = args.backend
+    if args.no_coalesce:
+        pattern["coalesce"] = False
+
+    try:
+        params = parse_run_params(pattern)
+    except ValueError as e:
+        print(f"Invalid pattern: {e}", file=sys.stderr)
+        return 1
+
+    result = simulate_run(params, pause=args.pause, clipboard=False if args.no_clipboard else None)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"Pattern:     {pattern.get('name', args.pattern)}")
+    print(f"Total time:  {_format_duration(result['total_ms'])}")
+    print(f"  Setup:     {_format_duration(result['setup_ms'])}")
+    print(f"  Startup:   {_format_duration(result['startup_ms'])}")
+    print(f"  Loops:     {_format_duration(result['loops_ms'])} ({result['loop_count']} loop(s))")
+    for loop_range in result["loops"][:10]:
+        span = f"{loop_range['from']}-{loop_range['to']}"
+        print(f"    {span:>13}: {_format_duration(loop_range['ms'])} each")
+    if len(result["loops"]) > 10:
+        print(f"    ... {len(result['loops']) - 10} more range(s)")
+    print(f"Steps:       {result['total_steps']}")
+    for name, count in sorted(result["events"].items()):
+        print(f"  {name}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
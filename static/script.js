@@ -9,9 +9,12 @@
 
 let sequenceModified = false;  // Track unsaved changes
 let currentPatternName = null; // Currently loaded pattern name
+let currentPatternEtag = null; // Server version (ETag) of the loaded pattern
 let itemIdCounter = 0;         // Unique ID counter for sequence items
+let activeJobId = null;        // Job shown in the execution overlay
 
-// Undo/Redo history
+// Undo/Redo history. The top of each stack is a full state; the entries below
+// it are JSON Patches that turn the entry above into that earlier state
 const MAX_HISTORY = 50;
 let undoStack = [];
 let redoStack = [];
@@ -56,6 +59,10 @@ const elements = {
     loadJsonBtn: document.getElementById('loadJsonBtn'),
     exportJsonBtn: document.getElementById('exportJsonBtn'),
     jsonFileInput: document.getElementById('jsonFileInput'),
+    exportLibraryBtn: document.getElementById('exportLibraryBtn'),
+    importLibraryBtn: document.getElementById('importLibraryBtn'),
+    importPolicy: document.getElementById('importPolicy'),
+    libraryFileInput: document.getElementById('libraryFileInput'),
     
     // Confirm Modal
     confirmModal: document.getElementById('confirmModal'),
@@ -113,6 +120,9 @@ const elements = {
     currentStep: document.getElementById('currentStep'),
     totalSteps: document.getElementById('totalSteps'),
     progressBar: document.getElementById('progressBar'),
+    progressLabel: document.getElementById('progressLabel'),
+    pauseRunBtn: document.getElementById('pauseRunBtn'),
+    stopRunBtn: document.getElementById('stopRunBtn'),
     
     // Version and Update
     versionDisplay: document.getElementById('versionDisplay'),
@@ -174,22 +184,145 @@ function markModified() {
 }
 
 // ============================================================================
-// Undo/Redo System
+// JSON Patch (RFC 6902)
 // ============================================================================
 
-function saveState() {
-    if (isUndoRedo) return;
+function jsonEqual(a, b) {
+    return a === b || JSON.stringify(a) === JSON.stringify(b);
+}
+
+function isPlainObject(value) {
+    return value !== null && typeof value === 'object' && !Array.isArray(value);
+}
+
+function escapePointer(key) {
+    return String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+}
+
+function unescapePointer(token) {
+    return token.replace(/~1/g, '/').replace(/~0/g, '~');
+}
+
+/**
+ * Append to ops the JSON Patch operations that turn before into after.
+ * Array edits cost O(change): the common prefix and suffix are skipped.
+ */
+function diffJson(before, after, path = '', ops = []) {
+    if (jsonEqual(before, after)) return ops;
+    
+    if (Array.isArray(before) && Array.isArray(after)) {
+        diffArrays(before, after, path, ops);
+    } else if (isPlainObject(before) && isPlainObject(after)) {
+        Object.keys(before).forEach(key => {
+            if (!(key in after)) {
+                ops.push({ op: 'remove', path: `${path}/${escapePointer(key)}` });
+            }
+        });
+        Object.keys(after).forEach(key => {
+            const keyPath = `${path}/${escapePointer(key)}`;
+            if (key in before) {
+                diffJson(before[key], after[key], keyPath, ops);
+            } else {
+                ops.push({ op: 'add', path: keyPath, value: after[key] });
+            }
+        });
+    } else {
+        ops.push({ op: 'replace', path: path, value: after });
+    }
+    return ops;
+}
+
+function diffArrays(before, after, path, ops) {
+    let start = 0;
+    while (start < before.length && start < after.length && jsonEqual(before[start], after[start])) {
+        start++;
+    }
+    let beforeEnd = before.length;
+    let afterEnd = after.length;
+    while (beforeEnd > start && afterEnd > start && jsonEqual(before[beforeEnd - 1], after[afterEnd - 1])) {
+        beforeEnd--;
+        afterEnd--;
+    }
     
-    const state = {
+    // Changed items in place, then drop the surplus (last first) or add the new ones
+    const common = Math.min(beforeEnd, afterEnd) - start;
+    for (let i = start; i < start + common; i++) {
+        diffJson(before[i], after[i], `${path}/${i}`, ops);
+    }
+    for (let i = beforeEnd - 1; i >= start + common; i--) {
+        ops.push({ op: 'remove', path: `${path}/${i}` });
+    }
+    for (let i = start + common; i < afterEnd; i++) {
+        ops.push({ op: 'add', path: `${path}/${i}`, value: after[i] });
+    }
+}
+
+/**
+ * Apply add/remove/replace operations (as produced by diffJson) to a copy of doc.
+ */
+function applyJsonPatch(doc, ops) {
+    let result = JSON.parse(JSON.stringify(doc));
+    ops.forEach(({ op, path, value }) => {
+        const tokens = path.split('/').slice(1).map(unescapePointer);
+        const copy = value === undefined ? undefined : JSON.parse(JSON.stringify(value));
+        if (tokens.length === 0) {
+            result = copy;
+            return;
+        }
+        const key = tokens.pop();
+        const parent = tokens.reduce((node, token) => node[token], result);
+        if (Array.isArray(parent)) {
+            const index = key === '-' ? parent.length : Number(key);
+            if (op === 'add') parent.splice(index, 0, copy);
+            else if (op === 'remove') parent.splice(index, 1);
+            else parent[index] = copy;
+        } else if (op === 'remove') {
+            delete parent[key];
+        } else {
+            parent[key] = copy;
+        }
+    });
+    return result;
+}
+
+// ============================================================================
+// Undo/Redo System
+// ============================================================================
+
+function getEditorState() {
+    return {
         startup: getStartupSequenceData(),
         main: getSequenceData()
     };
-    undoStack.push(JSON.stringify(state));
+}
+
+function pushHistory(stack, state) {
+    // Only the newest state is kept whole; the one below becomes a patch
+    if (stack.length > 0) {
+        const top = stack[stack.length - 1];
+        stack[stack.length - 1] = { patch: diffJson(state, top) };
+    }
+    stack.push(state);
     
     // Limit stack size
-    if (undoStack.length > MAX_HISTORY) {
-        undoStack.shift();
+    if (stack.length > MAX_HISTORY) {
+        stack.shift();
     }
+}
+
+function popHistory(stack) {
+    const state = stack.pop();
+    if (stack.length > 0) {
+        const below = stack[stack.length - 1];
+        stack[stack.length - 1] = applyJsonPatch(state, below.patch);
+    }
+    return state;
+}
+
+function saveState() {
+    if (isUndoRedo) return;
+    
+    pushHistory(undoStack, getEditorState());
     
     // Clear redo stack when new action is performed
     redoStack = [];
@@ -201,18 +334,11 @@ function undo() {
     if (undoStack.length === 0) return;
     
     // Save current state to redo stack
-    const currentState = {
-        startup: getStartupSequenceData(),
-        main: getSequenceData()
-    };
-    redoStack.push(JSON.stringify(currentState));
-    
-    // Get previous state
-    const previousState = undoStack.pop();
+    pushHistory(redoStack, getEditorState());
     
     // Apply previous state
     isUndoRedo = true;
-    restoreSequenceFromState(JSON.parse(previousState));
+    restoreSequenceFromState(popHistory(undoStack));
     isUndoRedo = false;
     
     updateUndoRedoButtons();
@@ -223,18 +349,11 @@ function redo() {
     if (redoStack.length === 0) return;
     
     // Save current state to undo stack
-    const currentState = {
-        startup: getStartupSequenceData(),
-        main: getSequenceData()
-    };
-    undoStack.push(JSON.stringify(currentState));
-    
-    // Get next state
-    const nextState = redoStack.pop();
+    pushHistory(undoStack, getEditorState());
     
     // Apply next state
     isUndoRedo = true;
-    restoreSequenceFromState(JSON.parse(nextState));
+    restoreSequenceFromState(popHistory(redoStack));
     isUndoRedo = false;
     
     updateUndoRedoButtons();
@@ -1001,9 +1120,29 @@ function loadSequenceFromData(data) {
 // Window List Management
 // ============================================================================
 
+function renderWindowList(windows) {
+    // Preserve current selection
+    const currentValue = elements.windowSelect.value;
+    
+    // Clear and repopulate
+    elements.windowSelect.innerHTML = '<option value="">Select a window...</option>';
+    
+    windows.forEach(windowTitle => {
+        const option = document.createElement('option');
+        option.value = windowTitle;
+        option.textContent = windowTitle;
+        elements.windowSelect.appendChild(option);
+    });
+    
+    // Try to restore selection
+    if (currentValue) {
+        elements.windowSelect.value = currentValue;
+    }
+}
+
 async function refreshWindowList() {
     try {
-        const response = await fetch('/windows');
+        const response = await fetch('/windows?refresh=1');
         const data = await response.json();
         
         if (data.error) {
@@ -1011,24 +1150,7 @@ async function refreshWindowList() {
             return;
         }
         
-        // Preserve current selection
-        const currentValue = elements.windowSelect.value;
-        
-        // Clear and repopulate
-        elements.windowSelect.innerHTML = '<option value="">Select a window...</option>';
-        
-        data.windows.forEach(windowTitle => {
-            const option = document.createElement('option');
-            option.value = windowTitle;
-            option.textContent = windowTitle;
-            elements.windowSelect.appendChild(option);
-        });
-        
-        // Try to restore selection
-        if (currentValue) {
-            elements.windowSelect.value = currentValue;
-        }
-        
+        renderWindowList(data.windows);
         showToast(`Found ${data.windows.length} windows`, 'success');
     } catch (error) {
         showToast('Failed to fetch window list', 'error');
@@ -1036,10 +1158,39 @@ async function refreshWindowList() {
     }
 }
 
+function watchWindowList() {
+    // The server pushes the window list whenever it changes; EventSource
+    // reconnects on its own if the connection drops
+    const windowSource = new EventSource('/windows/stream');
+    windowSource.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'windows') {
+            renderWindowList(data.windows);
+        }
+    };
+}
+
 // ============================================================================
 // Pattern Management
 // ============================================================================
 
+// Loaded patterns by name ({ etag, data }); reopening one only revalidates it
+const PATTERN_CACHE_SIZE = 20;
+const patternCache = new Map();
+
+function parseEtag(header) {
+    return header ? header.replace(/^W\//, '').replace(/"/g, '') : null;
+}
+
+function cachePattern(name, etag, data) {
+    // Map keeps insertion order, so the first key is the least recently used
+    patternCache.delete(name);
+    patternCache.set(name, { etag, data });
+    if (patternCache.size > PATTERN_CACHE_SIZE) {
+        patternCache.delete(patternCache.keys().next().value);
+    }
+}
+
 async function loadPatternsList() {
     try {
         const response = await fetch('/patterns');
@@ -1107,16 +1258,33 @@ let pendingPatternLoad = null;
 
 async function loadPattern(name) {
     try {
-        const response = await fetch(`/patterns/${encodeURIComponent(name)}`);
-        const data = await response.json();
-        
-        if (data.error) {
-            showToast(data.error, 'error');
-            return;
+        const cached = patternCache.get(name);
+        const headers = cached ? { 'If-None-Match': `"${cached.etag}"` } : {};
+        const response = await fetch(`/patterns/${encodeURIComponent(name)}`, { headers });
+        
+        let data;
+        let etag;
+        if (response.status === 304) {
+            // Unchanged since it was last loaded
+            data = cached.data;
+            etag = cached.etag;
+        } else {
+            data = await response.json();
+            
+            if (data.error) {
+                patternCache.delete(name);
+                showToast(data.error, 'error');
+                return;
+            }
+            etag = parseEtag(response.headers.get('ETag'));
+        }
+        if (etag) {
+            cachePattern(name, etag, data);
         }
         
         loadSequenceFromData(data);
         currentPatternName = name;
+        currentPatternEtag = etag;
         showToast(`Pattern "${name}" loaded`, 'success');
     } catch (error) {
         showToast('Failed to load pattern', 'error');
@@ -1164,6 +1332,10 @@ async function deletePattern(name) {
             return;
         }
         
+        patternCache.delete(name);
+        if (name === currentPatternName) {
+            currentPatternEtag = null;
+        }
         showToast(data.message, 'success');
         await loadPatternsList();
     } catch (error) {
@@ -1215,28 +1387,73 @@ async function savePattern(overwrite = false) {
         payload.loop_count = 1;
     }
     
+    // Version of this pattern the editor was loaded from, if any
+    const knownEtag = name === currentPatternName ? currentPatternEtag : null;
+    
+    const confirmOverwrite = () => {
+        pendingSaveData = payload;
+        elements.overwritePatternName.textContent = name;
+        hideModal(elements.savePatternModal);
+        showModal(elements.overwriteModal);
+    };
+    
     try {
-        // Check if pattern exists (unless we're overwriting)
+        // Saving over the loaded pattern: it exists, confirm without asking the server
+        if (!overwrite && knownEtag) {
+            confirmOverwrite();
+            return;
+        }
+        
+        // The server checks existence (If-None-Match: *) and whether another
+        // tab saved the pattern since it was loaded (If-Match)
+        const headers = { 'Content-Type': 'application/json' };
         if (!overwrite) {
-            const checkResponse = await fetch(`/patterns/${encodeURIComponent(name)}`);
-            if (checkResponse.ok) {
-                // Pattern exists, ask for confirmation
-                pendingSaveData = payload;
-                elements.overwritePatternName.textContent = name;
-                hideModal(elements.savePatternModal);
-                showModal(elements.overwriteModal);
-                return;
-            }
+            headers['If-None-Match'] = '*';
+        } else if (knownEtag) {
+            headers['If-Match'] = `"${knownEtag}"`;
         }
         
-        const response = await fetch('/patterns', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
+        // Overwriting the version we have cached: send only what changed
+        const base = patternCache.get(name);
+        let request = { method: 'POST', url: '/patterns', body: payload };
+        if (overwrite && knownEtag && base && base.etag === knownEtag) {
+            const ops = [];
+            Object.keys(payload).forEach(key => {
+                const keyPath = `/${escapePointer(key)}`;
+                if (key in base.data) {
+                    diffJson(base.data[key], payload[key], keyPath, ops);
+                } else {
+                    ops.push({ op: 'add', path: keyPath, value: payload[key] });
+                }
+            });
+            headers['Content-Type'] = 'application/json-patch+json';
+            request = { method: 'PATCH', url: `/patterns/${encodeURIComponent(name)}`, body: ops };
+        }
+        
+        const response = await fetch(request.url, {
+            method: request.method,
+            headers: headers,
+            body: JSON.stringify(request.body)
         });
         
         const data = await response.json();
         
+        if (response.status === 412) {
+            if (!overwrite) {
+                // Pattern exists, ask for confirmation
+                confirmOverwrite();
+            } else if (!data.exists) {
+                // Deleted since it was loaded; save it as a new pattern
+                currentPatternEtag = null;
+                await savePattern(false);
+            } else {
+                patternCache.delete(name);
+                hideModal(elements.overwriteModal);
+                showToast(`"${name}" was changed in another tab or window. Reload it before saving.`, 'error');
+            }
+            return;
+        }
+        
         if (data.error) {
             showToast(data.error, 'error');
             return;
@@ -1245,6 +1462,15 @@ async function savePattern(overwrite = false) {
         hideModal(elements.savePatternModal);
         hideModal(elements.overwriteModal);
         currentPatternName = name;
+        currentPatternEtag = data.etag || null;
+        if (data.etag) {
+            // Cache the stored version: what was saved plus the timestamps
+            // the server set, so it matches what GET returns for this ETag
+            const saved = request.method === 'PATCH' ? { ...base.data, ...payload } : { ...payload };
+            if (data.created_at) saved.created_at = data.created_at;
+            saved.updated_at = data.updated_at;
+            cachePattern(name, data.etag, saved);
+        }
         sequenceModified = false;
         showToast(data.message, 'success');
         await loadPatternsList();
@@ -1300,6 +1526,7 @@ function handleFileSelected(event) {
             const data = JSON.parse(e.target.result);
             loadSequenceFromData(data);
             currentPatternName = data.name || null;
+            currentPatternEtag = null;
             showToast('Sequence loaded from file', 'success');
         } catch (error) {
             showToast('Invalid JSON file', 'error');
@@ -1312,6 +1539,68 @@ function handleFileSelected(event) {
     event.target.value = '';
 }
 
+// ============================================================================
+// Pattern Library Import/Export
+// ============================================================================
+
+function handleExportLibrary() {
+    // The server streams the archive; the browser saves it as it arrives
+    const a = document.createElement('a');
+    a.href = '/archive/export?format=zip';
+    a.download = 'keystroker-patterns.zip';
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+}
+
+function handleImportLibrary() {
+    elements.libraryFileInput.click();
+}
+
+async function handleLibraryFileSelected(event) {
+    const file = event.target.files[0];
+    if (!file) return;
+    
+    // Reset input so same file can be selected again
+    event.target.value = '';
+    
+    const form = new FormData();
+    form.append('file', file);
+    const policy = elements.importPolicy.value;
+    
+    try {
+        const response = await fetch(`/archive/import?policy=${policy}`, {
+            method: 'POST',
+            body: form
+        });
+        const data = await response.json();
+        
+        if (data.error) {
+            showToast(data.error, 'error');
+            return;
+        }
+        
+        const parts = [`${data.imported} imported`];
+        if (data.overwritten) parts.push(`${data.overwritten} overwritten`);
+        if (data.skipped.length) parts.push(`${data.skipped.length} skipped`);
+        if (data.errors.length) {
+            parts.push(`${data.errors.length} unreadable`);
+            console.warn('Patterns that could not be imported:', data.errors);
+        }
+        showToast(`Archive imported: ${parts.join(', ')}`, data.errors.length ? 'warning' : 'success');
+        
+        if (data.overwritten) {
+            // Overwritten patterns no longer match their cached copies
+            patternCache.clear();
+            currentPatternEtag = null;
+        }
+        await loadPatternsList();
+    } catch (error) {
+        showToast('Failed to import archive', 'error');
+        console.error(error);
+    }
+}
+
 // ============================================================================
 // Run Sequence
 // ============================================================================
@@ -1377,6 +1666,34 @@ function showExecutionProgress(totalLoops, totalSteps) {
     elements.currentLoop.textContent = '1';
     elements.currentStep.textContent = '0';
     elements.progressBar.style.width = '0%';
+    setRunPaused(false);
+}
+
+function setRunPaused(paused, label) {
+    elements.progressLabel.textContent = label || (paused ? 'Paused' : 'Running sequence...');
+    elements.pauseRunBtn.textContent = paused ? 'Resume' : 'Pause';
+    elements.pauseRunBtn.dataset.paused = paused ? 'true' : 'false';
+}
+
+/**
+ * Send a stop/pause/resume request for the job shown in the overlay.
+ */
+async function controlRun(action) {
+    if (!activeJobId) return;
+    try {
+        const response = await fetch(`/jobs/${encodeURIComponent(activeJobId)}/${action}`, {
+            method: 'POST'
+        });
+        const data = await response.json();
+        if (data.error && response.status !== 409) {
+            showToast(data.error, 'error');
+            return;
+        }
+        if (action === 'pause') setRunPaused(true);
+        if (action === 'resume') setRunPaused(false, 'Resuming...');
+    } catch (error) {
+        showToast(`Failed to ${action} the run`, 'error');
+    }
 }
 
 function updateExecutionProgress(currentLoop, currentStep, totalLoops, totalSteps) {
@@ -1429,31 +1746,8 @@ async function runSequence() {
     // Show execution progress
     showExecutionProgress(loopCount, totalSteps);
     
-    // Start SSE connection for progress updates
-    let eventSource = null;
-    try {
-        eventSource = new EventSource('/progress');
-        eventSource.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            if (data.type === 'progress') {
-                updateExecutionProgress(
-                    data.current_loop,
-                    data.current_step,
-                    data.total_loops,
-                    data.total_steps
-                );
-            } else if (data.type === 'complete' || data.type === 'stopped') {
-                eventSource.close();
-            }
-        };
-        eventSource.onerror = () => {
-            eventSource.close();
-        };
-    } catch (e) {
-        console.log('SSE not supported, progress updates disabled');
-    }
-    
     try {
+        // Submit the run; the server answers immediately with a job id
         const response = await fetch('/run', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -1462,28 +1756,113 @@ async function runSequence() {
         
         const data = await response.json();
         
-        hideExecutionOverlay();
-        
-        if (eventSource) {
-            eventSource.close();
-        }
-        
         if (data.error) {
+            hideExecutionOverlay();
             showToast(data.error, 'error');
             return;
         }
         
-        showToast(data.message, 'success');
-    } catch (error) {
+        activeJobId = data.job_id;
+        const job = await waitForJob(data.job_id);
+        activeJobId = null;
+        
         hideExecutionOverlay();
-        if (eventSource) {
-            eventSource.close();
+        
+        if (job.error) {
+            showToast(job.error, 'error');
+            return;
         }
+        
+        showToast(job.message, 'success');
+    } catch (error) {
+        activeJobId = null;
+        hideExecutionOverlay();
         showToast('Failed to run sequence', 'error');
         console.error(error);
     }
 }
 
+/**
+ * Follow a submitted job until it finishes, updating the progress overlay.
+ * Uses SSE for progress and falls back to polling /jobs/<id>.
+ */
+function waitForJob(jobId) {
+    return new Promise((resolve, reject) => {
+        let finished = false;
+        let eventSource = null;
+        let pollTimer = null;
+        
+        async function fetchResult() {
+            if (finished) return;
+            try {
+                const response = await fetch(`/jobs/${encodeURIComponent(jobId)}`);
+                const job = await response.json();
+                if (job.error && !job.status) {
+                    finished = true;
+                    resolve(job);
+                    return;
+                }
+                updateExecutionProgress(
+                    job.current_loop,
+                    job.current_step,
+                    job.total_loops,
+                    job.total_steps
+                );
+                if (['completed', 'stopped', 'failed'].includes(job.status)) {
+                    finished = true;
+                    clearInterval(pollTimer);
+                    if (eventSource) {
+                        eventSource.close();
+                    }
+                    resolve(job);
+                }
+            } catch (error) {
+                finished = true;
+                clearInterval(pollTimer);
+                if (eventSource) {
+                    eventSource.close();
+                }
+                reject(error);
+            }
+        }
+        
+        try {
+            eventSource = new EventSource(`/progress?job=${encodeURIComponent(jobId)}`);
+            eventSource.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.type === 'progress') {
+                    updateExecutionProgress(
+                        data.current_loop,
+                        data.current_step,
+                        data.total_loops,
+                        data.total_steps
+                    );
+                } else if (data.type === 'paused' || data.type === 'resumed') {
+                    setRunPaused(data.type === 'paused');
+                } else if (data.type === 'resuming') {
+                    setRunPaused(false, `Resuming in ${data.delay}s - switch to the target window`);
+                } else if (data.type === 'complete' || data.type === 'stopped') {
+                    eventSource.close();
+                    fetchResult();
+                }
+            };
+            eventSource.onerror = () => {
+                // While CONNECTING the browser retries by itself and resumes
+                // after the last event it received (Last-Event-ID)
+                if (eventSource.readyState !== EventSource.CLOSED) return;
+                eventSource = null;
+                // Fall back to polling the job status
+                if (!pollTimer) {
+                    pollTimer = setInterval(fetchResult, 1000);
+                }
+            };
+        } catch (e) {
+            console.log('SSE not supported, polling job status instead');
+            pollTimer = setInterval(fetchResult, 1000);
+        }
+    });
+}
+
 // ============================================================================
 // Version and Update Functions
 // ============================================================================
@@ -1513,7 +1892,9 @@ async function checkForUpdates(showUpToDateMessage = true) {
     }
     
     try {
-        const response = await fetch('/api/check-update');
+        // An explicit check refreshes the server's cached result first
+        const url = showUpToDateMessage ? '/api/check-update?refresh=1' : '/api/check-update';
+        const response = await fetch(url);
         const data = await response.json();
         
         if (data.error) {
@@ -1521,6 +1902,13 @@ async function checkForUpdates(showUpToDateMessage = true) {
             return;
         }
         
+        if (data.pending) {
+            if (showUpToDateMessage) {
+                showToast('Still checking for updates, please try again shortly', 'warning');
+            }
+            return;
+        }
+        
         if (data.update_available) {
             // Show update modal
             showUpdateModal(data);
@@ -1604,6 +1992,9 @@ function initEventListeners() {
     elements.loadJsonBtn.onclick = handleLoadJson;
     elements.exportJsonBtn.onclick = handleExportJson;
     elements.jsonFileInput.onchange = handleFileSelected;
+    elements.exportLibraryBtn.onclick = handleExportLibrary;
+    elements.importLibraryBtn.onclick = handleImportLibrary;
+    elements.libraryFileInput.onchange = handleLibraryFileSelected;
     
     // Undo/Redo buttons
     document.getElementById('undoBtn').onclick = undo;
@@ -1705,9 +2096,16 @@ function initEventListeners() {
         hideModal(elements.clearModal);
         sequenceModified = false;
         currentPatternName = null;
+        currentPatternEtag = null;
         showToast('All sequences cleared', 'success');
     };
     
+    // Run controls in the execution overlay
+    elements.pauseRunBtn.onclick = () => {
+        controlRun(elements.pauseRunBtn.dataset.paused === 'true' ? 'resume' : 'pause');
+    };
+    elements.stopRunBtn.onclick = () => controlRun('stop');
+    
     // Update modal
     if (elements.checkUpdateBtn) {
         elements.checkUpdateBtn.onclick = () => checkForUpdates(true);
@@ -1821,6 +2219,7 @@ async function init() {
     initSequenceTabs();
     initSortable();
     initEventListeners();
+    watchWindowList();
     
     // Load initial data
     await loadPatternsList();
@@ -7,12 +7,17 @@ It runs the Flask server in the background and provides a system tray icon
 for easy access and control.
 """
 
+import time
+
+# Reference point for the startup timing log
+_process_start = time.perf_counter()
+
 import os
 import sys
 import threading
 import webbrowser
-import time
 import logging
+import importlib.util
 
 # Configure logging
 logging.basicConfig(
@@ -40,25 +45,44 @@ except ImportError as e:
     logger.error("Please install required packages: pip install pystray Pillow")
     sys.exit(1)
 
-try:
-    import requests
-except ImportError:
-    requests = None
+# requests is only imported when an update check runs
+REQUESTS_AVAILABLE = importlib.util.find_spec("requests") is not None
+if not REQUESTS_AVAILABLE:
     logger.warning("requests package not available - update checking disabled")
 
-# Import app components
-from app import app
-from version import VERSION, APP_NAME, GITHUB_API_URL, GITHUB_RELEASES_URL
+# The Flask app itself is imported by the server thread (see run_flask_server),
+# so the tray icon can be built while it loads
+from version import VERSION, APP_NAME, GITHUB_RELEASES_URL
+from updates import update_checker
 
 # Server configuration
 HOST = "127.0.0.1"
 PORT = 5001
 URL = f"http://{HOST}:{PORT}"
 
+# Longest time to wait for the server to listen before opening the browser anyway
+SERVER_READY_TIMEOUT = 15
+
 # Global state
 server_thread = None
 tray_icon = None
 flask_server = None
+server_ready = threading.Event()
+
+# (label, seconds since start) for the startup timing log
+startup_marks = []
+
+
+def mark_startup(label):
+    """Record a startup milestone for the timing log."""
+    startup_marks.append((label, time.perf_counter() - _process_start))
+
+
+def log_startup_timing():
+    """Log when each startup milestone was reached."""
+    marks = sorted(startup_marks, key=lambda mark: mark[1])
+    breakdown = ", ".join(f"{label} {seconds * 1000:.0f} ms" for label, seconds in marks)
+    logger.info(f"Startup timing: {breakdown}")
 
 
 def get_icon_path():
@@ -108,19 +132,37 @@ def load_icon():
 
 
 def run_flask_server():
-    """Run the Flask server in a separate thread."""
-    global flask_server
+    """
+    Run the Flask server in a separate thread.
+
+    Sets server_ready as soon as the socket is listening, so the browser can
+    be opened without guessing how long startup takes.
+    """
+    try:
+        # Suppress Flask's default logging for cleaner output
+        import logging as flask_logging
 
-    # Suppress Flask's default logging for cleaner output
-    import logging as flask_logging
+        flask_log = flask_logging.getLogger("werkzeug")
+        flask_log.setLevel(flask_logging.WARNING)
 
-    flask_log = flask_logging.getLogger("werkzeug")
-    flask_log.setLevel(flask_logging.WARNING)
+        from app import app
+        from serving import create_server
 
-    logger.info(f"Starting Flask server on {URL}")
+        mark_startup("app imported")
 
-    # Use threaded=True for better performance
-    app.run(host=HOST, port=PORT, debug=False, use_reloader=False, threaded=True)
+        # waitress when installed, else the werkzeug server (threaded)
+        server_name, serve = create_server(app, HOST, PORT)
+        logger.info(f"Starting {server_name} server on {URL}")
+    except Exception as e:
+        # Most likely the port is taken, e.g. by an instance that is already
+        # running; the browser is still opened and will reach that one
+        logger.error(f"Failed to start server: {e}")
+        server_ready.set()
+        return
+
+    mark_startup("server listening")
+    server_ready.set()
+    serve()
 
 
 def open_browser(icon=None, item=None):
@@ -131,7 +173,7 @@ def open_browser(icon=None, item=None):
 
 def check_for_updates_tray(icon, item):
     """Check for updates and show notification via system tray."""
-    if not requests:
+    if not REQUESTS_AVAILABLE:
         show_notification(
             icon,
             "Update Check",
@@ -139,58 +181,34 @@ def check_for_updates_tray(icon, item):
         )
         return
 
-    try:
-        logger.info("Checking for updates...")
-        headers = {
-            "Accept": "application/vnd.github.v3+json",
-            "User-Agent": f"{APP_NAME}/{VERSION}",
-        }
-
-        response = requests.get(GITHUB_API_URL, headers=headers, timeout=10)
-
-        if response.status_code == 404:
-            show_notification(
-                icon,
-                "Up to Date",
-                f"You are running {APP_NAME} v{VERSION}\nNo releases available yet.",
-            )
-            return
-
-        response.raise_for_status()
-        release_data = response.json()
-
-        latest_version = release_data.get("tag_name", "").lstrip("v")
-
-        # Compare versions
-        def parse_version(v):
-            try:
-                return tuple(int(x) for x in v.split("."))
-            except (ValueError, AttributeError):
-                return (0, 0, 0)
-
-        current_ver = parse_version(VERSION)
-        latest_ver = parse_version(latest_version)
-
-        if latest_ver > current_ver:
-            show_notification(
-                icon,
-                "Update Available!",
-                f"Version {latest_version} is available.\nYou have version {VERSION}.\nVisit the releases page to download.",
-            )
-            # Open releases page
-            webbrowser.open(GITHUB_RELEASES_URL)
-        else:
-            show_notification(
-                icon, "Up to Date", f"You are running the latest version ({VERSION})"
-            )
-
-    except requests.exceptions.Timeout:
+    logger.info("Checking for updates...")
+    result = update_checker.check(force=True)
+
+    if result.get("pending"):
         show_notification(
-            icon, "Update Check Failed", "Request timed out. Please try again."
+            icon, "Checking for Updates", "GitHub has not answered yet. Please try again shortly."
+        )
+    elif "error" in result:
+        logger.error(f"Update check failed: {result['error']}")
+        show_notification(icon, "Update Check Failed", result["error"][:80])
+    elif "latest_version" not in result:
+        show_notification(
+            icon,
+            "Up to Date",
+            f"You are running {APP_NAME} v{VERSION}\nNo releases available yet.",
+        )
+    elif result["update_available"]:
+        show_notification(
+            icon,
+            "Update Available!",
+            f"Version {result['latest_version']} is available.\nYou have version {VERSION}.\nVisit the releases page to download.",
+        )
+        # Open releases page
+        webbrowser.open(GITHUB_RELEASES_URL)
+    else:
+        show_notification(
+            icon, "Up to Date", f"You are running the latest version ({VERSION})"
         )
-    except Exception as e:
-        logger.error(f"Update check failed: {e}")
-        show_notification(icon, "Update Check Failed", f"Error: {str(e)[:50]}")
 
 
 def show_notification(icon, title, message):
@@ -208,6 +226,11 @@ def exit_app(icon, item):
     # Stop the tray icon
     icon.stop()
 
+    # os._exit skips atexit, so write pattern saves still held for coalescing
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.pattern_store.flush()
+
     # The Flask server will be stopped when the process exits
     # Force exit to ensure clean shutdown
     os._exit(0)
@@ -248,21 +271,30 @@ def main():
     logger.info("  Keyboard Automation Tool")
     logger.info("=" * 50)
 
+    mark_startup("tray modules imported")
+
     # Start Flask server in background thread
     server_thread = threading.Thread(target=run_flask_server, daemon=True)
     server_thread.start()
 
-    # Wait a moment for server to start
-    time.sleep(1)
+    # Build the tray icon while the server thread imports the app
+    logger.info("Starting system tray icon...")
+    tray_icon = setup_tray_icon()
+    mark_startup("tray icon built")
 
-    # Auto-open browser
+    # Auto-open browser as soon as the server accepts connections
+    if not server_ready.wait(SERVER_READY_TIMEOUT):
+        logger.warning(f"Server not listening after {SERVER_READY_TIMEOUT} s")
     logger.info("Opening browser automatically...")
     open_browser()
+    mark_startup("browser opened")
+    log_startup_timing()
 
-    # Set up and run the system tray icon (blocks until exit)
-    logger.info("Starting system tray icon...")
-    tray_icon = setup_tray_icon()
+    # Have an update status ready before anyone asks for it
+    if REQUESTS_AVAILABLE:
+        update_checker.refresh_async()
 
+    # Run the system tray icon (blocks until exit)
     try:
         tray_icon.run()
     except KeyboardInterrupt:
@@ -0,0 +1,205 @@
+"""
+Update checking for KeyStroker.
+One cached check of the latest GitHub release, shared by the web UI and the tray menu.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from version import VERSION, APP_NAME, GITHUB_API_URL, GITHUB_RELEASES_URL
+
+# Seconds a successful check is served before it is refreshed in the background
+CACHE_TTL = 3600
+
+# Seconds before a failed check is retried
+ERROR_TTL = 300
+
+# Timeout of the request to GitHub (it never runs on a request thread)
+REQUEST_TIMEOUT = 10
+
+# Longest a caller waits for a check that is under way before it gets the
+# cached (or pending) result
+CHECK_WAIT = 2.0
+
+
+def parse_version(v):
+    """Parse version string into tuple of integers."""
+    try:
+        return tuple(int(x) for x in v.split("."))
+    except (ValueError, AttributeError):
+        return (0, 0, 0)
+
+
+def _release_result(release):
+    """The /api/check-update result for a GitHub release (None: no releases)."""
+    if release is None:
+        return {
+            "update_available": False,
+            "current_version": VERSION,
+            "message": "No releases found yet.",
+        }
+
+    latest_version = release.get("tag_name", "").lstrip("v")
+
+    # Find download URL for Windows executable
+    download_url = None
+    for asset in release.get("assets", []):
+        if asset.get("name", "").lower().endswith(".exe"):
+            download_url = asset.get("browser_download_url")
+            break
+
+    return {
+        "update_available": parse_version(latest_version) > parse_version(VERSION),
+        "current_version": VERSION,
+        "latest_version": latest_version,
+        "release_name": release.get("name", ""),
+        "release_notes": release.get("body", ""),
+        "release_url": release.get("html_url", GITHUB_RELEASES_URL),
+        "download_url": download_url,
+        "published_at": release.get("published_at", ""),
+    }
+
+
+class UpdateChecker:
+    """
+    Cached update check with background refresh.
+
+    check() answers from the cache immediately. When the cached result is
+    older than its TTL it also starts a refresh on a background thread, so
+    the next caller gets the new result; no caller waits for GitHub for
+    longer than CHECK_WAIT. Refreshes are conditional requests
+    (If-None-Match with the last ETag), so an unchanged release costs a 304
+    that does not count against GitHub's rate limit.
+
+    A failed refresh keeps the previous result; the error is only reported
+    while there is no result at all.
+    """
+
+    def __init__(self, url=GITHUB_API_URL, ttl=CACHE_TTL, error_ttl=ERROR_TTL,
+                 timeout=REQUEST_TIMEOUT):
+        self.url = url
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.requests_made = 0
+        self.not_modified = 0
+        self._cond = threading.Condition()
+        self._result = None  # Last successful result
+        self._error = None  # (message, kind) of the last failed refresh
+        self._etag = None
+        self._release = None  # Release JSON the ETag belongs to
+        self._checked_at = None  # time.monotonic() of the last refresh
+        self._checked_at_utc = None
+        self._refreshing = False
+
+    def _stale(self):
+        if self._checked_at is None:
+            return True
+        ttl = self.error_ttl if self._error is not None else self.ttl
+        return time.monotonic() - self._checked_at >= ttl
+
+    def refresh_async(self):
+        """Start a refresh in the background unless one is under way."""
+        with self._cond:
+            self._start_refresh()
+
+    def _start_refresh(self):
+        """Caller holds the lock."""
+        if self._refreshing:
+            return
+        self._refreshing = True
+        threading.Thread(target=self._refresh, name="update-check", daemon=True).start()
+
+    def _fetch(self):
+        """
+        Request the latest release.
+
+        Returns:
+            tuple: (release JSON or None if there are no releases, ETag)
+        """
+        import requests
+
+        headers = {
+            "Accept": "application/vnd.github.v3+json",
+            "User-Agent": f"{APP_NAME}/{VERSION}",
+        }
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+
+        self.requests_made += 1
+        response = requests.get(self.url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            return self._release, self._etag
+        if response.status_code == 404:
+            # No releases yet
+            return None, response.headers.get("ETag")
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+    def _refresh(self):
+        error = None
+        result = None
+        try:
+            import requests
+        except ImportError:
+            requests = None
+            error = ("Update checking is not available (requests package missing)", "unavailable")
+
+        if requests is not None:
+            try:
+                release, etag = self._fetch()
+                result = _release_result(release)
+            except requests.exceptions.Timeout:
+                error = ("Request timed out. Please try again.", "timeout")
+            except requests.exceptions.RequestException as e:
+                error = (f"Failed to check for updates: {str(e)}", "request")
+            except Exception as e:
+                error = (f"Unexpected error: {str(e)}", "unexpected")
+
+        with self._cond:
+            if result is not None:
+                self._result = result
+                self._release = release
+                self._etag = etag
+            self._error = error
+            self._checked_at = time.monotonic()
+            self._checked_at_utc = datetime.utcnow().isoformat() + "Z"
+            self._refreshing = False
+            self._cond.notify_all()
+
+    def check(self, force=False, wait=CHECK_WAIT):
+        """
+        Return the latest known update status.
+
+        Args:
+            force: Refresh even if the cached result is still fresh (the
+                user asked explicitly)
+            wait: Most seconds to wait for a refresh under way, when forced
+                or when nothing is cached yet
+
+        Returns:
+            dict: The /api/check-update result, plus "checked_at". When no
+            check has succeeded yet, either {"error", "error_kind"} or
+            {"pending": True}.
+        """
+        with self._cond:
+            if force or self._stale():
+                self._start_refresh()
+            if force or (self._result is None and self._error is None):
+                self._cond.wait_for(lambda: not self._refreshing, wait)
+
+            if self._result is not None:
+                return dict(self._result, checked_at=self._checked_at_utc)
+            if self._error is not None:
+                message, kind = self._error
+                return {"error": message, "error_kind": kind, "current_version": VERSION}
+            return {"pending": True, "current_version": VERSION}
+
+
+# Shared by the Flask endpoint and the tray menu. KEYSTROKER_UPDATE_URL points
+# it at another server (e.g. a local stand-in for testing)
+update_checker = UpdateChecker(os.environ.get("KEYSTROKER_UPDATE_URL", GITHUB_API_URL))
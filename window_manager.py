@@ -2,9 +2,13 @@
 Cross-platform window management for KeyStroker.
 Handles differences between Windows, macOS, and Linux.
 """
+import os
 import sys
+import hashlib
 import subprocess
+import threading
 import time
+from collections import namedtuple
 
 
 def get_platform():
@@ -18,6 +22,21 @@ def get_platform():
 
 PLATFORM = get_platform()
 
+# Seconds a resolved target window is trusted before it is revalidated
+WINDOW_CACHE_TTL = 30.0
+
+# Seconds a confirmed foreground check is trusted on macOS when it has to
+# run osascript (a process per check) instead of asking NSWorkspace
+FOREGROUND_CHECK_INTERVAL = 1.0
+
+# Seconds between window list polls. With change events the list is still
+# polled, less often, to pick up renamed windows
+WINDOW_POLL_INTERVAL = 2.0
+WINDOW_EVENT_POLL_INTERVAL = 10.0
+
+# The watcher stops polling after this many seconds without readers
+WINDOW_WATCH_IDLE = 60.0
+
 
 def get_all_windows():
     """
@@ -63,6 +82,285 @@ def window_exists(name):
     return any(name.lower() in w.lower() or w.lower() in name.lower() for w in windows)
 
 
+class WindowTarget:
+    """
+    A target window resolved once and then addressed through a cached handle.
+    
+    The window list is enumerated only to resolve the handle. Activation and
+    foreground checks then use the handle directly. After ttl seconds the
+    handle is revalidated with a cheap liveness check; the windows are only
+    enumerated again if the window is gone.
+    
+    On macOS the handle is the application name; elsewhere it is the
+    pygetwindow window object.
+    """
+    
+    def __init__(self, name, ttl=WINDOW_CACHE_TTL):
+        self.name = name
+        self.ttl = ttl
+        self.lookups = 0  # Number of full window enumerations
+        self._handle = None
+        self._checked_at = 0.0
+        self._foreground_at = 0.0  # When the target was last seen in front (macOS)
+    
+    def handle(self):
+        """
+        Return the cached handle, resolving or revalidating it when needed.
+        
+        Returns:
+            The window handle, or None if no matching window exists
+        """
+        now = time.monotonic()
+        if self._handle is not None and now - self._checked_at < self.ttl:
+            return self._handle
+        if self._handle is not None and _handle_alive(self._handle):
+            self._checked_at = now
+            return self._handle
+        return self.resolve()
+    
+    def resolve(self):
+        """Enumerate the windows once and cache the best match."""
+        self.lookups += 1
+        if PLATFORM == 'macos':
+            self._handle = _match_name(self.name, _get_windows_macos())
+        else:
+            self._handle = _find_window_pygetwindow(self.name)
+        self._checked_at = time.monotonic()
+        return self._handle
+    
+    def exists(self):
+        """Check if the target window exists."""
+        return self.handle() is not None
+    
+    def activate(self):
+        """
+        Bring the target window to the front using the cached handle.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        handle = self.handle()
+        if handle is None:
+            return False
+        if PLATFORM == 'macos':
+            self._foreground_at = 0.0
+            return _activate_macos(handle)
+        if _activate_handle(handle):
+            return True
+        # The handle may have gone stale since the last check
+        handle = self.resolve()
+        return handle is not None and _activate_handle(handle)
+    
+    def is_foreground(self):
+        """
+        Check if the target window is the foreground window.
+        
+        On macOS without PyObjC every check starts osascript, so a positive
+        answer is reused for FOREGROUND_CHECK_INTERVAL seconds.
+        
+        Returns:
+            bool or None: None if the foreground window cannot be determined
+        """
+        handle = self._handle if self._handle is not None else self.handle()
+        if handle is None:
+            return False
+        if PLATFORM == 'macos':
+            now = time.monotonic()
+            if (_ns_workspace() is None
+                    and now - self._foreground_at < FOREGROUND_CHECK_INTERVAL):
+                return True
+            front = _frontmost_app_macos()
+            self._foreground_at = now if front == handle else 0.0
+            return None if front is None else front == handle
+        return _is_foreground_pygetwindow(handle)
+
+
+WindowSnapshot = namedtuple('WindowSnapshot', ['version', 'etag', 'windows'])
+
+
+class WindowWatcher:
+    """
+    Keeps an up-to-date window list in the background.
+    
+    A daemon thread enumerates the windows and publishes a new snapshot
+    (with a higher version and a new ETag) only when the list changed, so
+    readers get the last list without enumerating anything. On X11 with
+    python-xlib, changes to the root window's _NET_CLIENT_LIST wake the
+    thread right away; otherwise the list is polled every interval seconds.
+    
+    The watcher starts on first use and goes idle after WINDOW_WATCH_IDLE
+    seconds without readers; the next reader then waits for a fresh list.
+    """
+    
+    def __init__(self, interval=WINDOW_POLL_INTERVAL, idle=WINDOW_WATCH_IDLE):
+        self.interval = interval
+        self.idle = idle
+        self.method = 'polling'
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._snapshot = WindowSnapshot(0, None, ())
+        self._refreshes = 0  # Completed enumerations
+        self._refreshing = False
+        self._stale = True
+        self._last_read = 0.0
+        self._thread = None
+    
+    def _start(self):
+        """Start the watcher thread (caller holds the lock)."""
+        self._last_read = time.monotonic()
+        if self._thread is None:
+            if _watch_x11(self._wake.set):
+                self.method = 'x11-events'
+            self._thread = threading.Thread(target=self._run, name='window-watcher', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._cond:
+                self._refreshing = True
+            windows = tuple(get_all_windows())
+            with self._cond:
+                self._refreshing = False
+                self._refreshes += 1
+                if windows != self._snapshot.windows or self._snapshot.etag is None:
+                    digest = hashlib.sha1('\n'.join(windows).encode('utf-8')).hexdigest()
+                    self._snapshot = WindowSnapshot(
+                        self._snapshot.version + 1, digest[:16], windows
+                    )
+                self._stale = False
+                self._cond.notify_all()
+                idle = time.monotonic() - self._last_read >= self.idle
+                if idle:
+                    self._stale = True
+            if idle:
+                # Nobody is reading; sleep until the next reader wakes us
+                self._wake.wait()
+            elif self.method == 'x11-events':
+                self._wake.wait(max(self.interval, WINDOW_EVENT_POLL_INTERVAL))
+            else:
+                self._wake.wait(self.interval)
+    
+    def snapshot(self, timeout=5.0):
+        """
+        Return the current window list without enumerating windows.
+        
+        Only the first call (or the first after the watcher went idle)
+        waits for an enumeration.
+        
+        Returns:
+            WindowSnapshot: (version, etag, windows)
+        """
+        with self._cond:
+            self._start()
+            if not self._stale:
+                return self._snapshot
+        return self.refresh(timeout)
+    
+    def refresh(self, timeout=5.0):
+        """
+        Enumerate the windows now and return the resulting snapshot.
+        
+        Args:
+            timeout: Most seconds to wait for the enumeration
+        
+        Returns:
+            WindowSnapshot: (version, etag, windows)
+        """
+        with self._cond:
+            self._start()
+            # An enumeration already under way may predate this request
+            target = self._refreshes + (2 if self._refreshing else 1)
+            self._wake.set()
+            self._cond.wait_for(lambda: self._refreshes >= target, timeout)
+            return self._snapshot
+    
+    def wait_for_change(self, version, timeout):
+        """
+        Block until the snapshot version differs from version.
+        
+        Args:
+            version: Version the caller already has
+            timeout: Most seconds to wait
+        
+        Returns:
+            WindowSnapshot: The current snapshot (unchanged on timeout)
+        """
+        with self._cond:
+            self._start()
+            if self._stale:
+                self._wake.set()
+            self._cond.wait_for(lambda: self._snapshot.version != version, timeout)
+            return self._snapshot
+
+
+def _watch_x11(notify):
+    """
+    Call notify whenever the X11 client list changes.
+    
+    Listens for PropertyNotify on the root window's _NET_CLIENT_LIST on its
+    own connection and thread.
+    
+    Returns:
+        bool: False if X11 change events are not available here
+    """
+    if PLATFORM != 'linux' or not os.environ.get('DISPLAY'):
+        return False
+    try:
+        from Xlib import X
+        from Xlib.display import Display
+        display = Display()
+        client_list = display.intern_atom('_NET_CLIENT_LIST')
+        display.screen().root.change_attributes(event_mask=X.PropertyChangeMask)
+        display.flush()
+    except Exception:
+        return False
+    
+    def listen():
+        try:
+            while True:
+                event = display.next_event()
+                if event.type == X.PropertyNotify and event.atom == client_list:
+                    notify()
+        except Exception:
+            pass  # Connection lost; the watcher keeps polling
+    
+    threading.Thread(target=listen, name='window-watcher-x11', daemon=True).start()
+    return True
+
+
+window_watcher = WindowWatcher()
+
+
+def _match_name(name, titles):
+    """
+    Pick the title matching name: exact, then containing name, then contained in it.
+    Same matching rules as window_exists.
+    """
+    lowered = name.lower()
+    for title in titles:
+        if title.lower() == lowered:
+            return title
+    for title in titles:
+        if lowered in title.lower():
+            return title
+    for title in titles:
+        if title.lower() in lowered:
+            return title
+    return None
+
+
+def _handle_alive(handle):
+    """Cheap check that a cached handle still refers to an existing window."""
+    if PLATFORM == 'macos':
+        # Application names stay valid; activation fails if the app quit
+        return True
+    try:
+        return bool(handle.title.strip())
+    except Exception:
+        return False
+
+
 # =============================================================================
 # macOS Implementation (using AppleScript)
 # =============================================================================
@@ -101,6 +399,54 @@ def _get_windows_macos():
     return []
 
 
+_workspace = None
+
+
+def _ns_workspace():
+    """
+    The shared NSWorkspace, or None if PyObjC (AppKit) is not installed.
+    """
+    global _workspace
+    if _workspace is None:
+        try:
+            from AppKit import NSWorkspace
+            _workspace = NSWorkspace.sharedWorkspace()
+        except Exception:
+            _workspace = False
+    return _workspace or None
+
+
+def _frontmost_app_macos():
+    """
+    Get the name of the frontmost application on macOS.
+    
+    Asks NSWorkspace in-process when PyObjC is installed, and falls back to
+    AppleScript via osascript otherwise.
+    
+    Returns:
+        str or None: Application name, or None if it cannot be determined
+    """
+    workspace = _ns_workspace()
+    if workspace is not None:
+        try:
+            return str(workspace.frontmostApplication().localizedName())
+        except Exception:
+            pass
+    script = 'tell application "System Events" to get name of first process whose frontmost is true'
+    try:
+        result = subprocess.run(
+            ['osascript', '-e', script],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except Exception:
+        pass
+    return None
+
+
 def _activate_macos(app_name):
     """
     Activate an application on macOS using AppleScript.
@@ -195,19 +541,7 @@ def _activate_pygetwindow(name):
         import pygetwindow as gw
         windows = gw.getWindowsWithTitle(name)
         if windows:
-            win = windows[0]
-            # Restore if minimized
-            if hasattr(win, 'isMinimized') and win.isMinimized:
-                win.restore()
-            # Activate
-            try:
-                win.activate()
-            except Exception as e:
-                # Ignore "Error code 0" which actually means success on Windows
-                if "Error code from Windows: 0" not in str(e):
-                    return False
-            time.sleep(0.3)  # Brief pause for window to come to front
-            return True
+            return _activate_handle(windows[0])
     except ImportError:
         pass
     except Exception:
@@ -215,6 +549,67 @@ def _activate_pygetwindow(name):
     return False
 
 
+def _find_window_pygetwindow(name):
+    """
+    Find the window matching name with a single enumeration.
+    
+    Returns:
+        The pygetwindow window, or None if not found
+    """
+    try:
+        import pygetwindow as gw
+        windows = [w for w in gw.getAllWindows() if w.title.strip()]
+        title = _match_name(name, [w.title.strip() for w in windows])
+        if title is not None:
+            return next(w for w in windows if w.title.strip() == title)
+    except ImportError:
+        pass
+    except Exception:
+        pass
+    return None
+
+
+def _activate_handle(win):
+    """
+    Activate a pygetwindow window object.
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        # Restore if minimized
+        if hasattr(win, 'isMinimized') and win.isMinimized:
+            win.restore()
+        # Activate
+        try:
+            win.activate()
+        except Exception as e:
+            # Ignore "Error code 0" which actually means success on Windows
+            if "Error code from Windows: 0" not in str(e):
+                return False
+        time.sleep(0.3)  # Brief pause for window to come to front
+        return True
+    except Exception:
+        return False
+
+
+def _is_foreground_pygetwindow(win):
+    """
+    Check if a pygetwindow window is the active window.
+    
+    Returns:
+        bool or None: None if the active window cannot be determined
+    """
+    try:
+        import pygetwindow as gw
+        active = gw.getActiveWindow()
+    except Exception:
+        return None
+    if active is None:
+        return False
+    return active == win
+
+
 # =============================================================================
 # Utility Functions
 # =============================================================================